@@ -1,22 +1,94 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Blueprint, Flask, Response, current_app, render_template, jsonify, request, stream_with_context
 from datetime import datetime, timedelta, date, time as time_type
-from models import db, User, StudySession, Task, FocusSession, CurrentFocusSession
+from models import db, User, StudySession, Task, FocusSession, CurrentFocusSession, UserStreak
+from recommendation_cache import RecommendationCache, context_key
+from background import SingleFlightExecutor
+from json_stream import JSONArrayStreamParser
+from rollups import (
+    add_months, daily_series, month_start, monthly_tasks, rebuild_rollups, record_focus_session,
+    rollups_empty, subject_totals
+)
+from bulk_io import KINDS as BULK_KINDS, export_csv, export_ndjson, import_records, iter_csv, iter_ndjson
+import mutations
+from intervals import format_minute, iter_free_time, parse_minute
+import autoschedule
+from mutations import MutationError
+from pagination import keyset_page, parse_page_size
+from storage import configure_storage, install_sqlite_pragmas
+from instrumentation import install_instrumentation, render_metrics
+from llm_gateway import CircuitBreaker, LLMGateway
+import profiling
+import serializers
+from serializers import due_label, duration_label, time_12h
+from versions import (
+    conditional_on_version, current_version, install_version_tracking, minute_bucket, today_bucket
+)
+from events import HEARTBEAT_SECONDS, broker as event_broker, install_change_events
+from context_builder import build_user_context, prompt_sections
+import heuristics
+from changelog import ENTITIES as SYNC_ENTITIES, changes_since, compact_change_log, install_change_log
+from scheduler import Scheduler, install_scheduler
+from streaks import current_streak, get_streak, rebuild_all_streaks, rebuild_streak, record_activity
+import click
+import json
 import os
-from openai import OpenAI
+import queue
+import threading
+
+# Routes and CLI commands; create_app() registers them on an app instance
+bp = Blueprint('studyflow', __name__, cli_group=None)
+
+# The OpenAI SDK is slow to import, so the client is built on first use.
+# Assign openai_client directly to substitute a stub.
+openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
+    global openai_client
+    if openai_client is None:
+        with _openai_client_lock:
+            if openai_client is None:
+                from openai import OpenAI
+                # Retries and timeouts are applied per call by the gateway below
+                openai_client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'), max_retries=0)
+    return openai_client
+
+# Deadlines, concurrency limit and circuit breaker for every OpenAI call
+llm = LLMGateway(
+    get_openai_client,
+    timeout=float(os.environ.get('OPENAI_TIMEOUT', 20)),
+    stream_timeout=float(os.environ.get('OPENAI_STREAM_TIMEOUT', 60)),
+    max_concurrency=int(os.environ.get('OPENAI_MAX_CONCURRENCY', 4)),
+    queue_timeout=float(os.environ.get('OPENAI_QUEUE_TIMEOUT', 0.25)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('OPENAI_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('OPENAI_BREAKER_RESET', 30))
+    )
+)
+
+# Cache of generated recommendations, keyed by a hash of the user context
+recommendation_cache = RecommendationCache(
+    max_entries=int(os.environ.get('AI_CACHE_MAX_ENTRIES', 256)),
+    ttl_seconds=int(os.environ.get('AI_CACHE_TTL', 3600))
+)
+
+# 'local' serves only the rule-based recommendations; 'openai' also enriches
+# them with generated ones, at most once per AI_ENRICH_INTERVAL per user
+AI_RECOMMENDATIONS = os.environ.get('AI_RECOMMENDATIONS', 'openai' if os.environ.get('OPENAI_API_KEY') else 'local')
+AI_ENRICH_INTERVAL = int(os.environ.get('AI_ENRICH_INTERVAL', 900))
+
+# Recommendations are generated off the request thread, one job per user
+recommendation_executor = SingleFlightExecutor(
+    max_workers=int(os.environ.get('AI_WORKERS', 2)),
+    thread_name_prefix='ai-recommendations'
+)
 
-app = Flask(__name__)
-
-# OpenAI configuration
-OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Database configuration
 basedir = os.path.abspath(os.path.dirname(__file__))
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(basedir, 'study_planner.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-# Initialize database
-db.init_app(app)
+# Session-wide hooks: version bumps, the sync change log and live events
+install_version_tracking(db.session)
+install_change_log()
+install_change_events(db.session)
 
 # Helper function to get today's date string
 def get_today():
@@ -29,311 +101,520 @@ def get_formatted_date(date_str=None):
         date_obj = datetime.now()
     return date_obj.strftime('%B %d, %Y')
 
-# AI recommendations (static for now - can be migrated to database later)
-ai_recommendations = [
-    "Consider reviewing past Calculus II problems for 15 minutes before your next session.",
-    "Your current study intensity for Linear Algebra is high; ensure you take short breaks.",
-    "Explore additional resources on quantum mechanics for Physics I to deepen understanding.",
-    "Utilize flashcards for Chemistry terms; spaced repetition is highly effective.",
-    "Try active recall techniques for Literature analysis to improve retention."
-]
-
-def format_time_12h(time_24h):
-    """Convert 24h time to 12h format"""
-    hour, minute = map(int, time_24h.split(':'))
-    period = 'AM' if hour < 12 else 'PM'
-    hour_12 = hour % 12 or 12
-    return f"{hour_12}:{minute:02d} {period}"
-
-def calculate_duration(start_time, end_time):
-    """Calculate duration between two times"""
-    start_h, start_m = map(int, start_time.split(':'))
-    end_h, end_m = map(int, end_time.split(':'))
-    total_minutes = (end_h * 60 + end_m) - (start_h * 60 + start_m)
-    
-    hours = total_minutes // 60
-    minutes = total_minutes % 60
-    if hours == 0:
-        return f"{minutes} min"
-    elif minutes == 0:
-        return f"{hours} hour{'s' if hours > 1 else ''}"
-    else:
-        return f"{hours} hour{'s' if hours > 1 else ''} {minutes} min"
-
 def get_sessions_for_date(date_str):
     """Get sessions formatted for display on a specific date"""
     session_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-    sessions = StudySession.query.filter_by(user_id=1, date=session_date).order_by(StudySession.start_time).all()
+    rows = db.session.execute(
+        db.select(StudySession.id, StudySession.title, StudySession.start_time,
+                  StudySession.end_time, StudySession.color)
+        .where(StudySession.user_id == 1, StudySession.date == session_date)
+        .order_by(StudySession.start_time)
+    ).all()
 
     formatted = []
-    for s in sessions:
+    for session_id, title, start_time, end_time, color in rows:
+        start = f'{start_time.hour:02d}:{start_time.minute:02d}'
         formatted.append({
-            'id': s.id,
-            'time': format_time_12h(s.start_time.strftime('%H:%M')),
-            'subject': s.title,
-            'duration': calculate_duration(s.start_time.strftime('%H:%M'), s.end_time.strftime('%H:%M')),
-            'color': s.color,
-            'startTime': s.start_time.strftime('%H:%M'),
-            'endTime': s.end_time.strftime('%H:%M')
+            'id': session_id,
+            'time': time_12h(start_time),
+            'subject': title,
+            'duration': duration_label(start_time, end_time),
+            'color': color,
+            'startTime': start,
+            'endTime': f'{end_time.hour:02d}:{end_time.minute:02d}'
         })
     return formatted
 
 def format_task_due(due_date_str):
     """Format task due date relative to today"""
-    due_date = datetime.strptime(due_date_str, '%Y-%m-%d').date()
+    return due_label(datetime.strptime(due_date_str, '%Y-%m-%d').date(), datetime.now().date())
+
+def task_rows_with_due(user_id, order_by):
+    """Task tuples plus the relative due label, without loading ORM objects"""
     today_date = datetime.now().date()
-    diff = (due_date - today_date).days
-
-    if diff == 0:
-        return "Due: Today"
-    elif diff == 1:
-        return "Due: Tomorrow"
-    elif diff < 0:
-        return f"Overdue: {abs(diff)} day{'s' if abs(diff) > 1 else ''}"
-    else:
-        return f"Due: {due_date.strftime('%b %d')}"
+    rows = db.session.execute(
+        db.select(*serializers.TASK.columns).where(Task.user_id == user_id).order_by(*order_by)
+    ).all()
+    return [tuple(row) + (due_label(row.due_date, today_date),) for row in rows]
 
-@app.route('/')
+@bp.route('/')
 def index():
     return render_template('index.html')
 
-@app.route('/dashboard')
+@bp.route('/dashboard')
 def dashboard():
     today_str = get_today()
     formatted_sessions = get_sessions_for_date(today_str)
 
     # Fetch tasks from database and format with relative due dates
-    tasks = Task.query.filter_by(user_id=1).order_by(Task.due_date).all()
-    formatted_tasks = []
-    for task in tasks:
-        task_dict = task.to_dict()
-        formatted_tasks.append({
-            **task_dict,
-            'due': format_task_due(task_dict['dueDate'])
-        })
+    formatted_tasks = [serializers.TASK_WITH_DUE.to_dict(row)
+                       for row in task_rows_with_due(1, (Task.due_date,))]
 
     return render_template('dashboard.html',
                          sessions=formatted_sessions,
                          tasks=formatted_tasks,
-                         recommendations=ai_recommendations,
+                         recommendations=heuristics.recommend(get_user_context(1)),
                          current_date=get_formatted_date())
 
-@app.route('/planner')
+@bp.route('/planner')
 def planner():
     return render_template('planner.html',
                           current_date=get_today(),
                           formatted_date=get_formatted_date())
 
-@app.route('/features')
+@bp.route('/features')
 def features():
     return render_template('features.html')
 
-@app.route('/progress')
+@bp.route('/progress')
 def progress():
     return render_template('progress.html')
 
-@app.route('/settings')
+@bp.route('/settings')
 def settings():
     return render_template('settings.html')
 
 # API Endpoints
 
-@app.route('/api/sessions', methods=['GET', 'POST'])
+def filter_date_range(query, column):
+    """Apply the optional from/to (inclusive, YYYY-MM-DD) query parameters"""
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if date_from:
+        query = query.filter(column >= datetime.strptime(date_from, '%Y-%m-%d').date())
+    if date_to:
+        query = query.filter(column <= datetime.strptime(date_to, '%Y-%m-%d').date())
+    return query
+
+@bp.route('/api/sessions', methods=['GET', 'POST'])
+@conditional_on_version()
 def handle_sessions():
     if request.method == 'POST':
         try:
-            data = request.json
-            # Parse date and time strings to Python objects
-            session_date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            start_time = datetime.strptime(data['startTime'], '%H:%M').time()
-            end_time = datetime.strptime(data['endTime'], '%H:%M').time()
-
-            new_session = StudySession(
-                user_id=1,  # Default user
-                title=data['title'],
-                subject=data['subject'],
-                date=session_date,
-                start_time=start_time,
-                end_time=end_time,
-                color=data.get('color', 'blue'),
-                priority=data.get('priority', 'medium'),
-                notes=data.get('notes', '')
-            )
-            db.session.add(new_session)
+            new_session = mutations.create_session(1, request.get_json(silent=True))
             db.session.commit()
+            recommendation_cache.invalidate_user(1)
             return jsonify(new_session.to_dict()), 201
+        except MutationError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), e.status
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
-    # GET - optionally filter by date
+    # GET - a single day stays a plain list for the planner
     date_filter = request.args.get('date')
-    query = StudySession.query.filter_by(user_id=1)
+    query = db.session.query(*serializers.SESSION.columns).filter(StudySession.user_id == 1)
 
     if date_filter:
         filter_date = datetime.strptime(date_filter, '%Y-%m-%d').date()
-        query = query.filter_by(date=filter_date)
+        sessions = query.filter(StudySession.date == filter_date).order_by(
+            StudySession.start_time, StudySession.id).all()
+        return serializers.list_response(serializers.SESSION, sessions)
 
-    sessions = query.all()
-    return jsonify([s.to_dict() for s in sessions])
+    # Otherwise page through an optional from/to window
+    try:
+        query = filter_date_range(query, StudySession.date)
+        sessions, next_cursor = keyset_page(
+            query,
+            (StudySession.date, StudySession.start_time, StudySession.id),
+            (date, time_type, int),
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit')),
+            descending=request.args.get('order') == 'desc'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return serializers.page_response(serializers.SESSION, sessions, next_cursor)
 
-@app.route('/api/sessions/<int:session_id>', methods=['GET', 'PUT', 'DELETE'])
+@bp.route('/api/sessions/<int:session_id>', methods=['GET', 'PUT', 'DELETE'])
 def handle_session(session_id):
-    session = StudySession.query.filter_by(id=session_id, user_id=1).first()
-
     if request.method == 'DELETE':
-        if session:
-            try:
-                db.session.delete(session)
+        try:
+            if mutations.delete_session(1, session_id):
                 db.session.commit()
-            except Exception as e:
-                db.session.rollback()
-                return jsonify({'error': str(e)}), 500
+                recommendation_cache.invalidate_user(1)
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
         return jsonify({'success': True})
 
     if request.method == 'PUT':
-        if not session:
-            return jsonify({'error': 'Session not found'}), 404
-
         try:
-            data = request.json
-            # Update fields if provided
-            if 'title' in data:
-                session.title = data['title']
-            if 'subject' in data:
-                session.subject = data['subject']
-            if 'date' in data:
-                session.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
-            if 'startTime' in data:
-                session.start_time = datetime.strptime(data['startTime'], '%H:%M').time()
-            if 'endTime' in data:
-                session.end_time = datetime.strptime(data['endTime'], '%H:%M').time()
-            if 'color' in data:
-                session.color = data['color']
-            if 'priority' in data:
-                session.priority = data['priority']
-            if 'notes' in data:
-                session.notes = data['notes']
-
-            session.updated_at = datetime.utcnow()
+            session = mutations.update_session(1, session_id, request.get_json(silent=True))
             db.session.commit()
+            recommendation_cache.invalidate_user(1)
             return jsonify(session.to_dict())
+        except MutationError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), e.status
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
     # GET
+    session = StudySession.query.filter_by(id=session_id, user_id=1).first()
     if not session:
         return jsonify({'error': 'Session not found'}), 404
     return jsonify(session.to_dict())
 
-@app.route('/api/sessions/formatted', methods=['GET'])
+@bp.route('/api/sessions/formatted', methods=['GET'])
 def get_formatted_sessions():
     """Get sessions formatted for dashboard display"""
     date_filter = request.args.get('date', get_today())
     return jsonify(get_sessions_for_date(date_filter))
 
-@app.route('/api/tasks', methods=['GET', 'POST'])
+def minutes_of_day(column):
+    """SQL expression for the minute-of-day of a TIME column.
+
+    SQLite stores TIME as 'HH:MM:SS[.ffffff]' text, so the hour and minute
+    can be sliced out without loading rows into Python.
+    """
+    return (db.cast(db.func.substr(column, 1, 2), db.Integer) * 60
+            + db.cast(db.func.substr(column, 4, 2), db.Integer))
+
+@bp.route('/api/sessions/calendar', methods=['GET'])
+@conditional_on_version()
+def get_sessions_calendar():
+    """Per-day session counts, scheduled minutes and colors for a month or range"""
+    user_id = 1
+    try:
+        month = request.args.get('month')
+        if month:
+            range_start = datetime.strptime(month, '%Y-%m').date()
+            range_end = add_months(range_start, 1) - timedelta(days=1)
+        else:
+            range_start = datetime.strptime(request.args['from'], '%Y-%m-%d').date()
+            range_end = datetime.strptime(request.args['to'], '%Y-%m-%d').date()
+    except (KeyError, ValueError):
+        return jsonify({'error': 'Provide month=YYYY-MM or from/to as YYYY-MM-DD'}), 400
+    if range_end < range_start or (range_end - range_start).days > 366:
+        return jsonify({'error': 'Range must be between 1 and 367 days'}), 400
+
+    rows = db.session.execute(
+        db.select(
+            StudySession.date,
+            StudySession.color,
+            db.func.count(StudySession.id),
+            db.func.sum(minutes_of_day(StudySession.end_time) - minutes_of_day(StudySession.start_time))
+        ).where(
+            StudySession.user_id == user_id,
+            StudySession.date >= range_start,
+            StudySession.date <= range_end
+        ).group_by(StudySession.date, StudySession.color).order_by(StudySession.date, StudySession.color)
+    ).all()
+
+    days = {}
+    for day, color, count, minutes in rows:
+        key = day.strftime('%Y-%m-%d')
+        summary = days.setdefault(key, {'date': key, 'sessions': 0, 'minutes': 0, 'colors': []})
+        summary['sessions'] += count
+        summary['minutes'] += minutes or 0
+        summary['colors'].append(color)
+
+    return jsonify({
+        'from': range_start.strftime('%Y-%m-%d'),
+        'to': range_end.strftime('%Y-%m-%d'),
+        'days': list(days.values())
+    })
+
+# Free-slot queries cover at most this many days
+MAX_FREE_SLOT_DAYS = 366
+
+@bp.route('/api/sessions/free-slots', methods=['GET'])
+@conditional_on_version(bucket=today_bucket)
+def get_free_slots():
+    """Free time between sessions within daily hours over a date range"""
+    try:
+        range_start = datetime.strptime(request.args.get('from', get_today()), '%Y-%m-%d').date()
+        range_end = datetime.strptime(request.args['to'], '%Y-%m-%d').date() \
+            if request.args.get('to') else range_start + timedelta(days=6)
+        day_start = parse_minute(request.args.get('dayStart', '08:00'))
+        day_end = parse_minute(request.args.get('dayEnd', '22:00'))
+        min_minutes = int(request.args.get('minMinutes', 30))
+        break_minutes = int(request.args.get('breakMinutes', 0))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if range_end < range_start or (range_end - range_start).days >= MAX_FREE_SLOT_DAYS:
+        return jsonify({'error': f'Range must be between 1 and {MAX_FREE_SLOT_DAYS} days'}), 400
+    if day_end <= day_start or min_minutes < 1 or not 0 <= break_minutes <= 240:
+        return jsonify({'error': 'dayEnd must follow dayStart, minMinutes be positive and breakMinutes 0-240'}), 400
+
+    windows = [[(day_start, day_end)]] * 7
+    slots = [
+        {
+            'date': day.strftime('%Y-%m-%d'),
+            'startTime': format_minute(start),
+            'endTime': format_minute(end),
+            'minutes': end - start
+        } for day, start, end in iter_free_time(1, range_start, range_end, windows, break_minutes, min_minutes)
+    ]
+    return jsonify({
+        'from': range_start.strftime('%Y-%m-%d'),
+        'to': range_end.strftime('%Y-%m-%d'),
+        'slots': slots,
+        'totalMinutes': sum(slot['minutes'] for slot in slots)
+    })
+
+@bp.route('/api/tasks', methods=['GET', 'POST'])
+@conditional_on_version(bucket=today_bucket)
 def handle_tasks():
     if request.method == 'POST':
         try:
-            data = request.json
-            due_date = datetime.strptime(data['dueDate'], '%Y-%m-%d').date()
-
-            new_task = Task(
-                user_id=1,
-                title=data['title'],
-                due_date=due_date,
-                completed=False
-            )
-            db.session.add(new_task)
+            new_task = mutations.create_task(1, request.get_json(silent=True))
             db.session.commit()
+            recommendation_cache.invalidate_user(1)
 
             result = new_task.to_dict()
             result['due'] = format_task_due(result['dueDate'])
             return jsonify(result), 201
+        except MutationError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), e.status
         except Exception as e:
             db.session.rollback()
             return jsonify({'error': str(e)}), 500
 
     # Return tasks with formatted due dates
-    tasks = Task.query.filter_by(user_id=1).all()
-    formatted = []
-    for task in tasks:
-        task_dict = task.to_dict()
-        task_dict['due'] = format_task_due(task_dict['dueDate'])
-        formatted.append(task_dict)
-    return jsonify(formatted)
+    return serializers.list_response(serializers.TASK_WITH_DUE, task_rows_with_due(1, (Task.id,)))
 
-@app.route('/api/tasks/<int:task_id>/toggle', methods=['POST'])
-def toggle_task(task_id):
-    task = Task.query.filter_by(id=task_id, user_id=1).first()
-    if not task:
-        return jsonify({'error': 'Task not found'}), 404
+def task_response(task):
+    result = task.to_dict()
+    result['due'] = format_task_due(result['dueDate'])
+    return result
 
+@bp.route('/api/tasks/<int:task_id>/toggle', methods=['POST'])
+def toggle_task(task_id):
     try:
-        task.completed = not task.completed
-        task.updated_at = datetime.utcnow()
+        task = mutations.toggle_task(1, task_id)
         db.session.commit()
-
-        result = task.to_dict()
-        result['due'] = format_task_due(result['dueDate'])
-        return jsonify(result)
+        recommendation_cache.invalidate_user(1)
+        return jsonify(task_response(task))
+    except MutationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/tasks/<int:task_id>', methods=['DELETE'])
+@bp.route('/api/tasks/<int:task_id>', methods=['DELETE'])
 def delete_task(task_id):
-    task = Task.query.filter_by(id=task_id, user_id=1).first()
-    if task:
-        try:
-            db.session.delete(task)
+    try:
+        if mutations.delete_task(1, task_id):
             db.session.commit()
+            recommendation_cache.invalidate_user(1)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    return jsonify({'success': True})
+
+MAX_BATCH_OPERATIONS = 500
+
+def apply_batch_operation(user_id, operation):
+    """Stage one batch operation; returns (status, payload)"""
+    op = operation.get('op')
+    kind = operation.get('type')
+    data = operation.get('data') or {}
+    item_id = operation.get('id')
+    # bool is a subclass of int; a JSON true must not address id 1
+    if op != 'create' and (not isinstance(item_id, int) or isinstance(item_id, bool)):
+        raise MutationError("'id' must be an integer for update, delete and toggle")
+
+    if kind == 'session':
+        if op == 'create':
+            session = mutations.create_session(user_id, data)
+            db.session.flush()
+            return 201, session.to_dict()
+        if op == 'update':
+            return 200, mutations.update_session(user_id, item_id, data).to_dict()
+        if op == 'delete':
+            return 200, {'deleted': mutations.delete_session(user_id, item_id)}
+    elif kind == 'task':
+        if op == 'create':
+            task = mutations.create_task(user_id, data)
+            db.session.flush()
+            return 201, task_response(task)
+        if op == 'update':
+            return 200, task_response(mutations.update_task(user_id, item_id, data))
+        if op == 'toggle':
+            return 200, task_response(mutations.toggle_task(user_id, item_id))
+        if op == 'delete':
+            return 200, {'deleted': mutations.delete_task(user_id, item_id)}
+    else:
+        raise MutationError("'type' must be 'session' or 'task'")
+    raise MutationError(f"Unsupported operation {op!r} for {kind}")
+
+@bp.route('/api/batch', methods=['POST'])
+def apply_batch():
+    """Apply an ordered list of session/task writes in a single transaction"""
+    payload = request.get_json(silent=True) or {}
+    operations = payload.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': "'operations' must be a non-empty list"}), 400
+    if len(operations) > MAX_BATCH_OPERATIONS:
+        return jsonify({'error': f'At most {MAX_BATCH_OPERATIONS} operations per batch'}), 400
+
+    results = []
+    for index, operation in enumerate(operations):
+        try:
+            if not isinstance(operation, dict):
+                raise MutationError('Each operation must be an object')
+            status, data = apply_batch_operation(1, operation)
+            results.append({'index': index, 'status': status, 'data': data})
+        except (MutationError, ValueError) as e:
+            # All or nothing: one bad operation discards the whole batch
+            db.session.rollback()
+            status = e.status if isinstance(e, MutationError) else 400
+            results.append({'index': index, 'status': status, 'error': str(e)})
+            return jsonify({'success': False, 'failedIndex': index, 'results': results}), status
         except Exception as e:
             db.session.rollback()
-            return jsonify({'error': str(e)}), 500
-    return jsonify({'success': True})
+            return jsonify({'success': False, 'failedIndex': index, 'error': str(e)}), 500
+
+    try:
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    recommendation_cache.invalidate_user(1)
+    return jsonify({'success': True, 'results': results})
 
-@app.route('/api/dashboard/stats', methods=['GET'])
+@bp.route('/api/plan/preview', methods=['POST'])
+def preview_plan():
+    """Plan pending tasks into free time without saving anything"""
+    try:
+        return jsonify(autoschedule.build_plan(1, request.get_json(silent=True) or {}))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/api/plan/commit', methods=['POST'])
+def commit_plan():
+    """Save a previewed plan as study sessions in one transaction"""
+    try:
+        plan = autoschedule.commit_plan(1, request.get_json(silent=True) or {})
+        db.session.commit()
+    except MutationError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), e.status
+    except (ValueError, TypeError) as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    recommendation_cache.invalidate_user(1)
+    return jsonify(plan), 201
+
+@bp.route('/api/sync', methods=['GET'])
+@conditional_on_version()
+def sync_changes():
+    """Inserts, updates and tombstones since the client's ?since=<version>"""
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': "'since' must be an integer version"}), 400
+    entities = request.args.get('entities')
+    if entities:
+        entities = entities.split(',')
+        unknown = [e for e in entities if e not in SYNC_ENTITIES]
+        if unknown:
+            return jsonify({'error': f"Unknown entities: {', '.join(unknown)}"}), 400
+    try:
+        return jsonify(changes_since(1, since, entities, cursor=request.args.get('cursor')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+def bulk_format(default='ndjson'):
+    """Pick ndjson or csv from ?format= or the request content type"""
+    fmt = request.args.get('format')
+    if not fmt and request.mimetype in ('text/csv', 'application/csv'):
+        fmt = 'csv'
+    return fmt or default
+
+@bp.route('/api/import/<kind>', methods=['POST'])
+def import_data(kind):
+    """Stream NDJSON or CSV rows into the database in batched transactions"""
+    if kind not in BULK_KINDS:
+        return jsonify({'error': f'Unknown kind {kind!r}'}), 404
+    fmt = bulk_format()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+
+    records = iter_csv(request.stream) if fmt == 'csv' else iter_ndjson(request.stream)
+    try:
+        result = import_records(kind, records, user_id=1)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    finally:
+        recommendation_cache.invalidate_user(1)
+    return jsonify(result), 200 if not result['failed'] else 207
+
+@bp.route('/api/export/<kind>', methods=['GET'])
+def export_data(kind):
+    """Stream a user's rows as NDJSON or CSV"""
+    if kind not in BULK_KINDS:
+        return jsonify({'error': f'Unknown kind {kind!r}'}), 404
+    fmt = bulk_format()
+    if fmt == 'csv':
+        body, mimetype = export_csv(kind, 1), 'text/csv'
+    elif fmt == 'ndjson':
+        body, mimetype = export_ndjson(kind, 1), 'application/x-ndjson'
+    else:
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename={kind}.{fmt}'
+    })
+
+@bp.route('/api/dashboard/stats', methods=['GET'])
+@conditional_on_version(bucket=minute_bucket)
 def get_dashboard_stats():
     user_id = 1
+    today_date = date.today()
+    current_time_obj = datetime.now().time()
+
+    # Task and focus totals as scalar subqueries so everything is one round trip
+    total_tasks_q = db.select(db.func.count(Task.id)).where(
+        Task.user_id == user_id
+    ).scalar_subquery()
+    completed_tasks_q = db.select(db.func.count(Task.id)).where(
+        Task.user_id == user_id, Task.completed.is_(True)
+    ).scalar_subquery()
+    session_count_q = db.select(db.func.count(FocusSession.id)).where(
+        FocusSession.user_id == user_id
+    ).scalar_subquery()
+    total_minutes_q = db.select(db.func.coalesce(db.func.sum(FocusSession.duration), 0)).where(
+        FocusSession.user_id == user_id
+    ).scalar_subquery()
+
+    # Missed sessions: today's sessions already started with no matching focus session
+    completed_focus = db.select(FocusSession.id).where(
+        FocusSession.user_id == user_id,
+        FocusSession.date == today_date,
+        FocusSession.subject == StudySession.title
+    ).exists()
+    missed_sessions_q = db.select(db.func.count(StudySession.id)).where(
+        StudySession.user_id == user_id,
+        StudySession.date == today_date,
+        StudySession.start_time < current_time_obj,
+        ~completed_focus
+    ).scalar_subquery()
+
+    row = db.session.execute(db.select(
+        total_tasks_q, completed_tasks_q, session_count_q, total_minutes_q, missed_sessions_q
+    )).one()
+    total_tasks, completed_tasks, session_count, total_minutes, missed_sessions = row
 
-    # Task stats
-    tasks = Task.query.filter_by(user_id=user_id).all()
-    completed_tasks = sum(1 for t in tasks if t.completed)
-    total_tasks = len(tasks)
     completion_rate = (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
 
-    # Focus time stats
-    focus_sessions_list = FocusSession.query.filter_by(user_id=user_id).all()
-    total_minutes = sum(s.duration for s in focus_sessions_list)
     total_hours = total_minutes // 60
     total_mins = total_minutes % 60
 
-    avg_minutes = total_minutes // len(focus_sessions_list) if focus_sessions_list else 0
+    avg_minutes = total_minutes // session_count if session_count else 0
     avg_hours = avg_minutes // 60
     avg_mins = avg_minutes % 60
 
-    # Calculate streak
-    longest_streak = calculate_longest_streak_db(user_id)
-
-    # Calculate missed sessions
-    today_date = date.today()
-    current_time_obj = datetime.now().time()
-
-    missed_sessions = 0
-    todays_sessions = StudySession.query.filter_by(user_id=user_id, date=today_date).all()
-    for session in todays_sessions:
-        if session.start_time < current_time_obj:
-            # Check if completed
-            focus_completed = FocusSession.query.filter_by(
-                user_id=user_id,
-                date=today_date,
-                subject=session.title
-            ).first()
-            if not focus_completed:
-                missed_sessions += 1
+    longest_streak = get_streak(user_id).longest_streak
 
     return jsonify({
         'completedTasks': completed_tasks,
@@ -343,54 +624,123 @@ def get_dashboard_stats():
         'averageSession': f"{avg_hours}h {avg_mins}m",
         'longestStreak': f"{longest_streak} days",
         'totalFocusMinutes': total_minutes,
-        'sessionCount': len(focus_sessions_list),
+        'sessionCount': session_count,
         'missedSessions': missed_sessions
     })
 
-@app.route('/api/progress/stats', methods=['GET'])
+PROGRESS_RANGES = {'week': 7, 'month': 30, 'year': 365}
+# Longest custom from/to span, matching /api/sessions/calendar
+MAX_PROGRESS_DAYS = 367
+
+def parse_progress_range(today_date):
+    """Resolve the from/to or range query parameters to a date span.
+
+    Raises ValueError for malformed dates, reversed or overlong spans.
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    if date_from or date_to:
+        try:
+            end = datetime.strptime(date_to, '%Y-%m-%d').date() if date_to else today_date
+            start = datetime.strptime(date_from, '%Y-%m-%d').date() if date_from else end - timedelta(days=6)
+        except ValueError:
+            raise ValueError('Provide from/to as YYYY-MM-DD')
+        if end < start or (end - start).days >= MAX_PROGRESS_DAYS:
+            raise ValueError(f'Range must be between 1 and {MAX_PROGRESS_DAYS} days')
+        return start, end, True
+    days = PROGRESS_RANGES.get(request.args.get('range', 'week'), 7)
+    return today_date - timedelta(days=days - 1), today_date, 'range' in request.args
+
+def build_range_series(user_id, start, end):
+    """Chart points for a range: daily up to two months, monthly beyond"""
+    daily = daily_series(user_id, start, end)
+    if (end - start).days <= 62:
+        series = []
+        day = start
+        while day <= end:
+            minutes, sessions = daily.get(day, (0, 0))
+            series.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'dayName': day.strftime('%a'),
+                'label': day.strftime('%a') if (end - start).days < 7 else day.strftime('%b %d'),
+                'minutes': minutes,
+                'sessions': sessions
+            })
+            day += timedelta(days=1)
+        return series
+
+    months = {}
+    for day, (minutes, sessions) in daily.items():
+        totals = months.setdefault(month_start(day), [0, 0])
+        totals[0] += minutes
+        totals[1] += sessions
+    series = []
+    month = month_start(start)
+    while month <= end:
+        minutes, sessions = months.get(month, (0, 0))
+        series.append({
+            'date': month.strftime('%Y-%m-%d'),
+            'label': month.strftime('%b'),
+            'minutes': minutes,
+            'sessions': sessions
+        })
+        month = add_months(month, 1)
+    return series
+
+@bp.route('/api/progress/stats', methods=['GET'])
+@conditional_on_version(bucket=today_bucket)
 def get_progress_stats():
     """Get comprehensive progress statistics"""
     user_id = 1
+    today = datetime.now()
+    today_date = today.date()
+    try:
+        range_start, range_end, filtered = parse_progress_range(today_date)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    streak = get_streak(user_id)
 
     # Task stats
-    tasks = Task.query.filter_by(user_id=user_id).all()
-    completed_tasks = sum(1 for t in tasks if t.completed)
-    total_tasks = len(tasks)
-
-    # Focus time stats
-    focus_sessions_list = FocusSession.query.filter_by(user_id=user_id).all()
-    total_minutes = sum(s.duration for s in focus_sessions_list)
+    total_tasks, completed_tasks = db.session.execute(
+        db.select(
+            db.func.count(Task.id),
+            db.func.coalesce(db.func.sum(db.case((Task.completed.is_(True), 1), else_=0)), 0)
+        ).where(Task.user_id == user_id)
+    ).one()
+
+    # Focus time stats, served from the daily rollup
+    lifetime_subjects = subject_totals(user_id)
+    total_minutes = sum(lifetime_subjects.values())
     total_hours = total_minutes // 60
-
-    # Subject breakdown
-    subject_times = {}
-    for session in focus_sessions_list:
-        subject = session.subject
-        subject_times[subject] = subject_times.get(subject, 0) + session.duration
+    subject_times = subject_totals(user_id, range_start, range_end) if filtered else lifetime_subjects
 
     # Weekly data for charts
-    today = datetime.now()
+    weekly_start = today_date - timedelta(days=6)
+    weekly = daily_series(user_id, weekly_start, today_date)
     weekly_data = []
     for i in range(6, -1, -1):
         day = today - timedelta(days=i)
         day_date = day.date()
-        day_sessions = FocusSession.query.filter_by(user_id=user_id, date=day_date).all()
+        minutes, sessions = weekly.get(day_date, (0, 0))
         weekly_data.append({
             'date': day_date.strftime('%Y-%m-%d'),
             'dayName': day.strftime('%a'),
-            'minutes': sum(s.duration for s in day_sessions),
-            'sessions': len(day_sessions)
+            'minutes': minutes,
+            'sessions': sessions
         })
 
-    # Monthly task completion data (simulated for now)
+    # Monthly task completion data for the last five months
+    last_month = month_start(today_date)
+    first_month = add_months(last_month, -4)
+    monthly = monthly_tasks(user_id, first_month, last_month)
     monthly_data = []
     for i in range(4, -1, -1):
-        month = today - timedelta(days=i*30)
-        month_name = month.strftime('%b')
+        month = add_months(last_month, -i)
+        created, completed = monthly.get(month, (0, 0))
         monthly_data.append({
-            'month': month_name,
-            'completed': 30 + (4-i) * 5,
-            'total': 50 + (4-i) * 3
+            'month': month.strftime('%b'),
+            'completed': completed,
+            'total': created
         })
 
     return jsonify({
@@ -399,19 +749,23 @@ def get_progress_stats():
         'totalStudyHours': total_hours,
         'totalStudyMinutes': total_minutes,
         'subjectsStudied': len(subject_times),
-        'currentStreak': calculate_longest_streak_db(user_id),
+        'currentStreak': current_streak(streak),
+        'longestStreak': streak.longest_streak,
         'subjectBreakdown': subject_times,
         'weeklyData': weekly_data,
-        'monthlyData': monthly_data
+        'monthlyData': monthly_data,
+        'rangeData': build_range_series(user_id, range_start, range_end) if filtered else weekly_data
     })
 
-@app.route('/api/focus/start', methods=['POST'])
+@bp.route('/api/focus/start', methods=['POST'])
 def start_focus_session():
     try:
         # Check if there's already an active session
         existing = CurrentFocusSession.query.filter_by(user_id=1).first()
         if existing:
             db.session.delete(existing)
+            # Deletes flush after inserts, which would trip the unique user_id
+            db.session.flush()
 
         current_session = CurrentFocusSession(
             user_id=1,
@@ -420,13 +774,14 @@ def start_focus_session():
         )
         db.session.add(current_session)
         db.session.commit()
+        event_broker.publish(1, 'focus', {'active': True, 'session': current_session.to_dict()})
 
         return jsonify({'success': True, 'session': current_session.to_dict()})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/focus/end', methods=['POST'])
+@bp.route('/api/focus/end', methods=['POST'])
 def end_focus_session():
     current = CurrentFocusSession.query.filter_by(user_id=1).first()
     if not current:
@@ -446,10 +801,14 @@ def end_focus_session():
             duration=duration_minutes
         )
         db.session.add(focus_session)
+        record_focus_session(1, focus_session.date, focus_session.subject, duration_minutes)
+        record_activity(1, focus_session.date)
 
         # Remove current session
         db.session.delete(current)
         db.session.commit()
+        recommendation_cache.invalidate_user(1)
+        event_broker.publish(1, 'focus', {'active': False, 'session': focus_session.to_dict()})
 
         return jsonify({
             'success': True,
@@ -460,7 +819,7 @@ def end_focus_session():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/focus/current', methods=['GET'])
+@bp.route('/api/focus/current', methods=['GET'])
 def get_current_session():
     current = CurrentFocusSession.query.filter_by(user_id=1).first()
     return jsonify({
@@ -468,12 +827,45 @@ def get_current_session():
         'session': current.to_dict() if current else None
     })
 
-@app.route('/api/focus/history', methods=['GET'])
+@bp.route('/api/focus/history', methods=['GET'])
+@conditional_on_version()
 def get_focus_history():
-    sessions = FocusSession.query.filter_by(user_id=1).all()
-    return jsonify([s.to_dict() for s in sessions])
-
-@app.route('/api/date/current', methods=['GET'])
+    try:
+        query = filter_date_range(
+            db.session.query(*serializers.FOCUS.columns).filter(FocusSession.user_id == 1), FocusSession.date)
+        sessions, next_cursor = keyset_page(
+            query,
+            (FocusSession.date, FocusSession.start_time, FocusSession.id),
+            (date, datetime, int),
+            cursor=request.args.get('cursor'),
+            limit=parse_page_size(request.args.get('limit')),
+            descending=request.args.get('order') == 'desc'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return serializers.page_response(serializers.FOCUS, sessions, next_cursor)
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Request, query and span metrics in the Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@bp.route('/api/profiling/report', methods=['GET'])
+def profiling_report():
+    """Top functions across recent profiles of one endpoint (or all of them)"""
+    if not current_app.config['PROFILING_ENABLED']:
+        return jsonify({'error': 'Profiling is disabled'}), 404
+    root = current_app.config['PROFILING_DIR']
+    try:
+        limit = int(request.args.get('limit', 30))
+        result = profiling.report(root, request.args.get('endpoint'), limit=limit,
+                                  sort=request.args.get('sort', 'cumulative'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    result['endpoints'] = profiling.profiled_endpoints(root)
+    return jsonify(result)
+
+@bp.route('/api/date/current', methods=['GET'])
 def get_current_date():
     """Get current date info"""
     today = datetime.now()
@@ -485,108 +877,9 @@ def get_current_date():
 
 def get_user_context(user_id=1):
     """Gather all user data for AI context"""
-    today_date = date.today()
-    now = datetime.now()
-
-    # Get upcoming tasks (next 7 days)
-    upcoming_tasks = Task.query.filter_by(user_id=user_id).filter(
-        Task.due_date >= today_date,
-        Task.due_date <= today_date + timedelta(days=7)
-    ).order_by(Task.due_date).all()
-
-    # Get overdue tasks
-    overdue_tasks = Task.query.filter_by(user_id=user_id, completed=False).filter(
-        Task.due_date < today_date
-    ).all()
-
-    # Get today's study sessions
-    todays_sessions = StudySession.query.filter_by(user_id=user_id, date=today_date).order_by(
-        StudySession.start_time
-    ).all()
-
-    # Get upcoming sessions (next 3 days)
-    upcoming_sessions = StudySession.query.filter_by(user_id=user_id).filter(
-        StudySession.date > today_date,
-        StudySession.date <= today_date + timedelta(days=3)
-    ).order_by(StudySession.date, StudySession.start_time).all()
-
-    # Get recent focus history (last 7 days)
-    recent_focus = FocusSession.query.filter_by(user_id=user_id).filter(
-        FocusSession.date >= today_date - timedelta(days=7)
-    ).all()
-
-    # Calculate study patterns
-    subject_times = {}
-    total_study_minutes = 0
-    for session in recent_focus:
-        subject_times[session.subject] = subject_times.get(session.subject, 0) + session.duration
-        total_study_minutes += session.duration
-
-    # Task completion stats
-    all_tasks = Task.query.filter_by(user_id=user_id).all()
-    completed_tasks = sum(1 for t in all_tasks if t.completed)
-    total_tasks = len(all_tasks)
-
-    context = {
-        'current_datetime': now.strftime('%A, %B %d, %Y at %I:%M %p'),
-        'upcoming_tasks': [
-            {
-                'title': t.title,
-                'due_date': t.due_date.strftime('%A, %B %d'),
-                'days_until': (t.due_date - today_date).days,
-                'completed': t.completed
-            } for t in upcoming_tasks
-        ],
-        'overdue_tasks': [
-            {
-                'title': t.title,
-                'due_date': t.due_date.strftime('%B %d'),
-                'days_overdue': (today_date - t.due_date).days
-            } for t in overdue_tasks
-        ],
-        'todays_sessions': [
-            {
-                'title': s.title,
-                'subject': s.subject,
-                'start_time': s.start_time.strftime('%I:%M %p'),
-                'end_time': s.end_time.strftime('%I:%M %p'),
-                'priority': s.priority
-            } for s in todays_sessions
-        ],
-        'upcoming_sessions': [
-            {
-                'title': s.title,
-                'subject': s.subject,
-                'date': s.date.strftime('%A, %B %d'),
-                'start_time': s.start_time.strftime('%I:%M %p'),
-                'end_time': s.end_time.strftime('%I:%M %p')
-            } for s in upcoming_sessions
-        ],
-        'study_patterns': {
-            'total_minutes_last_7_days': total_study_minutes,
-            'total_hours_last_7_days': round(total_study_minutes / 60, 1),
-            'subject_breakdown': subject_times,
-            'average_daily_minutes': round(total_study_minutes / 7, 1)
-        },
-        'task_stats': {
-            'completed': completed_tasks,
-            'total': total_tasks,
-            'completion_rate': round((completed_tasks / total_tasks * 100) if total_tasks > 0 else 0)
-        },
-        'streak': calculate_longest_streak_db(user_id)
-    }
-
-    return context
-
-@app.route('/api/ai/recommendations', methods=['GET'])
-def get_ai_recommendations():
-    """Generate personalized AI recommendations using OpenAI"""
-    try:
-        # Get user context
-        context = get_user_context(user_id=1)
+    return build_user_context(user_id)
 
-        # Build the prompt
-        system_prompt = """You are a helpful study assistant for a student using a study planner app.
+RECOMMENDATION_SYSTEM_PROMPT = """You are a helpful study assistant for a student using a study planner app.
 Your job is to provide personalized, actionable study recommendations based on their current tasks,
 scheduled sessions, and study patterns.
 
@@ -600,21 +893,24 @@ Be encouraging but practical. Focus on:
 Keep each recommendation concise (1-2 sentences). Be specific to their actual data.
 Return exactly 4-5 recommendations as a JSON array of strings."""
 
-        user_prompt = f"""Here is the student's current study data:
+def build_recommendation_prompt(context):
+    """Render the user prompt for the recommendations completion"""
+    sections = prompt_sections(context)
+    return f"""Here is the student's current study data:
 
 **Current Date/Time:** {context['current_datetime']}
 
 **Today's Scheduled Sessions:**
-{format_sessions_for_prompt(context['todays_sessions'])}
+{sections['todays_sessions']}
 
 **Upcoming Tasks (Next 7 Days):**
-{format_tasks_for_prompt(context['upcoming_tasks'])}
+{sections['upcoming_tasks']}
 
 **Overdue Tasks:**
-{format_overdue_for_prompt(context['overdue_tasks'])}
+{sections['overdue_tasks']}
 
 **Upcoming Sessions (Next 3 Days):**
-{format_upcoming_sessions_for_prompt(context['upcoming_sessions'])}
+{sections['upcoming_sessions']}
 
 **Study Patterns (Last 7 Days):**
 - Total study time: {context['study_patterns']['total_hours_last_7_days']} hours
@@ -626,99 +922,237 @@ Return exactly 4-5 recommendations as a JSON array of strings."""
 
 Based on this data, provide 4-5 personalized study recommendations. Return as a JSON array of strings."""
 
-        # Call OpenAI API
-        response = openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            max_tokens=500
-        )
-
-        # Parse the response
-        content = response.choices[0].message.content.strip()
-
-        # Try to extract JSON from the response
-        import json
-        try:
-            # Remove markdown code blocks if present
-            if content.startswith('```'):
-                content = content.split('```')[1]
-                if content.startswith('json'):
-                    content = content[4:]
-            recommendations = json.loads(content)
-        except json.JSONDecodeError:
-            # Fallback: split by newlines and clean up
-            lines = [line.strip() for line in content.split('\n') if line.strip()]
-            recommendations = [line.lstrip('0123456789.-) ') for line in lines if len(line) > 10][:5]
-
+def parse_recommendations(content):
+    """Extract a list of recommendations from a completion"""
+    content = content.strip()
+    try:
+        # Remove markdown code blocks if present
+        if content.startswith('```'):
+            content = content.split('```')[1]
+            if content.startswith('json'):
+                content = content[4:]
+        return json.loads(content)
+    except json.JSONDecodeError:
+        # Fallback: split by newlines and clean up
+        lines = [line.strip() for line in content.split('\n') if line.strip()]
+        return [line.lstrip('0123456789.-) ') for line in lines if len(line) > 10][:5]
+
+def generate_recommendations(context):
+    """Call OpenAI to generate recommendations for a user context"""
+    response = llm.chat(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": RECOMMENDATION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_recommendation_prompt(context)}
+        ],
+        max_tokens=500
+    )
+    return parse_recommendations(response.choices[0].message.content)
+
+def refresh_recommendations(user_id, cache_key, context):
+    """Generate recommendations and store them in the cache"""
+    recommendations = generate_recommendations(context)
+    recommendation_cache.set(cache_key, recommendations)
+    return recommendations
+
+def enrichment_enabled():
+    """Whether OpenAI may be asked for recommendations at all right now"""
+    return AI_RECOMMENDATIONS == 'openai' and llm.available()
+
+def enrichment_due(user_id):
+    """Whether to generate recommendations for a user whose context changed"""
+    if not enrichment_enabled():
+        return False
+    _, age = recommendation_cache.last_good(user_id)
+    return age is None or age >= AI_ENRICH_INTERVAL
+
+@bp.route('/api/ai/recommendations', methods=['GET'])
+def get_ai_recommendations():
+    """Serve generated recommendations when current, else the local ones"""
+    user_id = 1
+    context = None
+    try:
+        # Get user context
+        context = get_user_context(user_id=user_id)
+        context_summary = {
+            'tasks_due_soon': context['counts']['upcoming_tasks'],
+            'overdue_tasks': context['counts']['overdue_tasks'],
+            'sessions_today': context['counts']['todays_sessions'],
+            'study_hours_this_week': context['study_patterns']['total_hours_last_7_days']
+        }
+
+        # Identical contexts produce identical completions, so reuse them
+        cache_key = context_key(user_id, context)
+        force_refresh = request.args.get('refresh') == '1'
+        recommendations, age = None, None
+        if not force_refresh:
+            recommendations, age = recommendation_cache.get_with_age(cache_key)
+        if recommendations is not None:
+            return jsonify({
+                'success': True,
+                'recommendations': recommendations,
+                'source': 'openai',
+                'cached': True,
+                'stale': False,
+                'refreshing': False,
+                'age_seconds': round(age),
+                'context_summary': context_summary
+            })
+
+        # Generated recommendations are requested off the request thread, and
+        # concurrent requests for the same user share one generation. While
+        # one runs, the last good answer is served marked stale; otherwise the
+        # local recommendations, which always match the current data
+        refreshing = enrichment_enabled() if force_refresh else enrichment_due(user_id)
+        stale, age = None, None
+        if refreshing:
+            recommendation_executor.submit(user_id, refresh_recommendations, user_id, cache_key, context)
+            stale, age = recommendation_cache.last_good(user_id)
         return jsonify({
             'success': True,
-            'recommendations': recommendations,
-            'context_summary': {
-                'tasks_due_soon': len(context['upcoming_tasks']),
-                'overdue_tasks': len(context['overdue_tasks']),
-                'sessions_today': len(context['todays_sessions']),
-                'study_hours_this_week': context['study_patterns']['total_hours_last_7_days']
-            }
+            'recommendations': heuristics.recommend(context) if stale is None else stale,
+            'source': 'local' if stale is None else 'openai',
+            'cached': stale is not None,
+            'stale': stale is not None,
+            'refreshing': refreshing,
+            'age_seconds': round(age) if age is not None else None,
+            'context_summary': context_summary
         })
 
     except Exception as e:
-        # Fallback to default recommendations on error
+        # Fallback to local recommendations on error
         return jsonify({
             'success': False,
             'error': str(e),
-            'recommendations': [
-                "Review your upcoming tasks and prioritize based on due dates.",
-                "Consider scheduling focused study blocks for challenging subjects.",
-                "Take regular breaks using the Pomodoro technique (25 min work, 5 min break).",
-                "Try active recall techniques like flashcards for better retention.",
-                "Make sure to get adequate sleep before exams for optimal performance."
-            ]
+            'recommendations': heuristics.recommend(context) if context else heuristics.GENERAL_TIPS,
+            'source': 'local'
         })
 
-def format_sessions_for_prompt(sessions):
-    if not sessions:
-        return "No sessions scheduled for today."
-    return "\n".join([f"- {s['title']} ({s['start_time']} - {s['end_time']}, {s['priority']} priority)" for s in sessions])
-
-def format_tasks_for_prompt(tasks):
-    if not tasks:
-        return "No upcoming tasks."
-    return "\n".join([f"- {t['title']} (due {t['due_date']}, {t['days_until']} days left, {'completed' if t['completed'] else 'pending'})" for t in tasks])
-
-def format_overdue_for_prompt(tasks):
-    if not tasks:
-        return "No overdue tasks."
-    return "\n".join([f"- {t['title']} ({t['days_overdue']} days overdue)" for t in tasks])
-
-def format_upcoming_sessions_for_prompt(sessions):
-    if not sessions:
-        return "No upcoming sessions."
-    return "\n".join([f"- {s['title']} on {s['date']} ({s['start_time']} - {s['end_time']})" for s in sessions])
-
-def calculate_longest_streak_db(user_id):
-    """Calculate longest streak using database queries"""
-    sessions = FocusSession.query.filter_by(user_id=user_id).with_entities(
-        FocusSession.date
-    ).distinct().order_by(FocusSession.date).all()
-
-    if not sessions:
-        return 0
-
-    dates = [s.date for s in sessions]
-    longest = 1
-    current = 1
-
-    for i in range(1, len(dates)):
-        if (dates[i] - dates[i-1]).days == 1:
-            current += 1
-            longest = max(longest, current)
-        else:
-            current = 1
+def stream_generated_recommendations(context):
+    """Yield recommendations one by one as the OpenAI stream completes them"""
+    deltas = llm.stream(
+        model="gpt-4o-mini",
+        messages=[
+            {"role": "system", "content": RECOMMENDATION_SYSTEM_PROMPT},
+            {"role": "user", "content": build_recommendation_prompt(context)}
+        ],
+        max_tokens=500
+    )
+    parser = JSONArrayStreamParser()
+    emitted = 0
+    for delta in deltas:
+        for item in parser.feed(delta):
+            emitted += 1
+            yield item
+
+    # The model ignored the JSON instruction; fall back to the line parser
+    if not emitted:
+        for item in parse_recommendations(parser.text):
+            yield item
+
+def format_sse(event, data, event_id=None):
+    """Encode a server-sent event"""
+    prefix = f"id: {event_id}\n" if event_id is not None else ''
+    return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@bp.route('/api/ai/recommendations/stream', methods=['GET'])
+def stream_ai_recommendations():
+    """Stream recommendations to the browser as server-sent events"""
+    user_id = 1
+    context = get_user_context(user_id=user_id)
+    cache_key = context_key(user_id, context)
+    force_refresh = request.args.get('refresh') == '1'
+
+    cached, age = (None, None) if force_refresh else recommendation_cache.get_with_age(cache_key)
+    live = force_refresh and enrichment_enabled()
+    refreshing = stale = False
+    if cached is None and not live:
+        # Generation happens off-thread; until it lands, first paint is the
+        # last good answer marked stale, or the local rules if there is none
+        refreshing = enrichment_due(user_id)
+        if refreshing:
+            recommendation_executor.submit(user_id, refresh_recommendations, user_id, cache_key, context)
+            cached, age = recommendation_cache.last_good(user_id)
+            stale = cached is not None
+
+    def generate():
+        if not live:
+            source = 'local' if cached is None else 'openai'
+            items = heuristics.recommend(context) if cached is None else cached
+            for index, text in enumerate(items):
+                yield format_sse('recommendation', {'index': index, 'text': text})
+            yield format_sse('done', {
+                'source': source,
+                'cached': cached is not None,
+                'stale': stale,
+                'refreshing': refreshing,
+                'age_seconds': round(age) if age is not None else None
+            })
+            return
+
+        recommendations = []
+        try:
+            for text in stream_generated_recommendations(context):
+                yield format_sse('recommendation', {'index': len(recommendations), 'text': text})
+                recommendations.append(text)
+        except Exception as e:
+            yield format_sse('error', {
+                'error': str(e),
+                'recommendations': [] if recommendations else heuristics.recommend(context)
+            })
+            return
+
+        if recommendations:
+            recommendation_cache.set(cache_key, recommendations)
+        yield format_sse('done', {'source': 'openai', 'cached': False, 'stale': False,
+                                  'refreshing': False, 'age_seconds': 0})
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
-    return longest
+def live_state(user_id):
+    """Data version and focus timer state sent when an event stream (re)connects"""
+    current = CurrentFocusSession.query.filter_by(user_id=user_id).first()
+    return {
+        'version': current_version(user_id),
+        'focus': {'active': current is not None, 'session': current.to_dict() if current else None}
+    }
+
+@bp.route('/api/events', methods=['GET'])
+def stream_events():
+    """Per-user server-sent events for focus timer changes and data changes"""
+    user_id = 1
+    last_event_id = request.headers.get('Last-Event-ID')
+    subscription, missed, complete = event_broker.subscribe(user_id, last_event_id)
+    # A fresh connection, or one whose missed events are gone, starts from the current state
+    hello = live_state(user_id) if last_event_id is None or not complete else None
+    # Do not hold a pooled connection for the life of the stream
+    db.session.close()
+
+    def generate():
+        try:
+            if hello is not None:
+                yield format_sse('hello', hello)
+            for event_id, name, data in missed:
+                yield format_sse(name, data, event_id)
+            while not subscription.closed:
+                try:
+                    event_id, name, data = subscription.queue.get(timeout=HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Also lets clients served by another worker notice changes
+                    yield format_sse('heartbeat', {'version': current_version(user_id)})
+                    db.session.close()
+                    continue
+                yield format_sse(name, data, event_id)
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 def cleanup_stale_focus_sessions():
     """Remove focus sessions older than 24 hours"""
@@ -810,31 +1244,215 @@ def load_sample_data():
     db.session.add_all(sample_focus)
     db.session.commit()
 
-def init_db():
+def add_missing_columns():
+    """Add model columns missing from tables created by older versions"""
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            with db.engine.begin() as conn:
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                if table.name == 'tasks' and column.name == 'completed_at':
+                    # Best available guess for tasks completed before the column existed
+                    conn.execute(db.text('UPDATE tasks SET completed_at = updated_at WHERE completed'))
+
+
+def ensure_schema():
+    """Create tables and the default user, and backfill derived tables"""
+    # Create all tables
+    db.create_all()
+    # create_all skips indexes added to tables that already exist
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db.engine, checkfirst=True)
+    add_missing_columns()
+
+    # Create default user if not exists
+    user = User.query.filter_by(id=1).first()
+    if not user:
+        user = User(
+            id=1,
+            username='jane_doe',
+            email='jane@studyflow.ai',
+            full_name='Jane Doe'
+        )
+        db.session.add(user)
+        db.session.commit()
+
+    # Backfill rollups for databases created before they existed
+    if rollups_empty() and (Task.query.first() or FocusSession.query.first()):
+        rebuild_rollups()
+        db.session.commit()
+
+    # Backfill streak records the same way
+    if UserStreak.query.first() is None and FocusSession.query.first():
+        rebuild_all_streaks()
+        db.session.commit()
+
+def load_sample_data_if_empty():
+    """Add the sample data only if there are no study sessions yet"""
+    if StudySession.query.first() is not None:
+        return False
+    load_sample_data()
+    rebuild_rollups()
+    rebuild_all_streaks()
+    db.session.commit()
+    return True
+
+def init_db(target=None, sample_data=True):
     """Initialize database with tables and default data"""
-    with app.app_context():
-        # Create all tables
-        db.create_all()
-
-        # Create default user if not exists
-        user = User.query.filter_by(id=1).first()
-        if not user:
-            user = User(
-                id=1,
-                username='jane_doe',
-                email='jane@studyflow.ai',
-                full_name='Jane Doe'
-            )
-            db.session.add(user)
-            db.session.commit()
+    with (target or app).app_context():
+        ensure_schema()
+        if sample_data:
+            load_sample_data_if_empty()
+
+@bp.cli.command('init-db')
+@click.option('--sample-data/--no-sample-data', default=False,
+              help='Also load the sample data into an empty database.')
+def init_db_command(sample_data):
+    """Create tables and the default user"""
+    ensure_schema()
+    if sample_data and load_sample_data_if_empty():
+        click.echo('Sample data loaded.')
+    click.echo('Database initialised.')
+
+@bp.cli.command('load-sample-data')
+def load_sample_data_command():
+    """Add the sample sessions, tasks and focus history to an empty database"""
+    if load_sample_data_if_empty():
+        click.echo('Sample data loaded.')
+    else:
+        click.echo('Database already has study sessions; nothing loaded.')
+
+@bp.cli.command('rebuild-rollups')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_rollups_command(user_id):
+    """Recompute progress rollups from sessions and tasks"""
+    rebuild_rollups(user_id)
+    db.session.commit()
+    click.echo('Rollups rebuilt.')
+
+@bp.cli.command('rebuild-streaks')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_streaks_command(user_id):
+    """Recompute streak records from focus history"""
+    if user_id is not None:
+        rebuild_streak(user_id)
+        count = 1
+    else:
+        count = rebuild_all_streaks()
+    db.session.commit()
+    click.echo(f'Rebuilt streaks for {count} user(s).')
 
-        # Clean up stale focus sessions
-        cleanup_stale_focus_sessions()
+@bp.cli.command('compact-change-log')
+@click.option('--days', type=int, default=30, help='Keep tombstones newer than this.')
+def compact_change_log_command(days):
+    """Drop old delete tombstones from the sync change log"""
+    removed = compact_change_log(days)
+    db.session.commit()
+    click.echo(f'Removed {removed} tombstone(s).')
+
+@bp.cli.command('import-data')
+@click.argument('kind', type=click.Choice(sorted(BULK_KINDS)))
+@click.argument('source', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default=None,
+              help='Defaults to the file extension.')
+@click.option('--user-id', type=int, default=1)
+def import_data_command(kind, source, fmt, user_id):
+    """Bulk import sessions, tasks or focus history from NDJSON or CSV"""
+    fmt = fmt or ('csv' if source.name.endswith('.csv') else 'ndjson')
+    records = iter_csv(source) if fmt == 'csv' else iter_ndjson(source)
+    result = import_records(kind, records, user_id=user_id)
+    click.echo(f"Imported {result['imported']} {kind}, {result['failed']} failed.")
+    for error in result['errors']:
+        click.echo(f"  line {error['line']}: {error['error']}", err=True)
+
+@bp.cli.command('export-data')
+@click.argument('kind', type=click.Choice(sorted(BULK_KINDS)))
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson')
+@click.option('--output', type=click.File('w'), default='-')
+@click.option('--user-id', type=int, default=1)
+def export_data_command(kind, fmt, output, user_id):
+    """Stream sessions, tasks or focus history to NDJSON or CSV"""
+    for chunk in (export_csv if fmt == 'csv' else export_ndjson)(kind, user_id):
+        output.write(chunk)
+
+def create_app(config=None):
+    """Build an app instance. Startup does no database work; run init-db first"""
+    app = Flask(__name__)
+    if config:
+        app.config.update(config)
+
+    # Database configuration (DATABASE_URL and SQLITE_* environment overrides)
+    configure_storage(app, os.path.join(basedir, 'study_planner.db'))
+    db.init_app(app)
+    install_sqlite_pragmas(app, db)
+    install_instrumentation(app, db)
+    profiling.install_profiling(app, os.path.join(basedir, 'profiles'))
+    install_scheduler(app, scheduler)
+    app.register_blueprint(bp)
+    return app
+
+# Maintenance jobs; each starts at a random point in its first interval
+scheduler = Scheduler()
+
+@scheduler.job('stale-focus-cleanup', interval=15 * 60)
+def stale_focus_cleanup_job():
+    cleanup_stale_focus_sessions()
+
+@scheduler.job('rollup-refresh', interval=24 * 3600, timeout=3600)
+def rollup_refresh_job():
+    """Rebuild rollups and streaks from the base tables, one user per transaction"""
+    for user_id in db.session.execute(db.select(User.id)).scalars().all():
+        rebuild_rollups(user_id)
+        rebuild_streak(user_id)
+        db.session.commit()
 
-        # Add sample data only if tables are empty
-        if StudySession.query.count() == 0:
-            load_sample_data()
+@scheduler.job('recommendation-prewarm', interval=10 * 60, exclusive=False)
+def recommendation_prewarm_job():
+    """Regenerate expired recommendations this process has served before"""
+    recommendation_cache.prune()
+    user_id = 1
+    if recommendation_cache.last_good(user_id)[0] is None or not enrichment_due(user_id):
+        return
+    context = get_user_context(user_id=user_id)
+    cache_key = context_key(user_id, context)
+    if recommendation_cache.get(cache_key) is None:
+        recommendation_executor.submit(user_id, refresh_recommendations, user_id, cache_key, context)
+
+@scheduler.job('change-log-compaction', interval=24 * 3600)
+def change_log_compaction_job():
+    compact_change_log()
+
+@bp.cli.command('jobs')
+def jobs_command():
+    """List scheduled jobs with their last run"""
+    for job in scheduler.status():
+        last = job.get('last_finished_at') or 'never'
+        click.echo(f"{job['name']:<24} every {job['interval_seconds']:>6}s  "
+                   f"last {last} ({job.get('last_status') or '-'}, {job.get('last_duration_ms')} ms)  "
+                   f"next {job.get('next_run_at') or '-'}")
+
+@bp.cli.command('run-job')
+@click.argument('name', type=click.Choice(sorted(scheduler.jobs)))
+def run_job_command(name):
+    """Run a scheduled job now, unless another worker is running it"""
+    status, _ = scheduler.run_job(scheduler.jobs[name], force=True, app=current_app._get_current_object())
+    if status == 'skipped':
+        raise click.ClickException(f'{name} is already running.')
+    if status == 'error':
+        raise click.ClickException(f'{name} failed; see the log for details.')
+    click.echo(f'{name} finished.')
+
+# Module-level instance for `flask --app app`, gunicorn app:app and imports
+app = create_app()
 
 if __name__ == '__main__':
+    # Development server only; see gunicorn.conf.py for multi-process serving
     init_db()
-    app.run(debug=True, port=5000)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1',
+            port=int(os.environ.get('PORT', 5000)),
+            threaded=True)
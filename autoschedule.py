@@ -0,0 +1,403 @@
+"""Automatic study plans: pending tasks packed into the user's free time.
+
+Free time is the availability windows of each day minus the sessions
+already on the calendar, with a break kept around every session. Tasks
+are split into sessions of at most maxSessionMinutes and placed by
+preemptive earliest-deadline-first: the free slots are walked in time
+order and each goes to the pending task due soonest, kept in a heap. A
+task whose due date has passed drops into a second heap that only gets
+time nobody on schedule needs, so one hopeless task cannot make the
+rest late. An optional local-search pass then moves sessions from the
+busiest days to lighter ones, never past a day before the due date.
+
+The plan is a pure function of the tasks, the calendar, the options and
+the planning time, so a commit can rebuild exactly what was previewed.
+"""
+import heapq
+import time as time_module
+from datetime import datetime, timedelta
+
+from changelog import schedule_version
+from intervals import busy_intervals, format_minute, free_slots, minute_of_day, parse_minute
+from models import db, PlannedSession, StudySession, Task
+from mutations import MutationError
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+# Weekday evenings and weekend days, when the request names no availability
+DEFAULT_AVAILABILITY = {
+    'mon': [('16:00', '21:00')],
+    'tue': [('16:00', '21:00')],
+    'wed': [('16:00', '21:00')],
+    'thu': [('16:00', '21:00')],
+    'fri': [('16:00', '19:00')],
+    'sat': [('10:00', '13:00'), ('14:00', '18:00')],
+    'sun': [('10:00', '13:00'), ('14:00', '18:00')],
+}
+DEFAULT_TASK_MINUTES = 60
+MIN_SESSION_MINUTES = 25
+MAX_SESSION_MINUTES = 90
+BREAK_MINUTES = 10
+DEFAULT_SUBJECT = 'Study'
+DEFAULT_COLOR = 'cyan'
+# Without an end date a plan runs to the last due date, and at least this
+# long so tasks that are due now still find room
+MIN_PLAN_DAYS = 14
+MAX_PLAN_DAYS = 366
+MAX_PLAN_TASKS = 5000
+# Sessions the improvement pass may move, per planned session
+MOVES_PER_SESSION = 2
+IMPROVE_PASSES = 3
+# A committed plan must have been previewed within this long
+PREVIEW_TTL = timedelta(hours=1)
+
+
+def _int_option(payload, key, default, low, high):
+    value = payload.get(key, default)
+    if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+        raise ValueError(f"'{key}' must be an integer from {low} to {high}")
+    return value
+
+
+def _per_task(payload, key, convert):
+    values = payload.get(key) or {}
+    if not isinstance(values, dict):
+        raise ValueError(f"'{key}' must map task ids to values")
+    return {int(task_id): convert(value) for task_id, value in values.items()}
+
+
+def _estimate(value):
+    if isinstance(value, bool) or not isinstance(value, int) or not 1 <= value <= 100 * 60:
+        raise ValueError('Estimates must be whole minutes from 1 to 6000')
+    return value
+
+
+def parse_options(payload, today):
+    """Validate a plan request; raises ValueError with a message for the client"""
+    if not isinstance(payload, dict):
+        raise ValueError('Expected a JSON object')
+    options = {
+        'start': datetime.strptime(payload['start'], '%Y-%m-%d').date() if payload.get('start') else today,
+        'end': datetime.strptime(payload['end'], '%Y-%m-%d').date() if payload.get('end') else None,
+        'default_minutes': _int_option(payload, 'defaultMinutes', DEFAULT_TASK_MINUTES, 1, 6000),
+        'min_session': _int_option(payload, 'minSessionMinutes', MIN_SESSION_MINUTES, 5, 240),
+        'max_session': _int_option(payload, 'maxSessionMinutes', MAX_SESSION_MINUTES, 5, 480),
+        'break': _int_option(payload, 'breakMinutes', BREAK_MINUTES, 0, 120),
+        'estimates': _per_task(payload, 'estimates', _estimate),
+        'subjects': _per_task(payload, 'subjects', lambda value: str(value)[:100] or DEFAULT_SUBJECT),
+        'subject': str(payload.get('subject') or DEFAULT_SUBJECT)[:100],
+        'color': str(payload.get('color') or DEFAULT_COLOR)[:50],
+        'improve': bool(payload.get('improve', True)),
+        'task_ids': None,
+    }
+    if options['start'] < today:
+        raise ValueError("'start' cannot be in the past")
+    if options['end'] is not None:
+        if options['end'] < options['start']:
+            raise ValueError("'end' must not be before 'start'")
+        if (options['end'] - options['start']).days >= MAX_PLAN_DAYS:
+            raise ValueError(f'Plans cover at most {MAX_PLAN_DAYS} days')
+    if options['min_session'] > options['max_session']:
+        raise ValueError("'minSessionMinutes' must not exceed 'maxSessionMinutes'")
+    if payload.get('taskIds') is not None:
+        task_ids = payload['taskIds']
+        if not isinstance(task_ids, list) or not all(isinstance(i, int) for i in task_ids):
+            raise ValueError("'taskIds' must be a list of task ids")
+        options['task_ids'] = task_ids
+
+    availability = payload.get('availability', DEFAULT_AVAILABILITY)
+    if not isinstance(availability, dict) or set(availability) - set(WEEKDAYS):
+        raise ValueError(f"'availability' must map {', '.join(WEEKDAYS)} to [start, end] windows")
+    windows = []
+    for weekday in WEEKDAYS:
+        day = sorted((parse_minute(start), parse_minute(end)) for start, end in availability.get(weekday, []))
+        if any(start >= end for start, end in day) or any(a[1] > b[0] for a, b in zip(day, day[1:])):
+            raise ValueError(f'Availability windows for {weekday} must be ordered and not overlap')
+        windows.append(day)
+    options['windows'] = windows
+    return options
+
+
+def _piece_length(remaining, room, min_session, max_session):
+    """Minutes of a task to place in room, or 0 if it does not fit sensibly"""
+    length = min(remaining, max_session, room)
+    left = remaining - length
+    if 0 < left < min_session:
+        # Never leave a remainder too short to be a session of its own
+        length = remaining if remaining <= room and remaining <= max_session else remaining - min_session
+    if length < min(min_session, remaining):
+        return 0
+    return length
+
+
+def pack(tasks, slots, min_session, max_session, break_minutes):
+    """Earliest-deadline-first placement of tasks into the free slots.
+
+    tasks is a list of (due_day, minutes). Returns (pieces, remaining):
+    pieces as [day, start, end, task_index] and the minutes of each task
+    that found no room.
+    """
+    remaining = [minutes for _, minutes in tasks]
+    on_time = [(due_day, index) for index, (due_day, minutes) in enumerate(tasks) if minutes > 0]
+    heapq.heapify(on_time)
+    late = []
+    pieces = []
+    for day, day_slots in enumerate(slots):
+        # Tasks due before today can only use time nobody on schedule needs
+        while on_time and on_time[0][0] < day:
+            heapq.heappush(late, heapq.heappop(on_time))
+        for slot_start, slot_end in day_slots:
+            cursor = slot_start
+            skipped = []
+            while on_time or late:
+                queue = on_time or late
+                due_day, index = heapq.heappop(queue)
+                length = _piece_length(remaining[index], slot_end - cursor, min_session, max_session)
+                if not length:
+                    # Too little room for this task; a shorter one may still fit
+                    skipped.append((queue, (due_day, index)))
+                    if len(skipped) > 8:
+                        break
+                    continue
+                pieces.append([day, cursor, cursor + length, index])
+                remaining[index] -= length
+                cursor += length + break_minutes
+                if remaining[index]:
+                    heapq.heappush(queue, (due_day, index))
+                if slot_end - cursor < min_session:
+                    break
+            for queue, entry in skipped:
+                heapq.heappush(queue, entry)
+    return pieces, remaining
+
+
+def _gaps(day_slots, day_pieces, break_minutes):
+    """Free (start, latest end) ranges of a day around its planned sessions"""
+    gaps = []
+    for slot_start, slot_end in day_slots:
+        cursor = slot_start
+        for _, start, end, _ in day_pieces:
+            if slot_start <= start < slot_end:
+                if start - break_minutes > cursor:
+                    gaps.append((cursor, start - break_minutes))
+                cursor = max(cursor, end + break_minutes)
+        if cursor < slot_end:
+            gaps.append((cursor, slot_end))
+    return gaps
+
+
+def improve(pieces, tasks, slots, break_minutes, max_moves):
+    """Move sessions from heavy days to lighter ones; returns the number moved.
+
+    A session may move to any earlier day, or to a later one that is still
+    at least a day before its task is due. Each move strictly lowers the
+    sum of squared daily loads. Days are ranked once per pass and the
+    widest gap of each day is kept up to date, so a pass costs about
+    sessions x days comparisons.
+    """
+    days = len(slots)
+    by_day = [[] for _ in range(days)]
+    loads = [0] * days
+    for piece in pieces:
+        by_day[piece[0]].append(piece)
+        loads[piece[0]] += piece[2] - piece[1]
+    gaps, widest = [None] * days, [0] * days
+
+    def refresh(day):
+        by_day[day].sort(key=lambda p: p[1])
+        gaps[day] = _gaps(slots[day], by_day[day], break_minutes)
+        widest[day] = max((end - start for start, end in gaps[day]), default=0)
+
+    for day in range(days):
+        refresh(day)
+
+    moves = 0
+    for _ in range(IMPROVE_PASSES):
+        moved = moves
+        ranked = sorted(range(days), key=loads.__getitem__)
+        for day in reversed(ranked):
+            if loads[day] <= loads[ranked[0]]:
+                break
+            for piece in sorted(by_day[day], key=lambda p: p[1] - p[2]):
+                length = piece[2] - piece[1]
+                latest = max(day - 1, tasks[piece[3]][0] - 1)
+                for target in ranked:
+                    if loads[target] + length >= loads[day]:
+                        break
+                    if target == day or target > latest or widest[target] < length:
+                        continue
+                    start = next(a for a, b in gaps[target] if a + length <= b)
+                    by_day[day].remove(piece)
+                    piece[0], piece[1], piece[2] = target, start, start + length
+                    by_day[target].append(piece)
+                    loads[day] -= length
+                    loads[target] += length
+                    refresh(day)
+                    refresh(target)
+                    moves += 1
+                    break
+                if moves >= max_moves:
+                    return moves
+        if moves == moved:
+            break
+    return moves
+
+
+def _priority(days_left):
+    if days_left <= 1:
+        return 'high'
+    return 'medium' if days_left <= 3 else 'low'
+
+
+def _load_tasks(user_id, options):
+    query = db.select(Task.id, Task.title, Task.due_date).where(
+        Task.user_id == user_id, Task.completed.is_(False))
+    if options['task_ids'] is not None:
+        query = query.where(Task.id.in_(options['task_ids']))
+    last_due = options['end'] or options['start'] + timedelta(days=MAX_PLAN_DAYS - 1)
+    query = query.where(Task.due_date <= last_due)
+    return db.session.execute(query.order_by(Task.due_date, Task.id).limit(MAX_PLAN_TASKS)).all()
+
+
+def _planned_minutes(user_id, start):
+    """Minutes already planned per task from start onwards"""
+    rows = db.session.execute(
+        db.select(PlannedSession.task_id, StudySession.start_time, StudySession.end_time)
+        .join(StudySession, StudySession.id == PlannedSession.session_id)
+        .where(PlannedSession.user_id == user_id, StudySession.date >= start)
+    ).all()
+    planned = {}
+    for task_id, start_time, end_time in rows:
+        minutes = minute_of_day(end_time) - minute_of_day(start_time)
+        planned[task_id] = planned.get(task_id, 0) + max(minutes, 0)
+    return planned
+
+
+def build_plan(user_id, payload, now=None):
+    """Plan the user's pending tasks without writing anything"""
+    started = time_module.perf_counter()
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    options = parse_options(payload, now.date())
+    start = options['start']
+    version = schedule_version(user_id)
+
+    rows = _load_tasks(user_id, options)
+    end = options['end'] or max([start + timedelta(days=MIN_PLAN_DAYS - 1)] + [row.due_date for row in rows])
+    days = (end - start).days + 1
+    planned = _planned_minutes(user_id, start)
+
+    tasks, selected = [], []
+    for row in rows:
+        estimate = options['estimates'].get(row.id, options['default_minutes'])
+        minutes = max(0, estimate - planned.get(row.id, 0))
+        if minutes:
+            tasks.append((max(0, (row.due_date - start).days), minutes))
+            selected.append(row)
+
+    first_minute = minute_of_day(now) if start == now.date() else 0
+    slots = free_slots(start, days, options['windows'], busy_intervals(user_id, start, end),
+                       options['break'], first_minute)
+    pieces, remaining = pack(tasks, slots, options['min_session'], options['max_session'], options['break'])
+    moves = 0
+    if options['improve'] and pieces:
+        moves = improve(pieces, tasks, slots, options['break'], len(pieces) * MOVES_PER_SESSION)
+    pieces.sort()
+
+    counts = [0] * len(tasks)
+    for piece in pieces:
+        counts[piece[3]] += 1
+    numbers = [0] * len(tasks)
+    sessions, late_tasks = [], set()
+    for day, start_minute, end_minute, index in pieces:
+        row = selected[index]
+        numbers[index] += 1
+        session_date = start + timedelta(days=day)
+        late = row.due_date < session_date
+        if late:
+            late_tasks.add(row.id)
+        part = f' ({numbers[index]}/{counts[index]})' if counts[index] > 1 else ''
+        sessions.append({
+            'taskId': row.id,
+            'title': f'{row.title}{part}'[:200],
+            'subject': options['subjects'].get(row.id, options['subject']),
+            'date': session_date.strftime('%Y-%m-%d'),
+            'startTime': format_minute(start_minute),
+            'endTime': format_minute(end_minute),
+            'color': options['color'],
+            'priority': _priority((row.due_date - session_date).days),
+            'notes': f"Planned for '{row.title}', due {row.due_date.strftime('%Y-%m-%d')}"[:1000],
+            'late': late
+        })
+
+    unscheduled = [
+        {'taskId': row.id, 'title': row.title, 'dueDate': row.due_date.strftime('%Y-%m-%d'),
+         'minutes': remaining[index]}
+        for index, row in enumerate(selected) if remaining[index]
+    ]
+    return {
+        'version': version,
+        'plannedAt': now.strftime('%Y-%m-%dT%H:%M'),
+        'start': start.strftime('%Y-%m-%d'),
+        'end': end.strftime('%Y-%m-%d'),
+        'sessions': sessions,
+        'unscheduled': unscheduled,
+        'stats': {
+            'tasks': len(selected),
+            'alreadyPlanned': len(rows) - len(selected),
+            'sessions': len(sessions),
+            'minutes': sum(piece[2] - piece[1] for piece in pieces),
+            'lateTasks': len(late_tasks),
+            'unscheduledTasks': len(unscheduled),
+            'moves': moves,
+            'elapsedMs': round((time_module.perf_counter() - started) * 1000, 1)
+        }
+    }
+
+
+def commit_plan(user_id, payload, now=None):
+    """Rebuild a previewed plan and stage its sessions; returns the plan.
+
+    payload carries the preview's options plus its version and plannedAt,
+    both required. The plan is rebuilt as of plannedAt, so the sessions
+    match the preview exactly; if the user's sessions or tasks changed
+    since, MutationError(409) asks the client to preview again. The caller
+    commits.
+    """
+    now = now or datetime.now()
+    expected = payload.get('version')
+    if type(expected) is not int:
+        raise MutationError("'version' from the preview is required")
+    try:
+        planned_at = datetime.strptime(payload.get('plannedAt'), '%Y-%m-%dT%H:%M')
+    except (TypeError, ValueError):
+        raise MutationError("'plannedAt' must be the value returned by the preview")
+    if not now - PREVIEW_TTL <= planned_at <= now:
+        raise MutationError('The preview has expired; preview the plan again', 409)
+    if expected != schedule_version(user_id):
+        raise MutationError('Your schedule changed since the preview; preview the plan again', 409)
+
+    plan = build_plan(user_id, payload, now=planned_at)
+    if not plan['sessions']:
+        return plan
+    sessions = []
+    for item in plan['sessions']:
+        sessions.append(StudySession(
+            user_id=user_id,
+            title=item['title'],
+            subject=item['subject'],
+            date=datetime.strptime(item['date'], '%Y-%m-%d').date(),
+            start_time=datetime.strptime(item['startTime'], '%H:%M').time(),
+            end_time=datetime.strptime(item['endTime'], '%H:%M').time(),
+            color=item['color'],
+            priority=item['priority'],
+            notes=item['notes']
+        ))
+    db.session.add_all(sessions)
+    db.session.flush()
+    # Links left behind by sessions deleted outside the app would collide with reused ids
+    db.session.execute(db.delete(PlannedSession).where(
+        PlannedSession.session_id.in_([session.id for session in sessions])))
+    db.session.add_all(PlannedSession(session_id=session.id, user_id=user_id, task_id=item['taskId'])
+                       for session, item in zip(sessions, plan['sessions']))
+    for session, item in zip(sessions, plan['sessions']):
+        item['id'] = session.id
+    return plan
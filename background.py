@@ -0,0 +1,46 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlightExecutor:
+    """Thread pool that coalesces concurrent submissions sharing a key.
+
+    While a job for a key is running, further submissions for the same key
+    return the in-flight future instead of starting a second job.
+    """
+
+    def __init__(self, max_workers=2, thread_name_prefix='background'):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix=thread_name_prefix)
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, **kwargs):
+        """Schedule fn unless a job for key is already running"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return future
+            future = self._pool.submit(self._run, key, fn, args, kwargs)
+            self._inflight[key] = future
+            return future
+
+    def is_running(self, key):
+        with self._lock:
+            return key in self._inflight
+
+    def _run(self, key, fn, args, kwargs):
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            logger.exception('Background job %r failed', key)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
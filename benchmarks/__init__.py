@@ -0,0 +1,26 @@
+"""Synthetic data generation and route benchmarks.
+
+    python -m benchmarks generate bench.db --users 100 --years 3
+    python -m benchmarks run bench.db --save-baseline main
+    python -m benchmarks run bench.db --compare main
+    python -m benchmarks startup bench.db
+
+Benchmarks run in-process through the Flask test client against their own
+database file, with the OpenAI client replaced by a local stub.
+"""
+import os
+
+
+def load_app(db_path):
+    """Import the app bound to db_path with a stubbed OpenAI client"""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.abspath(db_path)
+    os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+    # Maintenance jobs would add background load to the measurements
+    os.environ.setdefault('SCHEDULER_ENABLED', '0')
+
+    import app as app_module
+    from benchmarks.fake_openai import FakeOpenAI
+
+    app_module.openai_client = FakeOpenAI()
+    app_module.init_db()
+    return app_module
@@ -0,0 +1,134 @@
+"""Command line for the benchmark suite; see benchmarks/__init__.py"""
+import os
+import sys
+
+import click
+
+from benchmarks import load_app
+from benchmarks import runner
+from benchmarks.startup import DEFAULT_TARGET_MS, measure
+
+
+@click.group()
+def cli():
+    """Generate benchmark data and measure every route"""
+
+
+@cli.command()
+@click.argument('database', type=click.Path(dir_okay=False))
+@click.option('--users', type=int, default=100, show_default=True)
+@click.option('--years', type=int, default=3, show_default=True)
+@click.option('--seed', type=int, default=1, show_default=True)
+@click.option('--overwrite', is_flag=True, help='Replace an existing database file.')
+def generate(database, users, years, seed, overwrite):
+    """Create DATABASE filled with synthetic users and history"""
+    if os.path.exists(database):
+        if not overwrite:
+            raise click.ClickException(f'{database} exists; pass --overwrite to replace it')
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(database + suffix):
+                os.remove(database + suffix)
+
+    from benchmarks.datagen import generate as generate_data
+
+    app_module = load_app(database)
+    counts = generate_data(app_module, users=users, years=years, seed=seed,
+                           progress=lambda n: click.echo(f'  {n} users...', err=True))
+    for table, count in sorted(counts.items()):
+        click.echo(f'{table}: {count} rows')
+
+
+@cli.command()
+@click.argument('database', type=click.Path(exists=True, dir_okay=False))
+@click.option('--iterations', type=int, default=50, show_default=True)
+@click.option('--warmup', type=int, default=5, show_default=True)
+@click.option('--only', default=None, help='Only scenarios whose name contains this.')
+@click.option('--concurrency', type=int, default=1, show_default=True,
+              help='Also measure read routes with this many threads.')
+@click.option('--output', type=click.Path(dir_okay=False), default=None, help='Write results as JSON.')
+@click.option('--save-baseline', default=None, help='Store results as baselines/<name>.json.')
+@click.option('--compare', 'compare_to', default=None,
+              help='Baseline name or results file to compare against; exits 1 on regression.')
+@click.option('--tolerance', type=float, default=runner.DEFAULT_TOLERANCE, show_default=True,
+              help='Allowed p95 growth as a fraction.')
+def run(database, iterations, warmup, only, concurrency, output, save_baseline, compare_to, tolerance):
+    """Benchmark every route against DATABASE"""
+    app_module = load_app(database)
+    click.echo(runner.format_header())
+    results = runner.run(app_module, iterations=iterations, warmup=warmup, only=only,
+                         concurrency=concurrency, log=click.echo)
+
+    uncovered = results['meta']['uncovered_routes']
+    if uncovered:
+        click.echo(f"Routes without a scenario: {', '.join(uncovered)}", err=True)
+    if output:
+        runner.save_results(results, output)
+    if save_baseline:
+        runner.save_results(results, runner.baseline_path(save_baseline))
+        click.echo(f'Saved baseline {save_baseline}.')
+    if compare_to:
+        _compare_and_exit(results, compare_to, tolerance)
+
+
+@cli.command()
+@click.argument('results', type=click.Path(exists=True, dir_okay=False))
+@click.argument('baseline')
+@click.option('--tolerance', type=float, default=runner.DEFAULT_TOLERANCE, show_default=True)
+def compare(results, baseline, tolerance):
+    """Compare a saved RESULTS file against BASELINE"""
+    _compare_and_exit(runner.load_results(results), baseline, tolerance)
+
+
+def _compare_and_exit(results, baseline, tolerance):
+    path = baseline if os.path.exists(baseline) else runner.baseline_path(baseline)
+    if not os.path.exists(path):
+        raise click.ClickException(f'No baseline at {path}')
+    regressions = runner.compare(results, runner.load_results(path), tolerance)
+    if regressions:
+        click.echo('Regressions:', err=True)
+        for line in regressions:
+            click.echo(f'  {line}', err=True)
+        sys.exit(1)
+    click.echo('No regressions.')
+
+
+@cli.command()
+@click.argument('database', type=click.Path(exists=True, dir_okay=False))
+@click.option('--path', default='/api/tasks', show_default=True, help='First request to serve.')
+@click.option('--runs', type=int, default=5, show_default=True)
+@click.option('--target-ms', type=float, default=None,
+              help='Exit 1 when the median time to the first response exceeds this '
+                   f'(default {DEFAULT_TARGET_MS:g}).')
+def startup(database, path, runs, target_ms):
+    """Measure cold starts: fresh process to first response"""
+    summary = measure(database, path, runs)
+    for phase in ('import_ms', 'first_request_ms', 'ready_ms', 'process_ms'):
+        click.echo(f"{phase:<18} p50 {summary[phase]['p50']:>8.2f}   max {summary[phase]['max']:>8.2f}")
+    click.echo(f"statuses: {summary['statuses']}; openai imported: {summary['openai_imported']}")
+
+    target = DEFAULT_TARGET_MS if target_ms is None else target_ms
+    if summary['ready_ms']['p50'] > target:
+        click.echo(f"Cold start {summary['ready_ms']['p50']:.0f} ms exceeds the {target:g} ms target.", err=True)
+        sys.exit(1)
+    click.echo(f'Within the {target:g} ms target.')
+
+
+@cli.command('fake-openai')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', type=int, default=8765, show_default=True)
+@click.option('--latency', type=float, default=0.0, show_default=True, help='Seconds before responding.')
+@click.option('--chunk-delay', type=float, default=0.0, show_default=True,
+              help='Seconds between streamed chunks.')
+@click.option('--error-rate', type=float, default=0.0, show_default=True,
+              help='Fraction of requests answered with an error status.')
+@click.option('--error-status', type=int, default=500, show_default=True)
+def fake_openai(host, port, latency, chunk_delay, error_rate, error_status):
+    """Serve a fake chat completions API (set OPENAI_BASE_URL=http://HOST:PORT/v1)"""
+    from benchmarks.fake_openai import serve
+
+    click.echo(f'Fake OpenAI listening on http://{host}:{port}/v1', err=True)
+    serve(host, port, latency, chunk_delay, error_rate, error_status)
+
+
+if __name__ == '__main__':
+    cli()
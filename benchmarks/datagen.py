@@ -0,0 +1,151 @@
+"""Synthetic users, study sessions, tasks and focus history at scale.
+
+Rows are written with batched core inserts, then the rollup and streak
+tables are rebuilt from them, so the result looks like a database that
+grew through the API.
+"""
+import random
+from datetime import date, datetime, time, timedelta
+
+SUBJECTS = [
+    ('calculus', 'Calculus II'), ('algebra', 'Linear Algebra'), ('physics', 'Physics I'),
+    ('chemistry', 'Chemistry'), ('literature', 'Literature'), ('history', 'World History'),
+    ('biology', 'Biology'), ('programming', 'Intro to Programming'),
+]
+COLORS = ['blue', 'cyan', 'green', 'yellow', 'purple', 'red']
+PRIORITIES = ['high', 'medium', 'medium', 'low']
+TASK_VERBS = ['Finish', 'Review', 'Outline', 'Read', 'Prepare for', 'Revise', 'Submit']
+TASK_OBJECTS = ['homework', 'lab report', 'chapter notes', 'quiz', 'essay draft', 'problem set', 'flashcards']
+
+INSERT_BATCH_SIZE = 10000
+
+
+class _BatchWriter:
+    """Collects rows per table and inserts them in batches"""
+
+    def __init__(self, db, batch_size):
+        self.db = db
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+
+    def add(self, model, row):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for target in ([model] if model else list(self.pending)):
+            rows = self.pending.get(target)
+            if rows:
+                self.db.session.execute(self.db.insert(target), rows)
+                self.counts[target.__tablename__] = self.counts.get(target.__tablename__, 0) + len(rows)
+                self.pending[target] = []
+        self.db.session.commit()
+
+
+def _user_days(rng, user_id, start, end, writer, models, now):
+    StudySession, Task, FocusSession = models
+    # Each user has a habit: how often they plan, study and add tasks
+    plan_rate = rng.uniform(0.4, 0.95)
+    focus_rate = rng.uniform(0.3, 0.9)
+    task_rate = rng.uniform(0.3, 1.0)
+    subjects = rng.sample(SUBJECTS, rng.randint(3, 6))
+
+    day = start
+    while day <= end:
+        if rng.random() < plan_rate:
+            minute = rng.randint(8 * 60, 11 * 60)
+            for _ in range(rng.randint(1, 3)):
+                length = rng.choice([30, 45, 60, 90, 120])
+                if minute + length > 22 * 60:
+                    break
+                subject, name = rng.choice(subjects)
+                writer.add(StudySession, {
+                    'user_id': user_id,
+                    'title': name,
+                    'subject': subject,
+                    'date': day,
+                    'start_time': time(minute // 60, minute % 60),
+                    'end_time': time((minute + length) // 60, (minute + length) % 60),
+                    'color': rng.choice(COLORS),
+                    'priority': rng.choice(PRIORITIES),
+                    'notes': '',
+                    'created_at': now,
+                    'updated_at': now
+                })
+                minute += length + rng.choice([0, 15, 30, 60])
+
+        if rng.random() < focus_rate:
+            for _ in range(rng.randint(1, 2)):
+                started = datetime.combine(day, time(rng.randint(7, 21), rng.randint(0, 59)))
+                duration = rng.randint(10, 150)
+                writer.add(FocusSession, {
+                    'user_id': user_id,
+                    'subject': rng.choice(subjects)[1],
+                    'date': day,
+                    'start_time': started,
+                    'end_time': started + timedelta(minutes=duration),
+                    'duration': duration,
+                    'created_at': started + timedelta(minutes=duration)
+                })
+
+        if rng.random() < task_rate:
+            created = datetime.combine(day, time(rng.randint(8, 22), rng.randint(0, 59)))
+            due = day + timedelta(days=rng.randint(0, 14))
+            completed = due < end and rng.random() < 0.85
+            finished = created + timedelta(days=rng.randint(0, max(0, (due - day).days)))
+            writer.add(Task, {
+                'user_id': user_id,
+                'title': f'{rng.choice(TASK_VERBS)} {rng.choice(subjects)[1]} {rng.choice(TASK_OBJECTS)}',
+                'due_date': due,
+                'completed': completed,
+                'created_at': created,
+                'completed_at': finished if completed else None,
+                'updated_at': finished if completed else created
+            })
+        day += timedelta(days=1)
+
+
+def generate(app_module, users=100, years=3, seed=1, batch_size=INSERT_BATCH_SIZE, progress=None):
+    """Fill the app's database with users 1..users and years of history each.
+
+    User 1 (created by init_db) gets history too, since the app serves it.
+    Returns {table: rows inserted}.
+    """
+    from models import db, User, StudySession, Task, FocusSession
+    from rollups import rebuild_rollups
+    from streaks import rebuild_all_streaks
+
+    rng = random.Random(seed)
+    end = date.today()
+    start = end - timedelta(days=365 * years)
+    now = datetime.utcnow()
+
+    with app_module.app.app_context():
+        writer = _BatchWriter(db, batch_size)
+        existing = set(db.session.execute(db.select(User.id)).scalars())
+        for user_id in range(1, users + 1):
+            if user_id not in existing:
+                writer.add(User, {
+                    'id': user_id,
+                    'username': f'user{user_id}',
+                    'email': f'user{user_id}@example.com',
+                    'full_name': f'Benchmark User {user_id}',
+                    'created_at': now,
+                    'updated_at': now
+                })
+        writer.flush()
+
+        models = (StudySession, Task, FocusSession)
+        for user_id in range(1, users + 1):
+            _user_days(rng, user_id, start, end, writer, models, now)
+            if progress and user_id % 100 == 0:
+                progress(user_id)
+        writer.flush()
+
+        rebuild_rollups()
+        rebuild_all_streaks()
+        db.session.commit()
+        return writer.counts
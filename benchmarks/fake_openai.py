@@ -0,0 +1,156 @@
+"""Stand-ins for the OpenAI chat completions API.
+
+FakeOpenAI is an in-process drop-in for the parts of the client the app
+uses. serve() runs an HTTP server speaking the same wire format, for
+exercising the real client (point OPENAI_BASE_URL at it). Both can be made
+slow (latency, chunk_delay) or flaky (error_rate) to exercise timeouts and
+the circuit breaker.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+RECOMMENDATIONS = [
+    'Start with the assignment due soonest while your focus is fresh.',
+    'Split long study blocks into 50-minute sessions with short breaks.',
+    'Review yesterday\'s notes for ten minutes before starting new material.',
+    'Schedule a catch-up block for overdue tasks before adding new ones.',
+    'Finish the day by planning tomorrow\'s first session.',
+]
+
+
+def completion_text(recommendations=RECOMMENDATIONS):
+    """The fenced JSON array a real model tends to return"""
+    return '```json\n' + json.dumps(recommendations) + '\n```'
+
+
+def text_chunks(text, size=8):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+class FakeAPIError(Exception):
+    """Stands in for openai.APIStatusError"""
+
+    def __init__(self, status_code):
+        super().__init__(f'Error code: {status_code}')
+        self.status_code = status_code
+
+
+class _Completions:
+    def __init__(self, owner):
+        self._owner = owner
+
+    def create(self, model=None, messages=None, max_tokens=None, stream=False, timeout=None, **kwargs):
+        owner = self._owner
+        with owner.lock:
+            owner.calls += 1
+        if owner.latency:
+            if timeout is not None and owner.latency > timeout:
+                time.sleep(timeout)
+                raise TimeoutError('Request timed out.')
+            time.sleep(owner.latency)
+        if owner.error_rate and random.random() < owner.error_rate:
+            raise FakeAPIError(owner.error_status)
+        text = completion_text(owner.recommendations)
+        if not stream:
+            message = SimpleNamespace(role='assistant', content=text)
+            return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason='stop')])
+        return self._stream(text)
+
+    def _stream(self, text):
+        for piece in text_chunks(text):
+            if self._owner.chunk_delay:
+                time.sleep(self._owner.chunk_delay)
+            delta = SimpleNamespace(role=None, content=piece)
+            yield SimpleNamespace(choices=[SimpleNamespace(index=0, delta=delta, finish_reason=None)])
+
+
+class FakeOpenAI:
+    """Answers chat.completions.create locally after an optional delay"""
+
+    def __init__(self, latency=0.0, chunk_delay=0.0, recommendations=RECOMMENDATIONS,
+                 error_rate=0.0, error_status=500):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.recommendations = list(recommendations)
+        self.calls = 0
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=_Completions(self))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        settings = self.server.settings
+        text = completion_text()
+        if settings['latency']:
+            time.sleep(settings['latency'])
+        if settings['error_rate'] and random.random() < settings['error_rate']:
+            payload = json.dumps({'error': {'message': 'Simulated upstream failure', 'type': 'server_error'}})
+            payload = payload.encode('utf-8')
+            self.send_response(settings['error_status'])
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            for piece in text_chunks(text):
+                chunk = {
+                    'id': 'chatcmpl-fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': body.get('model', 'fake'),
+                    'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]
+                }
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                if settings['chunk_delay']:
+                    time.sleep(settings['chunk_delay'])
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.wfile.flush()
+            self.close_connection = True
+            return
+
+        payload = json.dumps({
+            'id': 'chatcmpl-fake', 'object': 'chat.completion', 'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def make_server(host='127.0.0.1', port=8765, latency=0.0, chunk_delay=0.0, error_rate=0.0, error_status=500):
+    """Build (but do not start) a fake chat completions server"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.settings = {'latency': latency, 'chunk_delay': chunk_delay,
+                       'error_rate': error_rate, 'error_status': error_status}
+    return server
+
+
+def serve(host='127.0.0.1', port=8765, latency=0.0, chunk_delay=0.0, error_rate=0.0, error_status=500):
+    server = make_server(host, port, latency, chunk_delay, error_rate, error_status)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
@@ -0,0 +1,422 @@
+"""Latency, throughput and query-count benchmarks for every route.
+
+Each scenario is one request shape. Untimed setup builds whatever the
+request needs (a row to delete, an ETag to revalidate); only the request
+itself, including reading the body, is timed. Queries are counted on the
+request thread, so background work such as recommendation refreshes is
+not charged to the route that scheduled it.
+"""
+import json
+import os
+import platform
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+# A run regresses when p95 grows by more than this fraction and at least
+# MIN_REGRESSION_MS, or when a route issues more queries than before
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 2.0
+QUERY_TOLERANCE = 0.5
+
+IMPORT_TITLE = 'benchmark import'
+
+
+class Scenario:
+    def __init__(self, name, method, path, json=None, data=None, headers=None, setup=None,
+                 teardown=None, expect=(200,), first_chunk=False, read_only=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.json = json
+        self.data = data
+        self.headers = headers or {}
+        # setup(client, context) -> dict overriding path/json/data/headers for one request
+        self.setup = setup
+        self.teardown = teardown
+        self.expect = expect
+        # Streams that never end are timed to their first event
+        self.first_chunk = first_chunk
+        self.read_only = method == 'GET' if read_only is None else read_only
+
+
+class QueryCounter:
+    """Counts statements per thread on an engine"""
+
+    def __init__(self, engine):
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def _create_session(client, context):
+    response = client.post('/api/sessions', json={
+        'title': 'Benchmark session', 'subject': 'benchmark', 'date': context['today'],
+        'startTime': '06:00', 'endTime': '06:30'
+    })
+    return response.get_json()['id']
+
+
+def _ensure_session(client, context):
+    # The 06:00 session may already exist from an earlier iteration
+    client.post('/api/sessions', json={
+        'title': 'Benchmark session', 'subject': 'benchmark', 'date': context['today'],
+        'startTime': '06:00', 'endTime': '06:30'
+    })
+    return {}
+
+
+def _create_task(client, context):
+    response = client.post('/api/tasks', json={'title': 'Benchmark task', 'dueDate': context['today']})
+    return response.get_json()['id']
+
+
+def _start_focus(client, context):
+    client.post('/api/focus/start', json={'subject': 'Benchmark'})
+    return {}
+
+
+def _sync_from_previous_version(client, context):
+    version = client.get('/api/sync?since=0&entities=tasks').get_json()['version']
+    return {'path': f'/api/sync?since={max(1, version - 1)}'}
+
+
+def _preview_then_commit(cleanup, body):
+    def setup(client, context):
+        cleanup()
+        preview = client.post('/api/plan/preview', json=body).get_json()
+        return {'json': dict(body, version=preview['version'], plannedAt=preview['plannedAt'])}
+    return setup
+
+
+def _etag(path):
+    def setup(client, context):
+        return {'headers': {'If-None-Match': client.get(path).headers['ETag']}}
+    return setup
+
+
+def _remove_benchmark_rows(app_module):
+    from models import db, StudySession, Task, FocusSession
+    from rollups import rebuild_rollups
+    from streaks import rebuild_streak
+
+    with app_module.app.app_context():
+        StudySession.query.filter_by(user_id=1, subject='benchmark').delete(synchronize_session=False)
+        Task.query.filter(Task.user_id == 1, Task.title.in_(['Benchmark task', IMPORT_TITLE])).delete(
+            synchronize_session=False)
+        FocusSession.query.filter_by(user_id=1, subject='Benchmark').delete(synchronize_session=False)
+        rebuild_rollups(1)
+        rebuild_streak(1)
+        db.session.commit()
+
+
+def build_scenarios(app_module, context):
+    """The default scenario list; every route appears at least once"""
+    today = context['today']
+    month = today[:7]
+    session_id = context['session_id']
+    task_id = context['task_id']
+    cleanup = lambda: _remove_benchmark_rows(app_module)
+    plan_end = (date.fromisoformat(today) + timedelta(days=30)).isoformat()
+    plan_body = {'taskIds': [task_id], 'subject': 'benchmark', 'estimates': {str(task_id): 120}}
+    import_body = '\n'.join(json.dumps({'title': IMPORT_TITLE, 'dueDate': today}) for _ in range(50))
+
+    return [
+        Scenario('page_index', 'GET', '/'),
+        Scenario('page_dashboard', 'GET', '/dashboard'),
+        Scenario('page_planner', 'GET', '/planner'),
+        Scenario('page_progress', 'GET', '/progress'),
+        Scenario('page_features', 'GET', '/features'),
+        Scenario('page_settings', 'GET', '/settings'),
+        Scenario('static_script', 'GET', '/static/js/script.js'),
+
+        Scenario('sessions_day', 'GET', f'/api/sessions?date={today}'),
+        Scenario('sessions_page', 'GET', '/api/sessions?limit=100&order=desc'),
+        Scenario('sessions_range', 'GET', f'/api/sessions?from={month}-01&to={today}&limit=500'),
+        Scenario('sessions_calendar', 'GET', f'/api/sessions/calendar?month={month}'),
+        Scenario('sessions_calendar_304', 'GET', f'/api/sessions/calendar?month={month}',
+                 setup=_etag(f'/api/sessions/calendar?month={month}'), expect=(304,)),
+        Scenario('sessions_formatted', 'GET', '/api/sessions/formatted'),
+        Scenario('session_get', 'GET', f'/api/sessions/{session_id}'),
+        Scenario('session_create', 'POST', '/api/sessions', json={
+            'title': 'Benchmark session', 'subject': 'benchmark', 'date': today,
+            'startTime': '06:00', 'endTime': '06:30'
+        }, expect=(201,), setup=lambda client, ctx: cleanup() or {}, teardown=cleanup),
+        Scenario('session_update', 'PUT', f'/api/sessions/{session_id}', json={'notes': ''}),
+        Scenario('session_delete', 'DELETE', '/api/sessions/0',
+                 setup=lambda client, ctx: {'path': f'/api/sessions/{_create_session(client, ctx)}'}),
+        Scenario('session_overlap', 'POST', '/api/sessions', json={
+            'title': 'Benchmark session', 'subject': 'benchmark', 'date': today,
+            'startTime': '06:15', 'endTime': '06:45'
+        }, expect=(409,), setup=_ensure_session, teardown=cleanup),
+        Scenario('sessions_free_slots', 'GET', f'/api/sessions/free-slots?from={month}-01&to={plan_end}'),
+
+        Scenario('tasks_list', 'GET', '/api/tasks'),
+        Scenario('tasks_list_304', 'GET', '/api/tasks', setup=_etag('/api/tasks'), expect=(304,)),
+        Scenario('task_create', 'POST', '/api/tasks', json={'title': 'Benchmark task', 'dueDate': today},
+                 expect=(201,), teardown=cleanup),
+        Scenario('task_toggle', 'POST', f'/api/tasks/{task_id}/toggle'),
+        Scenario('task_delete', 'DELETE', '/api/tasks/0',
+                 setup=lambda client, ctx: {'path': f'/api/tasks/{_create_task(client, ctx)}'}),
+        Scenario('batch_toggle', 'POST', '/api/batch', json={'operations': [
+            {'op': 'toggle', 'type': 'task', 'id': task_id},
+            {'op': 'toggle', 'type': 'task', 'id': task_id}
+        ]}),
+
+        Scenario('plan_preview', 'POST', '/api/plan/preview', json={'end': plan_end}, read_only=True),
+        Scenario('plan_commit', 'POST', '/api/plan/commit', json=plan_body,
+                 setup=_preview_then_commit(cleanup, plan_body), teardown=cleanup, expect=(201,)),
+
+        Scenario('dashboard_stats', 'GET', '/api/dashboard/stats'),
+        Scenario('dashboard_stats_304', 'GET', '/api/dashboard/stats',
+                 setup=_etag('/api/dashboard/stats'), expect=(304,)),
+        Scenario('progress_week', 'GET', '/api/progress/stats'),
+        Scenario('progress_year', 'GET', '/api/progress/stats?range=year'),
+        Scenario('date_current', 'GET', '/api/date/current'),
+        Scenario('metrics', 'GET', '/metrics'),
+        Scenario('profiling_report', 'GET', '/api/profiling/report', expect=(200, 404)),
+
+        Scenario('focus_current', 'GET', '/api/focus/current'),
+        Scenario('focus_history', 'GET', '/api/focus/history?order=desc&limit=10'),
+        Scenario('focus_start', 'POST', '/api/focus/start', json={'subject': 'Benchmark'}),
+        Scenario('focus_end', 'POST', '/api/focus/end', setup=_start_focus, teardown=cleanup),
+
+        Scenario('ai_recommendations', 'GET', '/api/ai/recommendations'),
+        Scenario('ai_recommendations_stream', 'GET', '/api/ai/recommendations/stream?refresh=1'),
+        Scenario('events_connect', 'GET', '/api/events', first_chunk=True),
+
+        Scenario('sync_snapshot', 'GET', '/api/sync?since=0&entities=tasks,sessions'),
+        Scenario('sync_delta', 'GET', '/api/sync?since=1', setup=_sync_from_previous_version),
+        Scenario('export_tasks', 'GET', '/api/export/tasks'),
+        Scenario('import_tasks', 'POST', '/api/import/tasks', data=import_body, teardown=cleanup,
+                 headers={'Content-Type': 'application/x-ndjson'}),
+    ]
+
+
+def _context(app_module):
+    from models import StudySession, Task
+
+    with app_module.app.app_context():
+        session = StudySession.query.filter_by(user_id=1).order_by(StudySession.id).first()
+        task = Task.query.filter_by(user_id=1).order_by(Task.id).first()
+    if session is None or task is None:
+        raise RuntimeError('User 1 needs at least one session and task; run `generate` first')
+    return {'today': date.today().strftime('%Y-%m-%d'), 'session_id': session.id, 'task_id': task.id}
+
+
+def _timed_request(client, scenario, overrides, counter):
+    kwargs = {
+        'method': scenario.method,
+        'path': overrides.get('path', scenario.path),
+        'headers': overrides.get('headers', scenario.headers),
+        'buffered': False
+    }
+    if scenario.json is not None:
+        kwargs['json'] = overrides.get('json', scenario.json)
+    if scenario.data is not None:
+        kwargs['data'] = overrides.get('data', scenario.data)
+
+    counter.reset()
+    started = time.perf_counter()
+    response = client.open(**kwargs)
+    if scenario.first_chunk:
+        next(iter(response.response), None)
+    else:
+        response.get_data()
+    elapsed = time.perf_counter() - started
+    queries = counter.count
+    response.close()
+    return response.status_code, elapsed, queries
+
+
+def run_scenario(app_module, scenario, context, counter, iterations, warmup):
+    client = app_module.app.test_client()
+    latencies = []
+    queries = []
+    statuses = {}
+    busy = 0.0
+    for i in range(warmup + iterations):
+        overrides = scenario.setup(client, context) if scenario.setup else {}
+        status, elapsed, count = _timed_request(client, scenario, overrides or {}, counter)
+        if i < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(count)
+        busy += elapsed
+        statuses[status] = statuses.get(status, 0) + 1
+    if scenario.teardown:
+        scenario.teardown()
+
+    latencies.sort()
+    unexpected = {s: n for s, n in statuses.items() if s not in scenario.expect}
+    return {
+        'method': scenario.method,
+        'path': scenario.path,
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 0.50), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'p99_ms': round(percentile(latencies, 0.99), 3),
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'rps': round(iterations / busy, 1) if busy else None,
+        'queries': round(sum(queries) / len(queries), 2),
+        'unexpected_status': unexpected
+    }
+
+
+def run_concurrent(app_module, scenario, context, iterations, concurrency):
+    """Requests per second with concurrency threads each sending iterations requests"""
+    errors = []
+    ready = threading.Event()
+
+    def worker():
+        client = app_module.app.test_client()
+        try:
+            # Read scenarios' setup output does not change between requests
+            overrides = (scenario.setup(client, context) if scenario.setup else None) or {}
+            ready.wait()
+            for _ in range(iterations):
+                response = client.open(method=scenario.method,
+                                       path=overrides.get('path', scenario.path),
+                                       headers=overrides.get('headers', scenario.headers))
+                response.close()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    started = time.perf_counter()
+    ready.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    if errors:
+        raise errors[0]
+    return round(iterations * concurrency / elapsed, 1)
+
+
+def uncovered_routes(app_module, scenarios):
+    """(endpoint, method) pairs of the app that no scenario exercises"""
+    app = app_module.app
+    adapter = app.url_map.bind('localhost')
+    covered = set()
+    for scenario in scenarios:
+        endpoint, _ = adapter.match(scenario.path.split('?')[0], method=scenario.method)
+        covered.add((endpoint, scenario.method))
+    routes = set()
+    for rule in app.url_map.iter_rules():
+        for method in rule.methods - {'HEAD', 'OPTIONS'}:
+            routes.add((rule.endpoint, method))
+    return sorted(routes - covered)
+
+
+def run(app_module, iterations=50, warmup=5, only=None, concurrency=1, log=print):
+    """Run the scenarios (optionally those whose name contains only) and return results"""
+    from models import db, StudySession, Task, FocusSession
+
+    context = _context(app_module)
+    scenarios = build_scenarios(app_module, context)
+    missing = uncovered_routes(app_module, scenarios)
+    if only:
+        scenarios = [s for s in scenarios if only in s.name]
+
+    with app_module.app.app_context():
+        counter = QueryCounter(db.engine)
+        scale = {
+            'sessions': db.session.query(StudySession).count(),
+            'tasks': db.session.query(Task).count(),
+            'focus': db.session.query(FocusSession).count(),
+        }
+
+    results = {}
+    for scenario in scenarios:
+        result = run_scenario(app_module, scenario, context, counter, iterations, warmup)
+        if concurrency > 1 and scenario.read_only and not scenario.first_chunk:
+            result['concurrent_rps'] = run_concurrent(app_module, scenario, context, iterations, concurrency)
+        results[scenario.name] = result
+        log(format_row(scenario.name, result))
+
+    return {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'concurrency': concurrency,
+            'scale': scale,
+            'uncovered_routes': [f'{method} {endpoint}' for endpoint, method in missing]
+        },
+        'scenarios': results
+    }
+
+
+def format_header():
+    return f"{'scenario':<28}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'queries':>9}"
+
+
+def format_row(name, result):
+    line = (f"{name:<28}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+            f"{result['rps'] or 0:>9.1f}{result['queries']:>9.2f}")
+    if result.get('concurrent_rps'):
+        line += f"  ({result['concurrent_rps']} req/s concurrent)"
+    if result['unexpected_status']:
+        line += f"  unexpected status {result['unexpected_status']}"
+    return line
+
+
+def baseline_path(name):
+    return os.path.join(BASELINE_DIR, f'{name}.json')
+
+
+def save_results(results, path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=MIN_REGRESSION_MS):
+    """List regressions of current against baseline as human-readable strings"""
+    regressions = []
+    for name, result in current['scenarios'].items():
+        if result['unexpected_status']:
+            regressions.append(f"{name}: unexpected status {result['unexpected_status']}")
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            continue
+        limit = base['p95_ms'] * (1 + tolerance)
+        if result['p95_ms'] > limit and result['p95_ms'] - base['p95_ms'] >= min_delta_ms:
+            regressions.append(f"{name}: p95 {result['p95_ms']:.2f} ms vs {base['p95_ms']:.2f} ms baseline")
+        if result['queries'] > base['queries'] + QUERY_TOLERANCE:
+            regressions.append(f"{name}: {result['queries']} queries vs {base['queries']} baseline")
+    return regressions
@@ -0,0 +1,59 @@
+"""Cold start: how long a fresh process takes to serve its first request.
+
+Each sample runs in a new interpreter, as a restarted Gunicorn worker or a
+newly scaled instance would, and records the time to import the app, to
+answer the first request, and the whole process wall time. It also notes
+whether the OpenAI SDK got imported along the way.
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.runner import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Median time to the first response that `startup` checks by default
+DEFAULT_TARGET_MS = 750.0
+
+_PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter()
+response = app_module.app.test_client().get(sys.argv[1])
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_request_ms': (served - imported) * 1000,
+    'ready_ms': (served - started) * 1000,
+    'status': response.status_code,
+    'openai_imported': 'openai' in sys.modules,
+}))
+'''
+
+
+def sample(db_path, path):
+    """One cold start in a fresh interpreter"""
+    env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.abspath(db_path))
+    env.setdefault('OPENAI_API_KEY', 'benchmark')
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', _PROBE, path], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def measure(db_path, path='/api/tasks', runs=5):
+    """Summary of several cold starts: medians and worst cases per phase"""
+    samples = [sample(db_path, path) for _ in range(runs)]
+    summary = {'path': path, 'runs': runs,
+               'statuses': sorted({s['status'] for s in samples}),
+               'openai_imported': any(s['openai_imported'] for s in samples)}
+    for phase in ('import_ms', 'first_request_ms', 'ready_ms', 'process_ms'):
+        values = sorted(s[phase] for s in samples)
+        summary[phase] = {'p50': round(percentile(values, 0.5), 2), 'max': round(values[-1], 2)}
+    return summary
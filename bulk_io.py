@@ -0,0 +1,293 @@
+"""Streaming bulk import/export of sessions, tasks and focus history"""
+import csv
+import io
+import json
+from datetime import date, datetime, time
+
+from changelog import reset_change_log
+from intervals import sessions_on_days
+from models import db, StudySession, Task, FocusSession
+from rollups import month_start, record_focus_session, record_task_completion, record_task_created
+from streaks import rebuild_streak
+from versions import bump_version
+
+IMPORT_BATCH_SIZE = 5000
+EXPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', ''}
+
+
+def _required(record, field):
+    value = record.get(field)
+    if value is None or value == '':
+        raise ValueError(f"Missing field '{field}'")
+    return value
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"Invalid boolean '{value}'")
+
+
+def _parse_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid integer for '{field}'")
+
+
+def _session_row(record, user_id, now):
+    start_time = time.fromisoformat(_required(record, 'startTime'))
+    end_time = time.fromisoformat(_required(record, 'endTime'))
+    if end_time <= start_time:
+        raise ValueError('endTime must be after startTime')
+    return {
+        'user_id': user_id,
+        'title': _required(record, 'title'),
+        'subject': _required(record, 'subject'),
+        'date': date.fromisoformat(_required(record, 'date')),
+        'start_time': start_time,
+        'end_time': end_time,
+        'color': record.get('color') or 'blue',
+        'priority': record.get('priority') or 'medium',
+        'notes': record.get('notes') or '',
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def _task_row(record, user_id, now):
+    completed = _parse_bool(record.get('completed', False))
+    return {
+        'user_id': user_id,
+        'title': _required(record, 'title'),
+        'due_date': date.fromisoformat(_required(record, 'dueDate')),
+        'completed': completed,
+        'completed_at': now if completed else None,
+        'created_at': now,
+        'updated_at': now
+    }
+
+
+def _focus_row(record, user_id, now):
+    start_time = datetime.fromisoformat(_required(record, 'start_time'))
+    end_time = record.get('end_time')
+    duration = _parse_int(_required(record, 'duration'), 'duration')
+    if duration < 0:
+        raise ValueError('duration must not be negative')
+    return {
+        'user_id': user_id,
+        'subject': _required(record, 'subject'),
+        'date': date.fromisoformat(record['date']) if record.get('date') else start_time.date(),
+        'start_time': start_time,
+        'end_time': datetime.fromisoformat(end_time) if end_time else None,
+        'duration': duration,
+        'created_at': now
+    }
+
+
+# kind -> (model, row builder, export columns)
+KINDS = {
+    'sessions': (StudySession, _session_row,
+                 ['id', 'title', 'subject', 'date', 'startTime', 'endTime', 'color', 'priority', 'notes']),
+    'tasks': (Task, _task_row, ['id', 'title', 'dueDate', 'completed']),
+    'focus': (FocusSession, _focus_row, ['id', 'subject', 'date', 'start_time', 'end_time', 'duration']),
+}
+
+
+def iter_ndjson(stream):
+    """Yield (line_number, record) from a binary NDJSON stream"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, ValueError(f'Invalid JSON: {e.msg}')
+            continue
+        if not isinstance(record, dict):
+            yield line_number, ValueError('Each line must be a JSON object')
+            continue
+        yield line_number, record
+
+
+def iter_csv(stream):
+    """Yield (line_number, record) from a binary CSV stream with a header row"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8', newline=''))
+    for record in reader:
+        yield reader.line_num, record
+
+
+def _apply_rollups(kind, rows):
+    """Fold a batch of inserted rows into the rollup tables"""
+    if kind == 'focus':
+        daily = {}
+        for row in rows:
+            totals = daily.setdefault((row['user_id'], row['date'], row['subject']), [0, 0])
+            totals[0] += row['duration']
+            totals[1] += 1
+        for (user_id, day, subject), (minutes, sessions) in daily.items():
+            record_focus_session(user_id, day, subject, minutes, sessions)
+    elif kind == 'tasks':
+        created = {}
+        completed = {}
+        for row in rows:
+            key = (row['user_id'], month_start(row['created_at']))
+            created[key] = created.get(key, 0) + 1
+            if row['completed']:
+                key = (row['user_id'], month_start(row['completed_at']))
+                completed[key] = completed.get(key, 0) + 1
+        for (user_id, month), count in created.items():
+            record_task_created(user_id, month, count)
+        for (user_id, month), count in completed.items():
+            record_task_completion(user_id, month, count)
+
+
+def _overlapping_sessions(rows, user_id):
+    """{row index: error} for session rows overlapping an existing session or an earlier row"""
+    taken = sessions_on_days(user_id, {row['date'] for row in rows})
+    overlaps = {}
+    for index, row in enumerate(rows):
+        day = taken.setdefault(row['date'], [])
+        for start_time, end_time, title in day:
+            if start_time < row['end_time'] and end_time > row['start_time']:
+                overlaps[index] = f"Overlaps '{title}' ({start_time.strftime('%H:%M')}-{end_time.strftime('%H:%M')})"
+                break
+        else:
+            day.append((row['start_time'], row['end_time'], row['title']))
+    return overlaps
+
+
+def import_records(kind, records, user_id, batch_size=IMPORT_BATCH_SIZE):
+    """Validate and insert (line_number, record) pairs in batched transactions.
+
+    Invalid rows are skipped and reported; valid rows are committed every
+    batch_size rows so a bad line late in a file does not discard the rest.
+    Sessions overlapping an existing session or an earlier row of the file
+    are rejected like any other invalid row.
+    """
+    model, build_row, _ = KINDS[kind]
+    now = datetime.utcnow()
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    lines = []
+
+    def reject(line_number, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({'line': line_number, 'error': message})
+
+    def flush():
+        nonlocal imported
+        rows = batch
+        if kind == 'sessions':
+            overlaps = _overlapping_sessions(batch, user_id)
+            for index, message in overlaps.items():
+                reject(lines[index], message)
+            rows = [row for index, row in enumerate(batch) if index not in overlaps]
+        if rows:
+            db.session.execute(db.insert(model), rows)
+            _apply_rollups(kind, rows)
+            # Core inserts skip the ORM flush hook, so bump the version here and
+            # make sync clients take a fresh snapshot
+            reset_change_log(user_id, bump_version(user_id))
+            db.session.commit()
+        imported += len(rows)
+        batch.clear()
+        lines.clear()
+
+    for line_number, record in records:
+        try:
+            if isinstance(record, Exception):
+                raise record
+            batch.append(build_row(record, user_id, now))
+            lines.append(line_number)
+        except (ValueError, TypeError) as e:
+            reject(line_number, str(e))
+            continue
+        if len(batch) >= batch_size:
+            flush()
+
+    if batch:
+        flush()
+    # Overlaps are found when a batch is flushed, after later rows were parsed
+    errors.sort(key=lambda error: error['line'])
+
+    if kind == 'focus' and imported:
+        rebuild_streak(user_id)
+        db.session.commit()
+
+    return {'kind': kind, 'imported': imported, 'failed': failed, 'errors': errors}
+
+
+def _format_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, date):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, time):
+        return value.strftime('%H:%M')
+    return value
+
+
+def iter_export_rows(kind, user_id):
+    """Yield export dicts for a user, streamed from the database in batches"""
+    model, _, fields = KINDS[kind]
+    if kind == 'sessions':
+        columns = [model.id, model.title, model.subject, model.date, model.start_time,
+                   model.end_time, model.color, model.priority, model.notes]
+        order = [model.date, model.start_time, model.id]
+    elif kind == 'tasks':
+        columns = [model.id, model.title, model.due_date, model.completed]
+        order = [model.due_date, model.id]
+    else:
+        columns = [model.id, model.subject, model.date, model.start_time, model.end_time, model.duration]
+        order = [model.date, model.start_time, model.id]
+
+    result = db.session.execute(
+        db.select(*columns).where(model.user_id == user_id).order_by(*order)
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in result:
+        yield dict(zip(fields, (_format_value(v) for v in row)))
+
+
+def export_ndjson(kind, user_id):
+    """Yield NDJSON chunks for a user's rows"""
+    buffer = []
+    for row in iter_export_rows(kind, user_id):
+        buffer.append(json.dumps(row))
+        if len(buffer) >= EXPORT_BATCH_SIZE:
+            yield '\n'.join(buffer) + '\n'
+            buffer = []
+    if buffer:
+        yield '\n'.join(buffer) + '\n'
+
+
+def export_csv(kind, user_id):
+    """Yield CSV chunks (header first) for a user's rows"""
+    fields = KINDS[kind][2]
+    out = io.StringIO()
+    writer = csv.DictWriter(out, fieldnames=fields)
+    writer.writeheader()
+    count = 0
+    for row in iter_export_rows(kind, user_id):
+        writer.writerow(row)
+        count += 1
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+    yield out.getvalue()
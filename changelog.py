@@ -0,0 +1,224 @@
+"""Change log behind the delta sync API.
+
+Every flush that touches a session, task or focus record writes one row
+per record stamped with the user's new data version, replacing any older
+row for the same record. The log therefore holds at most one entry per
+record, and a delta is proportional to what changed since the client's
+version rather than to the size of its history.
+"""
+from datetime import datetime, timedelta
+
+from models import db, ChangeLogEntry, ChangeLogFloor, StudySession, Task, FocusSession
+from pagination import InvalidCursor, decode_cursor, encode_cursor
+from versions import current_version, flush_listeners
+
+ENTITIES = {'sessions': StudySession, 'tasks': Task, 'focus': FocusSession}
+ENTITY_NAMES = {model: name for name, model in ENTITIES.items()}
+
+TOMBSTONE_RETENTION_DAYS = 30
+FETCH_CHUNK_SIZE = 500
+# Records per snapshot page, across all requested entities
+SNAPSHOT_PAGE_SIZE = 1000
+
+
+def _collect_changes(session):
+    """Map (user_id, entity, entity_id) -> deleted for records in this flush"""
+    changes = {}
+    for obj in session.new:
+        if type(obj) in ENTITY_NAMES:
+            changes[(obj.user_id, ENTITY_NAMES[type(obj)], obj.id)] = False
+    for obj in session.dirty:
+        if type(obj) in ENTITY_NAMES and session.is_modified(obj):
+            changes[(obj.user_id, ENTITY_NAMES[type(obj)], obj.id)] = False
+    for obj in session.deleted:
+        if type(obj) in ENTITY_NAMES:
+            changes[(obj.user_id, ENTITY_NAMES[type(obj)], obj.id)] = True
+    return changes
+
+
+def _record_changes(session, connection, versions):
+    changes = _collect_changes(session)
+    if not changes:
+        return
+    table = ChangeLogEntry.__table__
+    now = datetime.utcnow()
+
+    superseded = {}
+    rows = []
+    for (user_id, entity, entity_id), deleted in changes.items():
+        superseded.setdefault((user_id, entity), []).append(entity_id)
+        rows.append({'user_id': user_id, 'version': versions[user_id], 'entity': entity,
+                     'entity_id': entity_id, 'deleted': deleted, 'changed_at': now})
+
+    # Keep only the newest entry per record
+    for (user_id, entity), ids in superseded.items():
+        connection.execute(table.delete().where(
+            table.c.user_id == user_id, table.c.entity == entity, table.c.entity_id.in_(ids)
+        ))
+    connection.execute(table.insert(), rows)
+
+
+def install_change_log():
+    """Write change-log rows alongside every version bump"""
+    if _record_changes not in flush_listeners:
+        flush_listeners.append(_record_changes)
+
+
+def floor_version(user_id):
+    floor = db.session.get(ChangeLogFloor, user_id)
+    return floor.version if floor else 0
+
+
+def schedule_version(user_id):
+    """Version of the user's last session or task change.
+
+    Unlike the data version it ignores focus timer and history writes.
+    Compaction and bulk imports raise the floor past any entry they drop,
+    so the value never goes backwards.
+    """
+    latest = db.session.execute(
+        db.select(ChangeLogEntry.version).where(
+            ChangeLogEntry.user_id == user_id,
+            ChangeLogEntry.entity.in_(('sessions', 'tasks'))
+        ).order_by(ChangeLogEntry.version.desc()).limit(1)
+    ).scalar()
+    return max(latest or 0, floor_version(user_id))
+
+
+def _raise_floor(user_id, version):
+    floor = db.session.get(ChangeLogFloor, user_id)
+    if floor is None:
+        db.session.add(ChangeLogFloor(user_id=user_id, version=version))
+    elif version > floor.version:
+        floor.version = version
+
+
+def reset_change_log(user_id, version):
+    """Drop a user's log and force clients older than version to resnapshot.
+
+    Used after writes that bypass the ORM (bulk imports), which the log
+    cannot describe record by record.
+    """
+    db.session.execute(db.delete(ChangeLogEntry).where(ChangeLogEntry.user_id == user_id))
+    _raise_floor(user_id, version)
+
+
+def compact_change_log(retention_days=TOMBSTONE_RETENTION_DAYS, user_id=None):
+    """Remove tombstones older than retention_days; returns how many were removed.
+
+    Clients that last synced before a removed tombstone get a full snapshot
+    on their next sync instead of a delta. The caller commits.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    query = db.select(ChangeLogEntry.user_id, db.func.max(ChangeLogEntry.version)).where(
+        ChangeLogEntry.deleted.is_(True), ChangeLogEntry.changed_at < cutoff
+    ).group_by(ChangeLogEntry.user_id)
+    if user_id is not None:
+        query = query.where(ChangeLogEntry.user_id == user_id)
+
+    removed = 0
+    for owner, version in db.session.execute(query).all():
+        removed += db.session.execute(db.delete(ChangeLogEntry).where(
+            ChangeLogEntry.user_id == owner,
+            ChangeLogEntry.deleted.is_(True),
+            ChangeLogEntry.version <= version
+        )).rowcount
+        _raise_floor(owner, version)
+    return removed
+
+
+def _fetch(model, user_id, ids):
+    rows = []
+    for i in range(0, len(ids), FETCH_CHUNK_SIZE):
+        chunk = ids[i:i + FETCH_CHUNK_SIZE]
+        rows.extend(model.query.filter(model.user_id == user_id, model.id.in_(chunk))
+                    .order_by(model.id).all())
+    return rows
+
+
+def snapshot(user_id, version, entities, cursor=None, limit=SNAPSHOT_PAGE_SIZE):
+    """One page of a full copy of the requested entities, valid as of at least version.
+
+    Records are paged by (entity, id). Every page carries the version read
+    for the first one, and 'next' is the cursor for the following page, or
+    None on the last. Records written while a client pages through are
+    sent again by its next delta from that version.
+    """
+    start, after_id = 0, 0
+    if cursor:
+        version, entity, after_id = decode_cursor(cursor, (int, str, int))
+        if entity not in entities:
+            raise InvalidCursor('Cursor does not match the requested entities')
+        start = entities.index(entity)
+
+    page = {entity: [] for entity in entities}
+    remaining = limit
+    next_cursor = None
+    for entity in entities[start:]:
+        if remaining == 0:
+            next_cursor = encode_cursor([version, entity, after_id])
+            break
+        model = ENTITIES[entity]
+        rows = model.query.filter(model.user_id == user_id, model.id > after_id) \
+            .order_by(model.id).limit(remaining + 1).all()
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            next_cursor = encode_cursor([version, entity, rows[-1].id])
+        page[entity] = [row.to_dict() for row in rows]
+        if next_cursor:
+            break
+        remaining -= len(rows)
+        after_id = 0
+
+    return {
+        'version': version,
+        'reset': True,
+        'next': next_cursor,
+        'changes': {entity: {'upserted': page[entity], 'deleted': []} for entity in entities}
+    }
+
+
+def changes_since(user_id, since, entities=None, cursor=None):
+    """Build the /api/sync payload for a client holding data at version since.
+
+    The version is read before any records, so a write that lands while
+    the payload is being built is sent again on the next sync; applying
+    upserts and deletes is idempotent on the client. A cursor continues
+    a snapshot.
+    """
+    entities = list(entities or ENTITIES)
+    if cursor:
+        return snapshot(user_id, None, entities, cursor)
+    version = current_version(user_id)
+    if since <= 0 or since > version or since < floor_version(user_id):
+        return snapshot(user_id, version, entities)
+
+    entries = db.session.execute(
+        db.select(ChangeLogEntry.entity, ChangeLogEntry.entity_id, ChangeLogEntry.deleted).where(
+            ChangeLogEntry.user_id == user_id,
+            ChangeLogEntry.version > since,
+            ChangeLogEntry.version <= version,
+            ChangeLogEntry.entity.in_(entities)
+        )
+    ).all()
+
+    upserted = {entity: [] for entity in entities}
+    deleted = {entity: [] for entity in entities}
+    for entity, entity_id, is_deleted in entries:
+        (deleted if is_deleted else upserted)[entity].append(entity_id)
+
+    return {
+        'version': version,
+        'reset': False,
+        'next': None,
+        'changes': {
+            entity: {
+                # A record deleted after the version was read is skipped here
+                # and arrives as a tombstone on the next sync
+                'upserted': [row.to_dict() for row in
+                             _fetch(ENTITIES[entity], user_id, sorted(upserted[entity]))],
+                'deleted': sorted(deleted[entity])
+            }
+            for entity in entities
+        }
+    }
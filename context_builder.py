@@ -0,0 +1,234 @@
+"""User context for AI recommendations, at a cost independent of backlog size.
+
+The snapshot comes from a fixed set of queries: one statement of counts
+and totals (task totals from the monthly rollups), the top-ranked rows of
+each list behind a LIMIT, focus minutes per subject from the daily
+rollups, and the streak record. The prompt sections are then fitted to a
+token budget; items that do not fit are summarised as a count.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+from models import db, Task, StudySession, DailySubjectRollup, MonthlyTaskRollup
+from streaks import current_streak, get_streak
+
+# Rows fetched per list; more than the budget ever lets through
+MAX_LIST_ITEMS = 25
+MAX_SUBJECTS = 8
+UPCOMING_TASK_DAYS = 7
+UPCOMING_SESSION_DAYS = 3
+FOCUS_WINDOW_DAYS = 7
+# How far back subjects count as ones the user is studying
+RECENT_SUBJECT_DAYS = 30
+
+# Token budget shared by the list sections of the prompt
+DEFAULT_TOKEN_BUDGET = int(os.environ.get('AI_CONTEXT_TOKEN_BUDGET', 600))
+# Rough size of English text in tokens; avoids shipping a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def _counts(user_id, today):
+    """All counts and totals in a single statement of scalar subqueries"""
+    def count(model, *conditions):
+        return db.select(db.func.count()).select_from(model).where(
+            model.user_id == user_id, *conditions).scalar_subquery()
+
+    row = db.session.execute(db.select(
+        count(Task, Task.due_date >= today, Task.due_date <= today + timedelta(days=UPCOMING_TASK_DAYS)),
+        count(Task, Task.completed.is_(False), Task.due_date < today),
+        count(StudySession, StudySession.date == today),
+        count(StudySession, StudySession.date > today,
+              StudySession.date <= today + timedelta(days=UPCOMING_SESSION_DAYS)),
+        db.select(db.func.coalesce(db.func.sum(MonthlyTaskRollup.created), 0))
+        .where(MonthlyTaskRollup.user_id == user_id).scalar_subquery(),
+        db.select(db.func.coalesce(db.func.sum(MonthlyTaskRollup.completed), 0))
+        .where(MonthlyTaskRollup.user_id == user_id).scalar_subquery(),
+    )).one()
+    keys = ('upcoming_tasks', 'overdue_tasks', 'todays_sessions', 'upcoming_sessions',
+            'tasks_total', 'tasks_completed')
+    return dict(zip(keys, row))
+
+
+def _ranked_tasks(user_id, today):
+    # Pending before completed, soonest due first
+    upcoming = db.session.execute(
+        db.select(Task.title, Task.due_date, Task.completed).where(
+            Task.user_id == user_id,
+            Task.due_date >= today,
+            Task.due_date <= today + timedelta(days=UPCOMING_TASK_DAYS)
+        ).order_by(Task.completed, Task.due_date, Task.id).limit(MAX_LIST_ITEMS)
+    ).all()
+    # Most recently overdue first; long-abandoned tasks matter least
+    overdue = db.session.execute(
+        db.select(Task.title, Task.due_date).where(
+            Task.user_id == user_id,
+            Task.completed.is_(False),
+            Task.due_date < today
+        ).order_by(Task.due_date.desc(), Task.id).limit(MAX_LIST_ITEMS)
+    ).all()
+    return upcoming, overdue
+
+
+def _sessions(user_id, today):
+    """Today's and the next few days' sessions in date and time order"""
+    def first_sessions(first_day, last_day):
+        # Limited separately so a busy day cannot crowd out the other list
+        return db.session.execute(
+            db.select(StudySession.title, StudySession.subject, StudySession.date,
+                      StudySession.start_time, StudySession.end_time, StudySession.priority).where(
+                StudySession.user_id == user_id,
+                StudySession.date >= first_day,
+                StudySession.date <= last_day
+            ).order_by(StudySession.date, StudySession.start_time, StudySession.id)
+            .limit(MAX_LIST_ITEMS)
+        ).all()
+
+    todays = first_sessions(today, today)
+    upcoming = first_sessions(today + timedelta(days=1), today + timedelta(days=UPCOMING_SESSION_DAYS))
+    return todays, upcoming
+
+
+def _subjects(user_id, today):
+    """Recent focus minutes per subject, and days since each was last studied"""
+    window_start = today - timedelta(days=FOCUS_WINDOW_DAYS)
+    rows = db.session.execute(
+        db.select(
+            DailySubjectRollup.subject,
+            db.func.sum(db.case((DailySubjectRollup.date >= window_start, DailySubjectRollup.minutes), else_=0)),
+            db.func.max(DailySubjectRollup.date)
+        ).where(
+            DailySubjectRollup.user_id == user_id,
+            DailySubjectRollup.date >= today - timedelta(days=RECENT_SUBJECT_DAYS),
+            DailySubjectRollup.date <= today
+        ).group_by(DailySubjectRollup.subject)
+    ).all()
+    totals = {subject: minutes for subject, minutes, _ in rows if minutes}
+    last_studied = {subject: (today - last).days for subject, _, last in rows}
+
+    # Largest first, with the tail folded into 'other'
+    ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+    breakdown = dict(ranked[:MAX_SUBJECTS])
+    rest = sum(minutes for _, minutes in ranked[MAX_SUBJECTS:])
+    if rest:
+        breakdown['other'] = rest
+    return breakdown, sum(totals.values()), last_studied
+
+
+def build_user_context(user_id, today=None, now=None):
+    """Snapshot of a user's schedule, backlog and habits for the prompt"""
+    today = today or date.today()
+    now = now or datetime.now()
+
+    counts = _counts(user_id, today)
+    upcoming_tasks, overdue_tasks = _ranked_tasks(user_id, today)
+    todays_sessions, upcoming_sessions = _sessions(user_id, today)
+    subject_breakdown, total_study_minutes, days_since_studied = _subjects(user_id, today)
+    tasks_total, tasks_completed = counts.pop('tasks_total'), counts.pop('tasks_completed')
+
+    return {
+        'current_datetime': now.strftime('%A, %B %d, %Y at %I:%M %p'),
+        'upcoming_tasks': [
+            {
+                'title': t.title,
+                'due_date': t.due_date.strftime('%A, %B %d'),
+                'days_until': (t.due_date - today).days,
+                'completed': t.completed
+            } for t in upcoming_tasks
+        ],
+        'overdue_tasks': [
+            {
+                'title': t.title,
+                'due_date': t.due_date.strftime('%B %d'),
+                'days_overdue': (today - t.due_date).days
+            } for t in overdue_tasks
+        ],
+        'todays_sessions': [
+            {
+                'title': s.title,
+                'subject': s.subject,
+                'start_time': s.start_time.strftime('%I:%M %p'),
+                'end_time': s.end_time.strftime('%I:%M %p'),
+                'priority': s.priority,
+                'start_minute': s.start_time.hour * 60 + s.start_time.minute,
+                'end_minute': s.end_time.hour * 60 + s.end_time.minute
+            } for s in todays_sessions
+        ],
+        'upcoming_sessions': [
+            {
+                'title': s.title,
+                'subject': s.subject,
+                'date': s.date.strftime('%A, %B %d'),
+                'start_time': s.start_time.strftime('%I:%M %p'),
+                'end_time': s.end_time.strftime('%I:%M %p')
+            } for s in upcoming_sessions
+        ],
+        # Full sizes of the lists above, which hold only the top-ranked rows
+        'counts': counts,
+        'study_patterns': {
+            'total_minutes_last_7_days': total_study_minutes,
+            'total_hours_last_7_days': round(total_study_minutes / 60, 1),
+            'subject_breakdown': subject_breakdown,
+            'average_daily_minutes': round(total_study_minutes / 7, 1),
+            # Subjects studied in the last RECENT_SUBJECT_DAYS days
+            'days_since_studied': days_since_studied
+        },
+        'task_stats': {
+            'completed': tasks_completed,
+            'total': tasks_total,
+            'completion_rate': round((tasks_completed / tasks_total * 100) if tasks_total > 0 else 0)
+        },
+        'streak': current_streak(get_streak(user_id))
+    }
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# (context key, empty message, line format); earlier sections are filled first
+SECTIONS = [
+    ('todays_sessions', "No sessions scheduled for today.",
+     lambda s: f"- {s['title']} ({s['start_time']} - {s['end_time']}, {s['priority']} priority)"),
+    ('overdue_tasks', "No overdue tasks.",
+     lambda t: f"- {t['title']} ({t['days_overdue']} days overdue)"),
+    ('upcoming_tasks', "No upcoming tasks.",
+     lambda t: f"- {t['title']} (due {t['due_date']}, {t['days_until']} days left, "
+               f"{'completed' if t['completed'] else 'pending'})"),
+    ('upcoming_sessions', "No upcoming sessions.",
+     lambda s: f"- {s['title']} on {s['date']} ({s['start_time']} - {s['end_time']})"),
+]
+
+
+def prompt_sections(context, budget=None):
+    """Render the list sections of the prompt within a token budget.
+
+    Each section gets an equal share of what is left when its turn comes,
+    so budget unused by short sections passes to later ones. Every section
+    keeps at least its first item; the remainder is replaced by a count.
+    Returns {context key: text}.
+    """
+    remaining = DEFAULT_TOKEN_BUDGET if budget is None else budget
+    counts = context.get('counts', {})
+    rendered = {}
+    for position, (key, empty, line) in enumerate(SECTIONS):
+        items = context[key]
+        total = max(counts.get(key, len(items)), len(items))
+        if total == 0:
+            rendered[key] = empty
+            continue
+        share = remaining // (len(SECTIONS) - position)
+        lines, used = [], 0
+        for item in items:
+            text = line(item)
+            cost = estimate_tokens(text) + 1
+            if lines and used + cost > share:
+                break
+            lines.append(text)
+            used += cost
+        if total > len(lines):
+            summary = f"- ...and {total - len(lines)} more"
+            lines.append(summary)
+            used += estimate_tokens(summary) + 1
+        rendered[key] = "\n".join(lines)
+        remaining = max(0, remaining - used)
+    return rendered
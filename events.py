@@ -0,0 +1,140 @@
+"""In-process pub/sub behind the per-user server-sent event stream.
+
+Each user has a bounded backlog so a reconnecting client can replay what
+it missed via Last-Event-ID, and each open stream has a bounded queue; a
+stream that falls too far behind is closed and recovers by reconnecting.
+Events only reach streams served by the same process, so the stream's
+heartbeat also carries the user's data version for clients connected to
+other workers to notice changes.
+"""
+import itertools
+import queue
+import secrets
+import threading
+from collections import deque
+
+from sqlalchemy import event
+
+from models import StudySession, Task, FocusSession
+from versions import flush_listeners
+
+BACKLOG_SIZE = 256
+SUBSCRIBER_QUEUE_SIZE = 64
+HEARTBEAT_SECONDS = 15
+
+ENTITY_NAMES = {StudySession: 'sessions', Task: 'tasks', FocusSession: 'focus'}
+
+
+class Subscription:
+    """One open event stream"""
+
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+
+
+class EventBroker:
+    def __init__(self, backlog_size=BACKLOG_SIZE, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.backlog_size = backlog_size
+        self.queue_size = queue_size
+        # Event ids from another process or an earlier run are never mistaken for ours
+        self._token = secrets.token_hex(4)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._backlogs = {}
+        self._evicted_through = {}
+        self._subscribers = {}
+
+    def publish(self, user_id, name, data):
+        """Queue an event for every open stream of a user; returns its id"""
+        with self._lock:
+            item = (f'{self._token}-{next(self._ids)}', name, data)
+            backlog = self._backlogs.setdefault(user_id, deque())
+            if len(backlog) >= self.backlog_size:
+                self._evicted_through[user_id] = self._sequence(backlog.popleft()[0])
+            backlog.append(item)
+            for subscription in list(self._subscribers.get(user_id, ())):
+                try:
+                    subscription.queue.put_nowait(item)
+                except queue.Full:
+                    subscription.closed = True
+                    self._subscribers[user_id].discard(subscription)
+        return item[0]
+
+    def subscribe(self, user_id, last_event_id=None):
+        """Open a stream.
+
+        Returns (subscription, missed, complete): the events after
+        last_event_id still in the backlog, and whether they are all of
+        them. complete is False when the id is unknown or too old, in which
+        case the client should refetch its state.
+        """
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscription)
+            backlog = list(self._backlogs.get(user_id, ()))
+        if last_event_id is None:
+            return subscription, [], True
+
+        token, _, sequence = last_event_id.partition('-')
+        if token != self._token or not sequence.isdigit():
+            return subscription, [], False
+        sequence = int(sequence)
+        if sequence < self._evicted_through.get(user_id, 0):
+            return subscription, [], False
+        return subscription, [item for item in backlog if self._sequence(item[0]) > sequence], True
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+        subscription.closed = True
+
+    def subscriber_count(self, user_id=None):
+        with self._lock:
+            if user_id is not None:
+                return len(self._subscribers.get(user_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+    @staticmethod
+    def _sequence(event_id):
+        return int(event_id.rsplit('-', 1)[1])
+
+
+broker = EventBroker()
+
+
+def _collect_changes(session, connection, versions):
+    pending = session.info.setdefault('pending_change_events', {})
+    for user_id, version in versions.items():
+        entry = pending.setdefault(user_id, {'version': 0, 'entities': set()})
+        entry['version'] = max(entry['version'], version)
+    for obj in itertools.chain(session.new, session.dirty, session.deleted):
+        name = ENTITY_NAMES.get(type(obj))
+        if name and obj.user_id in versions:
+            pending[obj.user_id]['entities'].add(name)
+
+
+def _publish_changes(session):
+    pending = session.info.pop('pending_change_events', None)
+    for user_id, entry in (pending or {}).items():
+        broker.publish(user_id, 'change', {
+            'version': entry['version'],
+            'entities': sorted(entry['entities'])
+        })
+
+
+def _discard_changes(session):
+    session.info.pop('pending_change_events', None)
+
+
+def install_change_events(scoped_session):
+    """Publish a 'change' event for each user once their writes commit"""
+    if _collect_changes not in flush_listeners:
+        flush_listeners.append(_collect_changes)
+        event.listen(scoped_session, 'after_commit', _publish_changes)
+        event.listen(scoped_session, 'after_rollback', _discard_changes)
@@ -0,0 +1,35 @@
+"""Gunicorn settings for serving the app with several worker processes.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+Workers do no database setup when they start; create the schema first
+with `flask --app app init-db`, or set INIT_DB=1 to have the master run it
+once before workers fork, so workers never race on create_all. SQLite runs
+in WAL mode (see storage.py), letting readers in every worker proceed while
+one writer commits.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Threads keep long-lived streams (recommendations and /api/events over SSE)
+# from pinning a process; every open browser tab holds one for /api/events
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = 200
+accesslog = '-'
+
+
+def on_starting(server):
+    if os.environ.get('INIT_DB') != '1':
+        return
+    from app import app, db, init_db
+    init_db(sample_data=False)
+    # Do not hand the master's pooled connections to forked workers
+    with app.app_context():
+        db.engine.dispose()
@@ -0,0 +1,165 @@
+"""Rule-based study recommendations computed locally from the user context.
+
+Each rule looks at the context built by context_builder and returns zero
+or more (score, text) pairs; the highest-scoring texts win, ties going to
+the earlier rule. Rules only read what the context already holds, so the
+result is deterministic and takes well under a millisecond. General study
+tips fill any remaining places.
+"""
+import re
+
+# Shown when no rule applies, and before the context can be built
+GENERAL_TIPS = [
+    "Review your upcoming tasks and prioritize based on due dates.",
+    "Consider scheduling focused study blocks for challenging subjects.",
+    "Take regular breaks using the Pomodoro technique (25 min work, 5 min break).",
+    "Try active recall techniques like flashcards for better retention.",
+    "Make sure to get adequate sleep before exams for optimal performance."
+]
+
+DEFAULT_LIMIT = 5
+# Sessions closer together than this count as back-to-back
+BACK_TO_BACK_GAP_MINUTES = 10
+BACK_TO_BACK_MIN_MINUTES = 120
+NEGLECTED_AFTER_DAYS = 4
+BUSY_WEEK_TASKS = 5
+
+NUMBER_WORDS = {2: 'two', 3: 'three', 4: 'four', 5: 'five', 6: 'six'}
+# Quote marks in titles that rules wrap in quotes; apostrophes inside words are kept
+QUOTE_MARKS = re.compile(r'["`\u201c\u201d]|(?<!\w)[\'\u2018\u2019]|[\'\u2018\u2019](?!\w)')
+
+
+def _plural(count, word):
+    return f"{count} {word}{'s' if count != 1 else ''}"
+
+
+def _quoted(title):
+    """A task title in single quotes, with any quotes of its own removed"""
+    text = ' '.join(QUOTE_MARKS.sub('', str(title)).split())
+    return f"'{text or 'Untitled task'}'"
+
+
+def _pending_upcoming(context):
+    return [t for t in context['upcoming_tasks'] if not t['completed']]
+
+
+def overdue_tasks(context):
+    total = context['counts']['overdue_tasks']
+    if not total or not context['overdue_tasks']:
+        return []
+    task = context['overdue_tasks'][0]
+    late = _plural(task['days_overdue'], 'day')
+    if total == 1:
+        return [(100, f"{_quoted(task['title'])} is {late} overdue; finish it before starting anything new.")]
+    return [(100, f"{_quoted(task['title'])} is {late} overdue, along with {_plural(total - 1, 'other task')}; "
+                  f"clear the most recent ones first and drop any that no longer matter.")]
+
+
+def due_soon(context):
+    pending = [t for t in _pending_upcoming(context) if t['days_until'] <= 1]
+    if not pending:
+        return []
+    task = pending[0]
+    when = 'today' if task['days_until'] == 0 else 'tomorrow'
+    others = f" ({_plural(len(pending) - 1, 'more task')} due by tomorrow)" if len(pending) > 1 else ''
+    return [(90, f"{_quoted(task['title'])} is due {when}{others}; put it first in your next session.")]
+
+
+def back_to_back_sessions(context):
+    sessions = context['todays_sessions']
+    chains, chain = [], sessions[:1]
+    for previous, current in zip(sessions, sessions[1:]):
+        if current['start_minute'] - previous['end_minute'] <= BACK_TO_BACK_GAP_MINUTES:
+            chain.append(current)
+        else:
+            chains.append(chain)
+            chain = [current]
+    chains.append(chain)
+
+    results = []
+    for chain in chains:
+        if len(chain) < 2 or chain[-1]['end_minute'] - chain[0]['start_minute'] < BACK_TO_BACK_MIN_MINUTES:
+            continue
+        count = NUMBER_WORDS.get(len(chain), str(len(chain)))
+        results.append((80, f"You have {count} sessions back-to-back from {chain[0]['start_time']} to "
+                            f"{chain[-1]['end_time']}; plan a 10-minute break between them."))
+    return results[:1]
+
+
+def nothing_scheduled(context):
+    if context['counts']['todays_sessions']:
+        return []
+    task = (_pending_upcoming(context) or context['overdue_tasks'] or [None])[0]
+    if task is None:
+        return []
+    return [(75, f"Nothing is scheduled today; block 45 minutes for {_quoted(task['title'])}.")]
+
+
+def neglected_subject(context):
+    days_since = context['study_patterns'].get('days_since_studied', {})
+    neglected = [(days, subject) for subject, days in days_since.items() if days >= NEGLECTED_AFTER_DAYS]
+    if not neglected:
+        return []
+    days, subject = min(neglected, key=lambda item: (-item[0], item[1]))
+    return [(60 + min(days, 20), f"{subject} hasn't been studied in {days} days; "
+                                 f"a 30-minute review keeps it from slipping.")]
+
+
+def busy_week(context):
+    pending = len(_pending_upcoming(context))
+    if pending < BUSY_WEEK_TASKS:
+        return []
+    return [(55, f"{pending} tasks are due in the next 7 days; spread them across your sessions "
+                 f"instead of leaving them for the last day.")]
+
+
+def study_rhythm(context):
+    streak = context['streak']
+    minutes = context['study_patterns']['total_minutes_last_7_days']
+    if streak >= 2:
+        return [(40, f"You're on a {streak}-day study streak; even a short session today keeps it going.")]
+    if minutes < 60:
+        return [(50, f"You studied {minutes} minutes this week; a 25-minute focus session today is an easy restart.")]
+    return []
+
+
+def subject_balance(context):
+    breakdown = {s: m for s, m in context['study_patterns']['subject_breakdown'].items() if s != 'other'}
+    total = sum(breakdown.values())
+    if len(breakdown) < 2 or total < 120:
+        return []
+    top = max(breakdown, key=lambda s: (breakdown[s], s))
+    share = round(breakdown[top] * 100 / total)
+    if share < 60:
+        return []
+    least = min(breakdown, key=lambda s: (breakdown[s], s))
+    return [(45, f"{share}% of this week's study time went to {top}; give {least} a session too.")]
+
+
+def completion_rate(context):
+    stats = context['task_stats']
+    if stats['total'] < 10 or stats['completion_rate'] >= 60:
+        return []
+    return [(30, f"You've completed {stats['completion_rate']}% of your tasks; "
+                 f"break large tasks into smaller steps you can check off.")]
+
+
+RULES = [
+    overdue_tasks, due_soon, back_to_back_sessions, nothing_scheduled, neglected_subject,
+    busy_week, study_rhythm, subject_balance, completion_rate,
+]
+
+
+def recommend(context, limit=DEFAULT_LIMIT):
+    """Ranked recommendations for a user context, padded with general tips"""
+    scored = []
+    for order, rule in enumerate(RULES):
+        for score, text in rule(context):
+            scored.append((-score, order, text))
+    scored.sort()
+    recommendations = [text for _, _, text in scored[:limit]]
+    for tip in GENERAL_TIPS:
+        if len(recommendations) >= limit:
+            break
+        recommendations.append(tip)
+    return recommendations
@@ -0,0 +1,263 @@
+"""Per-request timing of SQL queries, templates and OpenAI calls.
+
+Metrics are kept in process and rendered in the Prometheus text format
+for /metrics; with several Gunicorn workers each process reports its own
+series. When debug headers are on, every response also carries its query
+count and DB time (X-DB-Query-Count, X-DB-Time-Ms) and a Server-Timing
+header that browser dev tools display.
+"""
+import os
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+from flask import before_render_template, current_app, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class Gauge:
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} gauge']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One count per bucket, then sum and count
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.description}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets + (float('inf'),), series[:len(self.buckets)] + [series[-1]]):
+                    labels = _format_labels(self.labels, key, ('le', _format_value(float(bound))))
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labels, key)
+                lines.append(f'{self.name}_sum{labels} {_format_value(round(series[-2], 6))}')
+                lines.append(f'{self.name}_count{labels} {series[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, name, description, labels=()):
+        metric = Counter(name, description, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def gauge(self, name, description, labels=()):
+        metric = Gauge(name, description, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, description, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'studyflow_http_requests_total', 'Requests handled', ('method', 'endpoint', 'status'))
+REQUEST_LATENCY = registry.histogram(
+    'studyflow_http_request_duration_seconds', 'Time to build a response (streamed bodies excluded)',
+    ('method', 'endpoint'))
+REQUEST_QUERIES = registry.histogram(
+    'studyflow_db_queries_per_request', 'SQL statements executed per request', ('endpoint',),
+    QUERY_COUNT_BUCKETS)
+REQUEST_DB_TIME = registry.histogram(
+    'studyflow_db_time_per_request_seconds', 'Time spent in SQL per request', ('endpoint',))
+QUERIES = registry.counter('studyflow_db_queries_total', 'SQL statements executed')
+SPAN_LATENCY = registry.histogram(
+    'studyflow_span_duration_seconds', 'Timed sections such as template rendering and OpenAI calls',
+    ('span', 'name'))
+
+
+def _request_state():
+    if has_request_context():
+        return g.get('_instrumentation')
+    return None
+
+
+@contextmanager
+def span(kind, name=''):
+    """Time a block into the span histogram and the current request's totals"""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - started
+        SPAN_LATENCY.observe(elapsed, span=kind, name=name)
+        state = _request_state()
+        if state is not None:
+            state['spans'][kind] = state['spans'].get(kind, 0.0) + elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('_query_started', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['_query_started'].pop()
+    QUERIES.inc()
+    state = _request_state()
+    if state is not None:
+        state['queries'] += 1
+        state['db_time'] += perf_counter() - started
+
+
+def _handle_error(exception_context):
+    starts = exception_context.connection.info.get('_query_started') if exception_context.connection else None
+    if starts:
+        starts.pop()
+
+
+def _template_started(sender, template, context, **extra):
+    state = _request_state()
+    if state is not None:
+        state['templates'].append(perf_counter())
+
+
+def _template_finished(sender, template, context, **extra):
+    state = _request_state()
+    if state is not None and state['templates']:
+        elapsed = perf_counter() - state['templates'].pop()
+        SPAN_LATENCY.observe(elapsed, span='render_template', name=template.name or '')
+        state['spans']['render_template'] = state['spans'].get('render_template', 0.0) + elapsed
+
+
+def _start_request():
+    g._instrumentation = {'started': perf_counter(), 'queries': 0, 'db_time': 0.0,
+                          'spans': {}, 'templates': []}
+
+
+def _finish_request(response):
+    state = g.pop('_instrumentation', None)
+    if state is None:
+        return response
+    elapsed = perf_counter() - state['started']
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+
+    REQUESTS.inc(method=request.method, endpoint=endpoint, status=str(response.status_code))
+    REQUEST_LATENCY.observe(elapsed, method=request.method, endpoint=endpoint)
+    REQUEST_QUERIES.observe(state['queries'], endpoint=endpoint)
+    REQUEST_DB_TIME.observe(state['db_time'], endpoint=endpoint)
+
+    if current_app.config['METRICS_DEBUG_HEADERS'] or current_app.debug:
+        response.headers['X-DB-Query-Count'] = str(state['queries'])
+        response.headers['X-DB-Time-Ms'] = f"{state['db_time'] * 1000:.2f}"
+        timings = [f'db;dur={state["db_time"] * 1000:.2f};desc="{state["queries"]} queries"']
+        timings.extend(f'{kind};dur={seconds * 1000:.2f}' for kind, seconds in state['spans'].items())
+        timings.append(f'total;dur={elapsed * 1000:.2f}')
+        response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
+
+def install_instrumentation(app, db):
+    """Hook query, template and request timing into the app"""
+    app.config.setdefault('METRICS_DEBUG_HEADERS', os.environ.get('METRICS_DEBUG_HEADERS') == '1')
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(engine, 'handle_error', _handle_error)
+    before_render_template.connect(_template_started, app)
+    template_rendered.connect(_template_finished, app)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+def render_metrics():
+    return registry.render()
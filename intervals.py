@@ -0,0 +1,125 @@
+"""Time intervals of study sessions: overlap checks and free time.
+
+Sessions are indexed by (user_id, date, start_time), so the sessions of
+one user and day form a contiguous, ordered range of the index. An
+overlap check is one bounded range lookup: O(log n) to find the day plus
+the few sessions of that day that start before the new one ends. Free
+time over any range is computed from the (date, start, end) columns of
+that range only, one day at a time, without loading session rows.
+"""
+from datetime import timedelta
+from itertools import groupby
+
+from models import db, StudySession
+
+DAY_MINUTES = 24 * 60
+# Rows fetched per round trip while sweeping a range
+SWEEP_BATCH_SIZE = 500
+
+
+def minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+
+def parse_minute(value):
+    """'HH:MM' as minutes after midnight"""
+    hours, minutes = (int(part) for part in str(value).split(':'))
+    minute = hours * 60 + minutes
+    if not 0 <= minutes < 60 or not 0 <= minute < DAY_MINUTES:
+        raise ValueError(f'Invalid time {value!r}')
+    return minute
+
+
+def format_minute(minute):
+    return f'{minute // 60:02d}:{minute % 60:02d}'
+
+
+def find_overlap(user_id, day, start_time, end_time, exclude_id=None):
+    """The user's earliest session on day overlapping [start_time, end_time), or None"""
+    query = db.select(StudySession.id, StudySession.title, StudySession.start_time, StudySession.end_time).where(
+        StudySession.user_id == user_id,
+        StudySession.date == day,
+        StudySession.start_time < end_time,
+        StudySession.end_time > start_time
+    )
+    if exclude_id is not None:
+        query = query.where(StudySession.id != exclude_id)
+    return db.session.execute(query.order_by(StudySession.start_time).limit(1)).first()
+
+
+def sessions_on_days(user_id, days):
+    """{date: [(start_time, end_time, title)]} of the user's sessions on the given dates"""
+    sessions = {}
+    rows = db.session.execute(
+        db.select(StudySession.date, StudySession.start_time, StudySession.end_time, StudySession.title).where(
+            StudySession.user_id == user_id, StudySession.date.in_(days))
+    )
+    for day, start_time, end_time, title in rows:
+        sessions.setdefault(day, []).append((start_time, end_time, title))
+    return sessions
+
+
+def busy_intervals(user_id, start, end):
+    """{day index from start: [(start, end) minutes]} of sessions between two dates"""
+    busy = {}
+    rows = db.session.execute(
+        db.select(StudySession.date, StudySession.start_time, StudySession.end_time).where(
+            StudySession.user_id == user_id, StudySession.date >= start, StudySession.date <= end)
+    )
+    for day, start_time, end_time in rows:
+        busy.setdefault((day - start).days, []).append((minute_of_day(start_time), minute_of_day(end_time)))
+    return busy
+
+
+def free_slots(start, days, windows, busy, break_minutes=0, first_minute=0):
+    """Free (start, end) minute ranges per day.
+
+    windows holds the available (start, end) ranges of each weekday,
+    Monday first. busy maps a day index to (start, end) minutes of
+    existing sessions; a break is kept on both sides of each. first_minute
+    hides the part of the first day that has already passed.
+    """
+    slots = []
+    for day in range(days):
+        weekday = (start + timedelta(days=day)).weekday()
+        blocked = sorted((s - break_minutes, e + break_minutes) for s, e in busy.get(day, ()))
+        day_slots = []
+        for window_start, window_end in windows[weekday]:
+            cursor = max(window_start, first_minute if day == 0 else 0)
+            for block_start, block_end in blocked:
+                if block_end <= cursor or block_start >= window_end:
+                    continue
+                if block_start > cursor:
+                    day_slots.append((cursor, block_start))
+                cursor = max(cursor, block_end)
+            if cursor < window_end:
+                day_slots.append((cursor, window_end))
+        slots.append(day_slots)
+    return slots
+
+
+def iter_free_time(user_id, start, end, windows, break_minutes=0, min_minutes=1):
+    """Yield (date, start, end) free minutes between two dates, a day at a time.
+
+    Sessions are read as bare columns in index order and swept one day at
+    a time, so memory stays flat however long the range is. Free ranges
+    shorter than min_minutes are left out.
+    """
+    rows = db.session.execute(
+        db.select(StudySession.date, StudySession.start_time, StudySession.end_time).where(
+            StudySession.user_id == user_id, StudySession.date >= start, StudySession.date <= end
+        ).order_by(StudySession.date, StudySession.start_time)
+        .execution_options(yield_per=SWEEP_BATCH_SIZE)
+    )
+    days = groupby(rows, key=lambda row: row[0])
+    upcoming = next(days, None)
+    day = start
+    while day <= end:
+        busy = []
+        if upcoming is not None and upcoming[0] == day:
+            busy = [(minute_of_day(start_time), minute_of_day(end_time)) for _, start_time, end_time in upcoming[1]]
+            upcoming = next(days, None)
+        for slot_start, slot_end in free_slots(day, 1, windows, {0: busy}, break_minutes)[0]:
+            if slot_end - slot_start >= min_minutes:
+                yield day, slot_start, slot_end
+        day += timedelta(days=1)
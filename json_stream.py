@@ -0,0 +1,74 @@
+import json
+
+
+class JSONArrayStreamParser:
+    """Incrementally parse the elements of a top-level JSON array.
+
+    Feed text chunks as they arrive; each call returns the elements that
+    were completed by that chunk. Anything before the opening bracket
+    (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self.text = ''
+
+    @property
+    def finished(self):
+        return self._finished
+
+    def feed(self, chunk):
+        """Consume a chunk of text and return newly completed elements"""
+        self.text += chunk
+        completed = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == '[':
+                    self._started = True
+                continue
+
+            if self._in_string:
+                self._buffer.append(ch)
+                if self._escaped:
+                    self._escaped = False
+                elif ch == '\\':
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._buffer.append(ch)
+            elif ch in '[{':
+                self._depth += 1
+                self._buffer.append(ch)
+            elif ch in ']}' and self._depth > 0:
+                self._depth -= 1
+                self._buffer.append(ch)
+            elif ch == ',' and self._depth == 0:
+                self._emit(completed)
+            elif ch == ']' and self._depth == 0:
+                self._emit(completed)
+                self._finished = True
+            else:
+                self._buffer.append(ch)
+        return completed
+
+    def _emit(self, completed):
+        raw = ''.join(self._buffer).strip()
+        self._buffer = []
+        if not raw:
+            return
+        try:
+            completed.append(json.loads(raw))
+        except json.JSONDecodeError:
+            # Skip malformed elements rather than abort the whole stream
+            pass
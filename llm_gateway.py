@@ -0,0 +1,246 @@
+"""Deadlines, a concurrency limit and a circuit breaker around OpenAI calls.
+
+Every call has a deadline that covers the whole exchange, including the
+time a stream takes to finish. A process-wide semaphore caps calls in
+flight; a caller that cannot get a slot within a short queue timeout is
+turned away rather than parked. After a run of consecutive failures the
+circuit opens and calls fail immediately until a cool-down passes; then a
+single trial call decides whether it closes again. Callers catch
+LLMUnavailable (and any upstream error) and serve their fallback.
+"""
+import random
+import threading
+import time
+
+from instrumentation import registry, span
+
+CLOSED, HALF_OPEN, OPEN = 'closed', 'half_open', 'open'
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+LLM_CALLS = registry.counter(
+    'studyflow_llm_calls_total',
+    'OpenAI calls by outcome (ok, error, timeout, circuit_open, saturated)', ('operation', 'outcome'))
+LLM_IN_FLIGHT = registry.gauge('studyflow_llm_in_flight', 'OpenAI calls currently running')
+LLM_CIRCUIT_STATE = registry.gauge(
+    'studyflow_llm_circuit_state', 'OpenAI circuit breaker state (0 closed, 1 half-open, 2 open)')
+LLM_CIRCUIT_TRANSITIONS = registry.counter(
+    'studyflow_llm_circuit_transitions_total', 'OpenAI circuit breaker state changes', ('state',))
+
+
+class LLMUnavailable(Exception):
+    """The call was refused or did not finish in time"""
+
+
+class CircuitOpen(LLMUnavailable):
+    pass
+
+
+class Saturated(LLMUnavailable):
+    pass
+
+
+class DeadlineExceeded(LLMUnavailable):
+    pass
+
+
+def _is_timeout(exc):
+    # openai.APITimeoutError is checked by name so the SDK is not imported here
+    return isinstance(exc, (TimeoutError, DeadlineExceeded)) or type(exc).__name__ == 'APITimeoutError'
+
+
+def _is_connection_error(exc):
+    # openai.APIConnectionError, like APITimeoutError, is matched by name
+    return isinstance(exc, ConnectionError) or any(
+        cls.__name__ == 'APIConnectionError' for cls in type(exc).__mro__)
+
+
+def _is_retryable(exc):
+    """Connection errors, request timeouts, rate limits and server errors; never our deadline"""
+    if _is_timeout(exc):
+        return False
+    if _is_connection_error(exc):
+        return True
+    status = getattr(exc, 'status_code', None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures for reset_timeout seconds"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        LLM_CIRCUIT_STATE.set(STATE_VALUES[CLOSED])
+
+    def _set_state(self, state):
+        if state != self.state:
+            self.state = state
+            LLM_CIRCUIT_STATE.set(STATE_VALUES[state])
+            LLM_CIRCUIT_TRANSITIONS.inc(state=state)
+
+    def retry_after(self):
+        """Seconds until an open circuit lets a trial call through, else 0"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (self.clock() - self.opened_at))
+
+    def allow(self):
+        """Whether a call may go ahead; in half-open state only one at a time"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if self.clock() - self.opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._trial_running:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_running = False
+            self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def release(self):
+        """End a call that produced no verdict, such as an abandoned stream"""
+        with self._lock:
+            self._trial_running = False
+
+
+class LLMGateway:
+    """Runs chat completions through a deadline, a semaphore and a breaker"""
+
+    def __init__(self, client_factory, timeout=20.0, stream_timeout=60.0, max_concurrency=4,
+                 queue_timeout=0.25, retries=1, retry_backoff=0.5, breaker=None):
+        self.client_factory = client_factory
+        self.timeout = timeout
+        self.stream_timeout = stream_timeout
+        self.queue_timeout = queue_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def available(self):
+        """False while the circuit is open and cooling down"""
+        return self.breaker.retry_after() == 0
+
+    def _admit(self, operation, deadline):
+        if not self.breaker.allow():
+            LLM_CALLS.inc(operation=operation, outcome='circuit_open')
+            raise CircuitOpen(f'OpenAI is unavailable; retrying in {self.breaker.retry_after():.0f}s')
+        if not self._slots.acquire(timeout=max(0.0, min(self.queue_timeout, deadline - time.monotonic()))):
+            self.breaker.release()
+            LLM_CALLS.inc(operation=operation, outcome='saturated')
+            raise Saturated('Too many OpenAI calls in flight')
+        LLM_IN_FLIGHT.inc()
+
+    def _leave(self):
+        LLM_IN_FLIGHT.dec()
+        self._slots.release()
+
+    def _failed(self, operation, exc, limit):
+        if not (_is_timeout(exc) or _is_retryable(exc)):
+            # Other 4xx responses and local errors (no API key, bugs in our
+            # own code) say nothing about OpenAI's health
+            self.breaker.release()
+            LLM_CALLS.inc(operation=operation,
+                          outcome='rejected' if getattr(exc, 'status_code', None) else 'error')
+            return exc
+        self.breaker.record_failure()
+        if _is_timeout(exc):
+            LLM_CALLS.inc(operation=operation, outcome='timeout')
+            if isinstance(exc, DeadlineExceeded):
+                return exc
+            return DeadlineExceeded(f'OpenAI did not answer within {limit:g}s')
+        LLM_CALLS.inc(operation=operation, outcome='error')
+        return exc
+
+    def _succeeded(self, operation):
+        self.breaker.record_success()
+        LLM_CALLS.inc(operation=operation, outcome='ok')
+
+    def chat(self, timeout=None, **request):
+        """chat.completions.create with a deadline and one retry on transient errors"""
+        operation = 'chat.completions'
+        limit = timeout or self.timeout
+        deadline = time.monotonic() + limit
+        self._admit(operation, deadline)
+        try:
+            attempt = 0
+            while True:
+                try:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f'OpenAI did not answer within {limit:g}s')
+                    with span('openai', operation):
+                        response = self.client_factory().chat.completions.create(timeout=remaining, **request)
+                except Exception as exc:
+                    backoff = self.retry_backoff * (attempt + 1) * random.uniform(0.5, 1.0)
+                    if (attempt < self.retries and _is_retryable(exc)
+                            and deadline - time.monotonic() > backoff + 1.0):
+                        attempt += 1
+                        time.sleep(backoff)
+                        continue
+                    error = self._failed(operation, exc, limit)
+                    if error is exc:
+                        raise
+                    raise error from exc
+                self._succeeded(operation)
+                return response
+        finally:
+            self._leave()
+
+    def stream(self, timeout=None, **request):
+        """Yield the content deltas of a streamed completion within one deadline"""
+        operation = 'chat.completions.stream'
+        limit = timeout or self.stream_timeout
+        deadline = time.monotonic() + limit
+        self._admit(operation, deadline)
+        stream = None
+        try:
+            # Times the wait for the response headers; the body streams afterwards
+            with span('openai', operation):
+                stream = self.client_factory().chat.completions.create(
+                    stream=True, timeout=deadline - time.monotonic(), **request)
+            for chunk in stream:
+                if time.monotonic() > deadline:
+                    raise DeadlineExceeded(f'OpenAI did not finish within {limit:g}s')
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except GeneratorExit:
+            # The consumer went away; that says nothing about upstream health
+            self.breaker.release()
+            raise
+        except Exception as exc:
+            error = self._failed(operation, exc, limit)
+            if error is exc:
+                raise
+            raise error from exc
+        else:
+            self._succeeded(operation)
+        finally:
+            if stream is not None and hasattr(stream, 'close'):
+                stream.close()
+            self._leave()
@@ -62,6 +62,7 @@ class StudySession(db.Model):
     __table_args__ = (
         db.Index('idx_sessions_date', 'date'),
         db.Index('idx_sessions_user_date', 'user_id', 'date'),
+        db.Index('idx_sessions_user_date_start', 'user_id', 'date', 'start_time'),
     )
 
     def to_dict(self):
@@ -87,6 +88,7 @@ class Task(db.Model):
     title = db.Column(db.String(300), nullable=False)
     due_date = db.Column(db.Date, nullable=False)
     completed = db.Column(db.Boolean, default=False)
+    completed_at = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -94,6 +96,8 @@ class Task(db.Model):
     __table_args__ = (
         db.Index('idx_tasks_due_date', 'due_date'),
         db.Index('idx_tasks_user', 'user_id'),
+        db.Index('idx_tasks_user_due', 'user_id', 'due_date'),
+        db.Index('idx_tasks_user_completed_due', 'user_id', 'completed', 'due_date'),
     )
 
     def to_dict(self):
@@ -151,3 +155,132 @@ class CurrentFocusSession(db.Model):
             'start_time': self.start_time.isoformat(),
             'subject': self.subject
         }
+
+
+class DailySubjectRollup(db.Model):
+    """Focus minutes and session counts per user, day and subject"""
+    __tablename__ = 'daily_subject_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    date = db.Column(db.Date, nullable=False)
+    subject = db.Column(db.String(100), nullable=False)
+    minutes = db.Column(db.Integer, nullable=False, default=0)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+
+    # Indexes
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'date', 'subject', name='uq_daily_rollup_user_date_subject'),
+        db.Index('idx_daily_rollup_user_date', 'user_id', 'date'),
+    )
+
+
+class MonthlyTaskRollup(db.Model):
+    """Tasks created and completed per user and calendar month"""
+    __tablename__ = 'monthly_task_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    month = db.Column(db.Date, nullable=False)  # first day of the month
+    created = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+
+    # Indexes
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'month', name='uq_monthly_rollup_user_month'),
+    )
+
+
+class UserStreak(db.Model):
+    """Focus streak state, updated as focus sessions finish"""
+    __tablename__ = 'user_streaks'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, unique=True)
+    current_streak = db.Column(db.Integer, nullable=False, default=0)
+    longest_streak = db.Column(db.Integer, nullable=False, default=0)
+    last_active_date = db.Column(db.Date)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'current_streak': self.current_streak,
+            'longest_streak': self.longest_streak,
+            'last_active_date': self.last_active_date.strftime('%Y-%m-%d') if self.last_active_date else None
+        }
+
+
+class UserDataVersion(db.Model):
+    """Counter bumped whenever any of a user's sessions, tasks or focus data change"""
+    __tablename__ = 'user_data_versions'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class ChangeLogEntry(db.Model):
+    """Latest change to one session, task or focus record, stamped with the user's data version"""
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(20), nullable=False)  # 'sessions', 'tasks' or 'focus'
+    entity_id = db.Column(db.Integer, nullable=False)
+    deleted = db.Column(db.Boolean, nullable=False, default=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # Indexes
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'entity', 'entity_id', name='uq_change_log_user_entity'),
+        db.Index('idx_change_log_user_version', 'user_id', 'version'),
+    )
+
+
+class ChangeLogFloor(db.Model):
+    """Oldest version a client can sync from; older clients must take a full snapshot"""
+    __tablename__ = 'change_log_floors'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class JobLock(db.Model):
+    """Lease on a scheduled job, so one worker process runs it per interval"""
+    __tablename__ = 'job_locks'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime)  # lease expiry while running
+    next_run_at = db.Column(db.DateTime, nullable=False)
+    last_started_at = db.Column(db.DateTime)
+    last_finished_at = db.Column(db.DateTime)
+    last_status = db.Column(db.String(20))  # 'ok' or 'error'
+    last_duration_ms = db.Column(db.Integer)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'owner': self.owner,
+            'running': self.locked_until is not None and self.locked_until > datetime.utcnow(),
+            'next_run_at': self.next_run_at.isoformat() if self.next_run_at else None,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_finished_at': self.last_finished_at.isoformat() if self.last_finished_at else None,
+            'last_status': self.last_status,
+            'last_duration_ms': self.last_duration_ms
+        }
+
+
+class PlannedSession(db.Model):
+    """Link from a study session created by the auto-scheduler to the task it is for"""
+    __tablename__ = 'planned_sessions'
+
+    session_id = db.Column(db.Integer, db.ForeignKey('study_sessions.id', ondelete='CASCADE'),
+                           primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    task_id = db.Column(db.Integer, db.ForeignKey('tasks.id', ondelete='CASCADE'), nullable=False)
+
+    # Indexes
+    __table_args__ = (
+        db.Index('idx_planned_sessions_user_task', 'user_id', 'task_id'),
+    )
@@ -0,0 +1,184 @@
+"""Write operations on sessions and tasks.
+
+These helpers stage changes on db.session without committing, so the
+single-item endpoints and /api/batch share the same validation and
+rollup bookkeeping while the caller decides where the transaction ends.
+"""
+from datetime import datetime
+
+from intervals import find_overlap
+from models import db, PlannedSession, StudySession, Task
+from rollups import record_task_completion, record_task_created, record_task_deleted
+
+
+class MutationError(Exception):
+    """A write that cannot be applied, with the HTTP status to report"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _required(data, *fields):
+    """Reject a body that is not an object or lacks any of the given fields"""
+    if not isinstance(data, dict):
+        raise MutationError('Request body must be a JSON object')
+    missing = [field for field in fields if data.get(field) in (None, '')]
+    if missing:
+        raise MutationError(f"Missing field(s): {', '.join(missing)}")
+
+
+def _parse_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise MutationError(f'Invalid date {value!r}; expected YYYY-MM-DD')
+
+
+def _parse_time(value):
+    try:
+        return datetime.strptime(value, '%H:%M').time()
+    except (TypeError, ValueError):
+        raise MutationError(f'Invalid time {value!r}; expected HH:MM')
+
+
+def check_session_times(session):
+    """Reject sessions that end before they start or overlap another of the user's"""
+    if session.end_time <= session.start_time:
+        raise MutationError('End time must be after start time')
+    other = find_overlap(session.user_id, session.date, session.start_time, session.end_time,
+                         exclude_id=session.id)
+    if other is not None:
+        raise MutationError(
+            f"Overlaps '{other.title}' ({other.start_time.strftime('%H:%M')}-{other.end_time.strftime('%H:%M')})",
+            409)
+
+
+def get_session(user_id, session_id):
+    session = StudySession.query.filter_by(id=session_id, user_id=user_id).first()
+    if not session:
+        raise MutationError('Session not found', 404)
+    return session
+
+
+def get_task(user_id, task_id):
+    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+    if not task:
+        raise MutationError('Task not found', 404)
+    return task
+
+
+def create_session(user_id, data):
+    _required(data, 'title', 'subject', 'date', 'startTime', 'endTime')
+    session = StudySession(
+        user_id=user_id,
+        title=data['title'],
+        subject=data['subject'],
+        date=_parse_date(data['date']),
+        start_time=_parse_time(data['startTime']),
+        end_time=_parse_time(data['endTime']),
+        color=data.get('color', 'blue'),
+        priority=data.get('priority', 'medium'),
+        notes=data.get('notes', '')
+    )
+    check_session_times(session)
+    db.session.add(session)
+    return session
+
+
+def update_session(user_id, session_id, data):
+    _required(data)
+    session = get_session(user_id, session_id)
+    # Update fields if provided
+    if 'title' in data:
+        session.title = data['title']
+    if 'subject' in data:
+        session.subject = data['subject']
+    if 'date' in data:
+        session.date = _parse_date(data['date'])
+    if 'startTime' in data:
+        session.start_time = _parse_time(data['startTime'])
+    if 'endTime' in data:
+        session.end_time = _parse_time(data['endTime'])
+    if 'color' in data:
+        session.color = data['color']
+    if 'priority' in data:
+        session.priority = data['priority']
+    if 'notes' in data:
+        session.notes = data['notes']
+    if 'date' in data or 'startTime' in data or 'endTime' in data:
+        check_session_times(session)
+    session.updated_at = datetime.utcnow()
+    return session
+
+
+def delete_session(user_id, session_id):
+    """Delete a session; returns False if it did not exist"""
+    session = StudySession.query.filter_by(id=session_id, user_id=user_id).first()
+    if not session:
+        return False
+    # SQLite does not enforce the cascade, and it reuses ids of deleted rows
+    db.session.execute(db.delete(PlannedSession).where(PlannedSession.session_id == session_id))
+    db.session.delete(session)
+    return True
+
+
+def create_task(user_id, data):
+    _required(data, 'title', 'dueDate')
+    task = Task(
+        user_id=user_id,
+        title=data['title'],
+        due_date=_parse_date(data['dueDate']),
+        completed=False,
+        created_at=datetime.utcnow()
+    )
+    db.session.add(task)
+    record_task_created(user_id, task.created_at)
+    return task
+
+
+def set_task_completed(task, completed):
+    """Mark a task done or not done, keeping the monthly rollup in step"""
+    if task.completed == completed:
+        return task
+    now = datetime.utcnow()
+    if task.completed:
+        # Undo the completion in the month it was recorded
+        record_task_completion(task.user_id, task.completed_at or task.updated_at or now, -1)
+        task.completed_at = None
+    else:
+        record_task_completion(task.user_id, now)
+        task.completed_at = now
+    task.completed = completed
+    task.updated_at = now
+    return task
+
+
+def toggle_task(user_id, task_id):
+    task = get_task(user_id, task_id)
+    return set_task_completed(task, not task.completed)
+
+
+def update_task(user_id, task_id, data):
+    _required(data)
+    task = get_task(user_id, task_id)
+    if 'completed' in data:
+        set_task_completed(task, bool(data['completed']))
+    if 'title' in data or 'dueDate' in data:
+        if 'title' in data:
+            task.title = data['title']
+        if 'dueDate' in data:
+            task.due_date = _parse_date(data['dueDate'])
+        task.updated_at = datetime.utcnow()
+    return task
+
+
+def delete_task(user_id, task_id):
+    """Delete a task; returns False if it did not exist"""
+    task = Task.query.filter_by(id=task_id, user_id=user_id).first()
+    if not task:
+        return False
+    record_task_deleted(task)
+    db.session.execute(db.delete(PlannedSession).where(PlannedSession.task_id == task_id))
+    db.session.delete(task)
+    return True
@@ -0,0 +1,78 @@
+"""Keyset (cursor) pagination over (date, start_time, id) ordered queries"""
+import base64
+import json
+from datetime import date, datetime, time
+
+from models import db
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row into an opaque cursor string"""
+    payload = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values],
+                         separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor back into typed sort-key values"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise InvalidCursor('Malformed cursor')
+        values = []
+        for value, kind in zip(raw, types):
+            if kind is date:
+                values.append(date.fromisoformat(value))
+            elif kind is time:
+                values.append(time.fromisoformat(value))
+            elif kind is datetime:
+                values.append(datetime.fromisoformat(value))
+            else:
+                values.append(kind(value))
+        return values
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError):
+        raise InvalidCursor('Malformed cursor')
+
+
+def parse_page_size(value):
+    """Clamp a requested page size to the allowed range"""
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        size = int(value)
+    except ValueError:
+        raise InvalidCursor('limit must be an integer')
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, columns, types, cursor=None, limit=DEFAULT_PAGE_SIZE, descending=False):
+    """Fetch one page of query ordered by columns.
+
+    Returns (rows, next_cursor). columns are the sort-key columns, which
+    must end with a unique column; types are their Python types for
+    decoding the cursor.
+    """
+    key = db.tuple_(*columns)
+    if cursor:
+        after = db.tuple_(*[db.literal(value, column.type)
+                            for value, column in zip(decode_cursor(cursor, types), columns)])
+        query = query.filter(key < after if descending else key > after)
+    order = [c.desc() for c in columns] if descending else list(columns)
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, c.key) for c in columns])
+    return rows, next_cursor
@@ -0,0 +1,147 @@
+"""Opt-in cProfile capture of live requests.
+
+With PROFILING_ENABLED=1, a request is profiled when it carries the
+X-Profile: 1 header or is picked by PROFILING_SAMPLE_RATE (0.0-1.0). Each
+profile is written as <PROFILING_DIR>/<endpoint>/<timestamp>-<ms>.pstats,
+loadable with pstats, snakeviz or flameprof (for flame graphs), and the
+oldest files are removed beyond PROFILING_MAX_FILES. report() merges the
+recent profiles of a route into a top-functions table.
+"""
+import cProfile
+import os
+import pstats
+import random
+import re
+import time
+
+from flask import current_app, g, request
+
+PROFILE_HEADER = 'X-Profile'
+SORT_KEYS = {'cumulative', 'tottime', 'ncalls'}
+DEFAULT_REPORT_FILES = 100
+
+# Never profile the endpoints used to read profiles and metrics
+EXCLUDED_ENDPOINTS = {'static', 'studyflow.metrics', 'studyflow.profiling_report'}
+
+
+def _setting(app, name, default):
+    return app.config.get(name, os.environ.get(name, default))
+
+
+def configure_profiling(app, default_dir):
+    app.config['PROFILING_ENABLED'] = str(_setting(app, 'PROFILING_ENABLED', '0')) in ('1', 'true', 'True')
+    app.config['PROFILING_SAMPLE_RATE'] = float(_setting(app, 'PROFILING_SAMPLE_RATE', 0.0))
+    app.config['PROFILING_DIR'] = _setting(app, 'PROFILING_DIR', default_dir)
+    app.config['PROFILING_MAX_FILES'] = int(_setting(app, 'PROFILING_MAX_FILES', 500))
+
+
+def _endpoint_dir(endpoint):
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')
+
+
+def _should_profile(config):
+    if not config['PROFILING_ENABLED'] or request.endpoint in EXCLUDED_ENDPOINTS:
+        return False
+    if request.headers.get(PROFILE_HEADER) == '1':
+        return True
+    rate = config['PROFILING_SAMPLE_RATE']
+    return rate > 0 and random.random() < rate
+
+
+def _start_profile():
+    if not _should_profile(current_app.config):
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active in this process
+        return
+    g._profiler = (profiler, time.perf_counter())
+
+
+def _finish_profile(response):
+    active = g.pop('_profiler', None)
+    if active is None:
+        return response
+    profiler, started = active
+    profiler.disable()
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    directory = os.path.join(current_app.config['PROFILING_DIR'], _endpoint_dir(request.endpoint))
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%dT%H%M%S')}-{int(time.time() * 1000) % 1000:03d}-{elapsed_ms:.0f}ms.pstats"
+    profiler.dump_stats(os.path.join(directory, name))
+    _rotate(current_app.config['PROFILING_DIR'], current_app.config['PROFILING_MAX_FILES'])
+    response.headers['X-Profile-File'] = f'{_endpoint_dir(request.endpoint)}/{name}'
+    return response
+
+
+def _profile_files(root, endpoint=None):
+    """(mtime, path) of stored profiles, newest first"""
+    if not os.path.isdir(root):
+        return []
+    directories = [_endpoint_dir(endpoint)] if endpoint else os.listdir(root)
+    files = []
+    for directory in directories:
+        path = os.path.join(root, directory)
+        if not os.path.isdir(path):
+            continue
+        for entry in os.scandir(path):
+            if entry.name.endswith('.pstats'):
+                files.append((entry.stat().st_mtime, entry.path))
+    files.sort(reverse=True)
+    return files
+
+
+def _rotate(root, max_files):
+    for _, path in _profile_files(root)[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def profiled_endpoints(root):
+    """{endpoint: number of stored profiles}"""
+    counts = {}
+    for _, path in _profile_files(root):
+        endpoint = os.path.basename(os.path.dirname(path))
+        counts[endpoint] = counts.get(endpoint, 0) + 1
+    return counts
+
+
+def report(root, endpoint=None, limit=30, sort='cumulative', max_files=DEFAULT_REPORT_FILES):
+    """Merge the newest profiles (of one endpoint, or all) into a top-functions list"""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"sort must be one of {', '.join(sorted(SORT_KEYS))}")
+    files = [path for _, path in _profile_files(root, endpoint)[:max_files]]
+    if not files:
+        return {'endpoint': endpoint, 'profiles': 0, 'total_seconds': 0, 'functions': []}
+
+    stats = pstats.Stats(*files)
+    rows = []
+    for (filename, line, function), (calls, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            'function': f'{os.path.basename(filename)}:{line}({function})' if line else function,
+            'ncalls': ncalls,
+            'primitive_calls': calls,
+            'tottime': round(tottime, 6),
+            'cumtime': round(cumtime, 6),
+            'percall_ms': round(cumtime / ncalls * 1000, 4) if ncalls else 0
+        })
+    key = {'cumulative': 'cumtime', 'tottime': 'tottime', 'ncalls': 'ncalls'}[sort]
+    rows.sort(key=lambda row: row[key], reverse=True)
+    return {
+        'endpoint': endpoint,
+        'profiles': len(files),
+        'total_seconds': round(stats.total_tt, 6),
+        'functions': rows[:limit]
+    }
+
+
+def install_profiling(app, default_dir):
+    """Profile selected requests when PROFILING_ENABLED is set"""
+    configure_profiling(app, default_dir)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
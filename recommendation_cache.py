@@ -0,0 +1,91 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def context_key(user_id, context):
+    """Build a stable cache key from a user context dict"""
+    # The wall-clock line changes every minute and would defeat the cache
+    stable = {k: v for k, v in context.items() if k != 'current_datetime'}
+    payload = json.dumps(stable, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    return (user_id, digest)
+
+
+class RecommendationCache:
+    """Thread-safe LRU cache with a per-entry TTL for AI recommendations"""
+
+    def __init__(self, max_entries=256, ttl_seconds=3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        # Most recent value per user; survives invalidation so it can be
+        # served stale while a replacement is generated
+        self._last_good = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value for key, or None if missing or expired"""
+        return self.get_with_age(key)[0]
+
+    def set(self, key, value):
+        """Store value under key, evicting the least recently used entries"""
+        with self._lock:
+            stored_at = time.monotonic()
+            self._entries[key] = (value, stored_at)
+            self._entries.move_to_end(key)
+            self._last_good[key[0]] = (value, stored_at)
+            self._last_good.move_to_end(key[0])
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            while len(self._last_good) > self.max_entries:
+                self._last_good.popitem(last=False)
+
+    def get_with_age(self, key):
+        """Return (value, age_seconds) for key, or (None, None)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age > self.ttl_seconds:
+                del self._entries[key]
+                return None, None
+            self._entries.move_to_end(key)
+            return value, age
+
+    def last_good(self, user_id):
+        """Return (value, age_seconds) of the newest value stored for a user"""
+        with self._lock:
+            entry = self._last_good.get(user_id)
+            if entry is None:
+                return None, None
+            value, stored_at = entry
+            return value, time.monotonic() - stored_at
+
+    def invalidate_user(self, user_id):
+        """Drop every cached entry belonging to a user"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == user_id]:
+                del self._entries[key]
+
+    def prune(self):
+        """Drop expired entries; returns how many were removed"""
+        with self._lock:
+            cutoff = time.monotonic() - self.ttl_seconds
+            expired = [key for key, (_, stored_at) in self._entries.items() if stored_at < cutoff]
+            for key in expired:
+                del self._entries[key]
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._last_good.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
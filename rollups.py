@@ -0,0 +1,150 @@
+"""Per-day focus and per-month task rollups, maintained by the write paths"""
+from datetime import date, datetime
+
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, Task, FocusSession, DailySubjectRollup, MonthlyTaskRollup
+
+
+def month_start(value):
+    """Return the first day of the month containing a date or datetime"""
+    if isinstance(value, datetime):
+        value = value.date()
+    return value.replace(day=1)
+
+
+def add_months(month, delta):
+    """Shift a first-of-month date by a number of months"""
+    index = month.year * 12 + month.month - 1 + delta
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _increment(model, keys, counts):
+    """Add counts to the rollup row identified by keys, creating it if needed.
+
+    One INSERT ... ON CONFLICT DO UPDATE, so concurrent writers for a new
+    day or month cannot both try to create the row.
+    """
+    insert = sqlite_insert if db.engine.dialect.name == 'sqlite' else postgresql_insert
+    table = model.__table__
+    statement = insert(table).values(**keys, **counts)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + statement.excluded[name] for name in counts}
+    ))
+
+
+def record_focus_session(user_id, day, subject, minutes, sessions=1):
+    """Add a finished focus session to the daily rollup"""
+    _increment(DailySubjectRollup, {'user_id': user_id, 'date': day, 'subject': subject},
+               {'minutes': minutes, 'sessions': sessions})
+
+
+def record_task_created(user_id, created_at, count=1):
+    """Count a new task in the month it was created"""
+    _increment(MonthlyTaskRollup, {'user_id': user_id, 'month': month_start(created_at)},
+               {'created': count, 'completed': 0})
+
+
+def record_task_completion(user_id, completed_at, count=1):
+    """Count a completion (or, with a negative count, an undo) in its month"""
+    _increment(MonthlyTaskRollup, {'user_id': user_id, 'month': month_start(completed_at)},
+               {'created': 0, 'completed': count})
+
+
+def record_task_deleted(task):
+    """Remove a task's contribution from the monthly rollup"""
+    record_task_created(task.user_id, task.created_at or datetime.utcnow(), -1)
+    if task.completed:
+        record_task_completion(task.user_id, task.completed_at or task.updated_at or datetime.utcnow(), -1)
+
+
+def rebuild_rollups(user_id=None):
+    """Recompute both rollup tables from the base tables"""
+    daily_delete = DailySubjectRollup.query
+    monthly_delete = MonthlyTaskRollup.query
+    if user_id is not None:
+        daily_delete = daily_delete.filter_by(user_id=user_id)
+        monthly_delete = monthly_delete.filter_by(user_id=user_id)
+    daily_delete.delete(synchronize_session=False)
+    monthly_delete.delete(synchronize_session=False)
+
+    focus = db.select(
+        FocusSession.user_id,
+        FocusSession.date,
+        FocusSession.subject,
+        db.func.sum(FocusSession.duration),
+        db.func.count(FocusSession.id)
+    ).group_by(FocusSession.user_id, FocusSession.date, FocusSession.subject)
+    if user_id is not None:
+        focus = focus.where(FocusSession.user_id == user_id)
+    db.session.execute(db.insert(DailySubjectRollup).from_select(
+        ['user_id', 'date', 'subject', 'minutes', 'sessions'], focus
+    ))
+
+    # Month bucketing is done here rather than in SQL to stay dialect-neutral
+    months = {}
+    tasks = db.select(Task.user_id, Task.created_at, Task.completed_at, Task.completed)
+    if user_id is not None:
+        tasks = tasks.where(Task.user_id == user_id)
+    for task_user, created_at, completed_at, completed in db.session.execute(
+            tasks.execution_options(yield_per=1000)):
+        key = (task_user, month_start(created_at or datetime.utcnow()))
+        months.setdefault(key, [0, 0])[0] += 1
+        if completed:
+            key = (task_user, month_start(completed_at or created_at or datetime.utcnow()))
+            months.setdefault(key, [0, 0])[1] += 1
+    if months:
+        db.session.execute(db.insert(MonthlyTaskRollup), [
+            {'user_id': u, 'month': m, 'created': created, 'completed': completed}
+            for (u, m), (created, completed) in months.items()
+        ])
+
+
+def rollups_empty():
+    """True when neither rollup table has any rows"""
+    return (db.session.query(DailySubjectRollup.id).first() is None
+            and db.session.query(MonthlyTaskRollup.id).first() is None)
+
+
+def daily_series(user_id, start, end):
+    """Per-day focus minutes and session counts for [start, end]"""
+    rows = db.session.execute(
+        db.select(
+            DailySubjectRollup.date,
+            db.func.sum(DailySubjectRollup.minutes),
+            db.func.sum(DailySubjectRollup.sessions)
+        ).where(
+            DailySubjectRollup.user_id == user_id,
+            DailySubjectRollup.date >= start,
+            DailySubjectRollup.date <= end
+        ).group_by(DailySubjectRollup.date)
+    ).all()
+    return {day: (minutes, sessions) for day, minutes, sessions in rows}
+
+
+def subject_totals(user_id, start=None, end=None):
+    """Total focus minutes per subject, optionally limited to a date range"""
+    query = db.select(
+        DailySubjectRollup.subject,
+        db.func.sum(DailySubjectRollup.minutes)
+    ).where(DailySubjectRollup.user_id == user_id)
+    if start is not None:
+        query = query.where(DailySubjectRollup.date >= start)
+    if end is not None:
+        query = query.where(DailySubjectRollup.date <= end)
+    rows = db.session.execute(query.group_by(DailySubjectRollup.subject)).all()
+    return {subject: minutes for subject, minutes in rows}
+
+
+def monthly_tasks(user_id, first_month, last_month):
+    """Created/completed task counts per month for [first_month, last_month]"""
+    rows = db.session.execute(
+        db.select(MonthlyTaskRollup.month, MonthlyTaskRollup.created, MonthlyTaskRollup.completed).where(
+            MonthlyTaskRollup.user_id == user_id,
+            MonthlyTaskRollup.month >= first_month,
+            MonthlyTaskRollup.month <= last_month
+        )
+    ).all()
+    return {month: (created, completed) for month, created, completed in rows}
@@ -0,0 +1,200 @@
+"""Periodic maintenance jobs on a background thread.
+
+Every serving process runs a scheduler thread, started on its first
+request. Each job's first run lands at a random point within its interval
+and later runs are jittered, so maintenance does not pile up at boot or
+line up across workers. Exclusive jobs take a lease in the job_locks table:
+the first worker whose timer fires after next_run_at runs the job and
+pushes next_run_at one interval ahead, and the others skip it. Jobs that
+maintain per-process state (such as in-memory caches) run in every process.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+from instrumentation import registry
+from models import db, JobLock
+
+logger = logging.getLogger(__name__)
+
+JOB_DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+JOB_RUNS = registry.counter(
+    'studyflow_job_runs_total', 'Scheduled job runs by outcome (ok, error, skipped)', ('job', 'status'))
+JOB_DURATION = registry.histogram(
+    'studyflow_job_duration_seconds', 'Time taken by scheduled job runs', ('job',), JOB_DURATION_BUCKETS)
+
+
+class Job:
+    def __init__(self, name, fn, interval, jitter=0.1, exclusive=True, timeout=None):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.jitter = jitter
+        self.exclusive = exclusive
+        # A lease outlives a crashed worker by at most this long
+        self.timeout = timeout or max(interval, 60)
+        self.running = threading.Lock()
+
+    def delay(self, first=False):
+        """Seconds until the next local check of this job"""
+        if first:
+            return self.interval * random.uniform(0.1, 1.0)
+        return self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class Scheduler:
+    """Runs registered jobs in the background of one process"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}'
+        self._app = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def job(self, name, interval, jitter=0.1, exclusive=True, timeout=None):
+        """Decorator registering fn as a job run every interval seconds"""
+        def register(fn):
+            self.jobs[name] = Job(name, fn, interval, jitter, exclusive, timeout)
+            return fn
+        return register
+
+    @property
+    def started(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, app):
+        """Start the scheduler thread unless it is already running"""
+        with self._start_lock:
+            if self.started:
+                return False
+            self._app = app
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='scheduler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        due = {name: time.monotonic() + job.delay(first=True) for name, job in self.jobs.items()}
+        while due and not self._stop.is_set():
+            name = min(due, key=due.get)
+            if self._stop.wait(max(0.0, due[name] - time.monotonic())):
+                break
+            job = self.jobs[name]
+            _, wait = self.run_job(job)
+            due[name] = time.monotonic() + (wait if wait is not None else job.delay())
+
+    def run_job(self, job, force=False, app=None):
+        """Run one job now if it is due and free.
+
+        Returns (status, wait): status is 'ok', 'error' or 'skipped', and wait
+        is the seconds until the job becomes due when another worker holds or
+        recently ran it, else None. force skips the schedule check.
+        """
+        if not job.running.acquire(blocking=False):
+            JOB_RUNS.inc(job=job.name, status='skipped')
+            return 'skipped', None
+        try:
+            with (app or self._app).app_context():
+                if job.exclusive:
+                    wait = self._acquire(job, force)
+                    if wait is not None:
+                        JOB_RUNS.inc(job=job.name, status='skipped')
+                        return 'skipped', wait
+                started = time.perf_counter()
+                status = 'ok'
+                try:
+                    job.fn()
+                    db.session.commit()
+                except Exception:
+                    status = 'error'
+                    db.session.rollback()
+                    logger.exception('Scheduled job %s failed', job.name)
+                elapsed = time.perf_counter() - started
+                JOB_RUNS.inc(job=job.name, status=status)
+                JOB_DURATION.observe(elapsed, job=job.name)
+                if job.exclusive:
+                    self._release(job, status, elapsed)
+                return status, None
+        except OperationalError:
+            # Lock table missing or database busy; try again next interval
+            logger.warning('Could not schedule job %s', job.name, exc_info=True)
+            return 'error', None
+        finally:
+            job.running.release()
+
+    def _acquire(self, job, force):
+        """Take the job's lease; None on success, else seconds until it is due"""
+        now = datetime.utcnow()
+        lease = dict(owner=self.owner, locked_until=now + timedelta(seconds=job.timeout),
+                     next_run_at=now + timedelta(seconds=job.interval), last_started_at=now)
+        free = db.or_(JobLock.locked_until.is_(None), JobLock.locked_until < now)
+        condition = free if force else db.and_(free, JobLock.next_run_at <= now)
+        result = db.session.execute(
+            db.update(JobLock).where(JobLock.name == job.name, condition).values(**lease))
+        if result.rowcount == 1:
+            db.session.commit()
+            return None
+
+        row = db.session.get(JobLock, job.name)
+        if row is None:
+            db.session.add(JobLock(name=job.name, **lease))
+            try:
+                db.session.commit()
+                return None
+            except IntegrityError:
+                db.session.rollback()
+                row = db.session.get(JobLock, job.name)
+        if row is None:
+            db.session.rollback()
+            return None
+        # Check again shortly after the current holder's schedule says it is due
+        until = max(row.next_run_at, row.locked_until or row.next_run_at)
+        db.session.rollback()
+        return max(1.0, (until - now).total_seconds()) + job.interval * random.uniform(0, job.jitter)
+
+    def _release(self, job, status, elapsed):
+        now = datetime.utcnow()
+        db.session.execute(
+            db.update(JobLock).where(JobLock.name == job.name, JobLock.owner == self.owner).values(
+                locked_until=None, last_finished_at=now, last_status=status,
+                last_duration_ms=round(elapsed * 1000)))
+        db.session.commit()
+
+    def status(self):
+        """Lease and last-run details of every registered job"""
+        rows = {row.name: row for row in JobLock.query.filter(JobLock.name.in_(list(self.jobs)))}
+        result = []
+        for name, job in sorted(self.jobs.items()):
+            entry = rows[name].to_dict() if name in rows else {'name': name}
+            entry.update({'interval_seconds': job.interval, 'exclusive': job.exclusive})
+            result.append(entry)
+        return result
+
+
+def install_scheduler(app, scheduler):
+    """Start the scheduler on a process's first request when SCHEDULER_ENABLED"""
+    app.config.setdefault('SCHEDULER_ENABLED', os.environ.get('SCHEDULER_ENABLED', '1') == '1')
+    if not app.config['SCHEDULER_ENABLED']:
+        return
+
+    def start_scheduler():
+        # Only serving processes start it; CLI commands and imports never do
+        if not scheduler.started:
+            scheduler.start(app)
+
+    app.before_request(start_scheduler)
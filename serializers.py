@@ -0,0 +1,153 @@
+"""Read-side serialization straight from selected columns.
+
+A Projection names the columns an endpoint needs and how each value is
+written out. Rows come back from the database as plain tuples, so list
+endpoints skip ORM hydration, and dates and times are formatted from
+their fields rather than through strftime/strptime round-trips.
+
+JSON is written by per-projection templates that reproduce Flask's
+jsonify output byte for byte (sorted keys, compact separators, ASCII
+escapes, trailing newline). When the app is configured for other output
+(debug indentation, unsorted keys) the same rows go through jsonify.
+"""
+from json.encoder import encode_basestring_ascii
+
+from flask import current_app, jsonify
+
+from models import StudySession, Task, FocusSession
+
+
+class Kind:
+    """How one value becomes a Python value for to_dict and JSON text"""
+
+    def __init__(self, py, json):
+        self.py = py
+        self.json = json
+
+
+def _nullable(encode):
+    return lambda value: 'null' if value is None else encode(value)
+
+
+def _hm(value):
+    return f'{value.hour:02d}:{value.minute:02d}'
+
+
+def _iso(value):
+    return value.isoformat()
+
+
+STR = Kind(lambda v: v, _nullable(encode_basestring_ascii))
+INT = Kind(lambda v: v, _nullable(lambda v: str(int(v))))
+BOOL = Kind(lambda v: v, _nullable(lambda v: 'true' if v else 'false'))
+# Same text as strftime('%Y-%m-%d') and strftime('%H:%M')
+DATE = Kind(_iso, lambda v: f'"{v.isoformat()}"')
+HM = Kind(_hm, lambda v: f'"{_hm(v)}"')
+DATETIME = Kind(_nullable(_iso), _nullable(lambda v: f'"{v.isoformat()}"'))
+
+
+class Projection:
+    """Selected columns plus extra computed fields, output with sorted keys"""
+
+    def __init__(self, fields, extra=()):
+        # fields: (key, column, kind); extra: (key, kind) appended by the caller
+        self.fields = list(fields) + [(key, None, kind) for key, kind in extra]
+        self.columns = [column for _, column, _ in fields]
+        order = sorted(range(len(self.fields)), key=lambda i: self.fields[i][0])
+        self._template = [
+            (('{' if n == 0 else ',') + encode_basestring_ascii(self.fields[i][0]) + ':', i, self.fields[i][2].json)
+            for n, i in enumerate(order)
+        ]
+
+    def to_dict(self, values):
+        return {key: kind.py(value) for (key, _, kind), value in zip(self.fields, values)}
+
+    def to_json(self, values):
+        return ''.join([prefix + encode(values[i]) for prefix, i, encode in self._template]) + '}'
+
+
+SESSION = Projection([
+    ('id', StudySession.id, INT),
+    ('title', StudySession.title, STR),
+    ('subject', StudySession.subject, STR),
+    ('date', StudySession.date, DATE),
+    ('startTime', StudySession.start_time, HM),
+    ('endTime', StudySession.end_time, HM),
+    ('color', StudySession.color, STR),
+    ('priority', StudySession.priority, STR),
+    ('notes', StudySession.notes, STR),
+])
+
+TASK = Projection([
+    ('id', Task.id, INT),
+    ('title', Task.title, STR),
+    ('dueDate', Task.due_date, DATE),
+    ('completed', Task.completed, BOOL),
+])
+
+TASK_WITH_DUE = Projection(TASK.fields, extra=[('due', STR)])
+
+FOCUS = Projection([
+    ('id', FocusSession.id, INT),
+    ('subject', FocusSession.subject, STR),
+    ('date', FocusSession.date, DATE),
+    ('start_time', FocusSession.start_time, DATETIME),
+    ('end_time', FocusSession.end_time, DATETIME),
+    ('duration', FocusSession.duration, INT),
+])
+
+
+def time_12h(value):
+    """9:05 AM style label for a time"""
+    return f"{value.hour % 12 or 12}:{value.minute:02d} {'AM' if value.hour < 12 else 'PM'}"
+
+
+def duration_label(start, end):
+    """'1 hour 30 min' style label for the span between two times"""
+    total_minutes = (end.hour * 60 + end.minute) - (start.hour * 60 + start.minute)
+    hours = total_minutes // 60
+    minutes = total_minutes % 60
+    if hours == 0:
+        return f"{minutes} min"
+    elif minutes == 0:
+        return f"{hours} hour{'s' if hours > 1 else ''}"
+    else:
+        return f"{hours} hour{'s' if hours > 1 else ''} {minutes} min"
+
+
+def due_label(due_date, today):
+    """Due date relative to today, as shown on task lists"""
+    diff = (due_date - today).days
+    if diff == 0:
+        return "Due: Today"
+    elif diff == 1:
+        return "Due: Tomorrow"
+    elif diff < 0:
+        return f"Overdue: {abs(diff)} day{'s' if abs(diff) > 1 else ''}"
+    else:
+        return f"Due: {due_date.strftime('%b %d')}"
+
+
+def _templates_match_jsonify():
+    provider = current_app.json
+    compact = provider.compact is True or (provider.compact is None and not current_app.debug)
+    return compact and provider.sort_keys and provider.ensure_ascii
+
+
+def _json_text_response(body):
+    return current_app.response_class(body + '\n', mimetype=current_app.json.mimetype)
+
+
+def list_response(projection, rows):
+    """Same response as jsonify([projection.to_dict(row) for row in rows])"""
+    if not _templates_match_jsonify():
+        return jsonify([projection.to_dict(row) for row in rows])
+    return _json_text_response('[' + ','.join([projection.to_json(row) for row in rows]) + ']')
+
+
+def page_response(projection, rows, next_cursor):
+    """Same response as jsonify({'items': [...], 'next_cursor': next_cursor})"""
+    if not _templates_match_jsonify():
+        return jsonify({'items': [projection.to_dict(row) for row in rows], 'next_cursor': next_cursor})
+    items = ','.join([projection.to_json(row) for row in rows])
+    return _json_text_response(f'{{"items":[{items}],"next_cursor":{STR.json(next_cursor)}}}')
@@ -39,6 +39,101 @@ function escapeJs(str) {
     return str.replace(/\\/g, '\\\\').replace(/'/g, "\\'").replace(/"/g, '\\"');
 }
 
+// ============= Delta Sync =============
+// Local copy of the task list, brought up to date with /api/sync deltas.
+// The planner reads one day at a time from /api/sessions instead.
+const SYNC_STORAGE_KEY = 'syncState';
+const SYNC_ENTITIES = ['tasks'];
+let syncState = null;
+let syncQueue = Promise.resolve();
+
+function loadSyncState() {
+    if (syncState) return syncState;
+    try {
+        syncState = JSON.parse(localStorage.getItem(SYNC_STORAGE_KEY));
+    } catch (e) {
+        syncState = null;
+    }
+    if (!syncState || !syncState.records) {
+        syncState = { version: 0, records: {} };
+    }
+    const records = {};
+    SYNC_ENTITIES.forEach(entity => { records[entity] = syncState.records[entity] || {}; });
+    syncState.records = records;
+    return syncState;
+}
+
+// A snapshot arrives in pages; combine them so the local copy is replaced once
+function mergeSnapshotPages(pages) {
+    const changes = {};
+    pages.forEach(page => {
+        Object.entries(page.changes).forEach(([entity, delta]) => {
+            if (!changes[entity]) changes[entity] = { upserted: [], deleted: [] };
+            changes[entity].upserted.push(...delta.upserted);
+        });
+    });
+    return { version: pages[0].version, reset: true, changes };
+}
+
+function applySyncPayload(payload) {
+    const state = loadSyncState();
+    Object.entries(payload.changes).forEach(([entity, delta]) => {
+        const records = payload.reset ? {} : state.records[entity];
+        delta.upserted.forEach(record => { records[record.id] = record; });
+        delta.deleted.forEach(id => { delete records[id]; });
+        state.records[entity] = records;
+    });
+    state.version = payload.version;
+    try {
+        localStorage.setItem(SYNC_STORAGE_KEY, JSON.stringify(state));
+    } catch (e) {
+        // Storage full or unavailable; the in-memory copy still works for this page
+    }
+}
+
+// Calls run one after another so a sync started after a write always sees it
+function syncData() {
+    const run = () => {
+        const state = loadSyncState();
+        const url = `/api/sync?since=${state.version}&entities=${SYNC_ENTITIES.join(',')}`;
+        const pages = [];
+        const fetchPage = cursor => fetch(cursor ? `${url}&cursor=${encodeURIComponent(cursor)}` : url)
+            .then(response => {
+                if (!response.ok) throw new Error(`Sync failed with status ${response.status}`);
+                return response.json();
+            })
+            .then(payload => {
+                if (!payload.reset) return applySyncPayload(payload);
+                pages.push(payload);
+                if (payload.next) return fetchPage(payload.next);
+                return applySyncPayload(mergeSnapshotPages(pages));
+            });
+        return fetchPage(null);
+    };
+    syncQueue = syncQueue.then(run, run);
+    return syncQueue;
+}
+
+function getSyncedRecords(entity) {
+    return Object.values(loadSyncState().records[entity]).sort((a, b) => a.id - b.id);
+}
+
+const MONTH_ABBREVIATIONS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'];
+
+// Same labels as format_task_due in app.py
+function formatTaskDue(dueDate) {
+    const [year, month, day] = dueDate.split('-').map(Number);
+    const due = new Date(year, month - 1, day);
+    const now = new Date();
+    const today = new Date(now.getFullYear(), now.getMonth(), now.getDate());
+    const diff = Math.round((due - today) / 86400000);
+
+    if (diff === 0) return 'Due: Today';
+    if (diff === 1) return 'Due: Tomorrow';
+    if (diff < 0) return `Overdue: ${-diff} day${-diff > 1 ? 's' : ''}`;
+    return `Due: ${MONTH_ABBREVIATIONS[month - 1]} ${String(day).padStart(2, '0')}`;
+}
+
 // ============= Planner Functions =============
 function loadPlannerSessions(date) {
     fetch(`/api/sessions?date=${date}`)
@@ -47,6 +142,101 @@ function loadPlannerSessions(date) {
             renderSessionsOnCalendar(sessions);
         })
         .catch(error => console.error('Error loading sessions:', error));
+
+    loadMonthOverview(date.slice(0, 7));
+}
+
+// ============= Month Overview =============
+// One calendar summary request per month; day navigation within the month reuses it
+let monthOverviewMonth = null;
+let monthOverviewData = null;
+
+function invalidateMonthOverview() {
+    monthOverviewMonth = null;
+    monthOverviewData = null;
+}
+
+function loadMonthOverview(month) {
+    const container = document.getElementById('monthOverview');
+    if (!container) return;
+
+    if (month === monthOverviewMonth && monthOverviewData) {
+        renderMonthOverview(monthOverviewData);
+        return;
+    }
+
+    monthOverviewMonth = month;
+    fetch(`/api/sessions/calendar?month=${month}`)
+        .then(response => response.json())
+        .then(data => {
+            if (monthOverviewMonth !== month) return;
+            monthOverviewData = data;
+            renderMonthOverview(data);
+        })
+        .catch(error => console.error('Error loading month overview:', error));
+}
+
+function changeOverviewMonth(delta) {
+    const [year, month] = (monthOverviewMonth || currentPlannerDate.slice(0, 7)).split('-').map(Number);
+    const target = new Date(year, month - 1 + delta, 1);
+    const key = `${target.getFullYear()}-${String(target.getMonth() + 1).padStart(2, '0')}`;
+    loadMonthOverview(key);
+}
+
+function selectPlannerDate(dateStr) {
+    currentPlannerDate = dateStr;
+    updateDateDisplay();
+    loadPlannerSessions(currentPlannerDate);
+}
+
+function renderMonthOverview(data) {
+    const container = document.getElementById('monthOverview');
+    if (!container) return;
+
+    const byDate = {};
+    data.days.forEach(day => { byDate[day.date] = day; });
+
+    const first = new Date(data.from + 'T00:00:00');
+    const daysInMonth = new Date(first.getFullYear(), first.getMonth() + 1, 0).getDate();
+    const monthLabel = first.toLocaleDateString('en-US', { year: 'numeric', month: 'long' });
+
+    let cells = '';
+    for (let i = 0; i < first.getDay(); i++) {
+        cells += '<div class="month-cell empty"></div>';
+    }
+    for (let d = 1; d <= daysInMonth; d++) {
+        const dateStr = `${data.from.slice(0, 8)}${String(d).padStart(2, '0')}`;
+        const summary = byDate[dateStr];
+        const classes = ['month-cell'];
+        if (summary) classes.push('busy');
+        if (dateStr === currentPlannerDate) classes.push('selected');
+        const dots = summary
+            ? summary.colors.map(color => `<span class="month-dot ${escapeHtml(color)}"></span>`).join('')
+            : '';
+        const title = summary ? `${summary.sessions} session(s), ${summary.minutes} min` : 'No sessions';
+        cells += `
+            <div class="${classes.join(' ')}" title="${title}" onclick="selectPlannerDate('${dateStr}')">
+                <span class="month-day">${d}</span>
+                <span class="month-dots">${dots}</span>
+            </div>
+        `;
+    }
+
+    container.innerHTML = `
+        <div class="month-overview-header">
+            <button class="nav-btn" onclick="changeOverviewMonth(-1)">
+                <svg viewBox="0 0 24 24" fill="none"><path d="M15 18l-6-6 6-6" stroke="currentColor" stroke-width="2"/></svg>
+            </button>
+            <span class="month-overview-title">${monthLabel}</span>
+            <button class="nav-btn" onclick="changeOverviewMonth(1)">
+                <svg viewBox="0 0 24 24" fill="none"><path d="M9 18l6-6-6-6" stroke="currentColor" stroke-width="2"/></svg>
+            </button>
+        </div>
+        <div class="month-grid">
+            ${['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'].map(n => `<div class="month-weekday">${n}</div>`).join('')}
+            ${cells}
+        </div>
+    `;
 }
 
 function renderSessionsOnCalendar(sessions) {
@@ -212,6 +402,7 @@ function handleAddSession(event) {
 
         // If we're on the planner page, reload sessions
         if (document.getElementById('scheduleGrid')) {
+            invalidateMonthOverview();
             loadPlannerSessions(currentPlannerDate);
         }
 
@@ -477,6 +668,111 @@ function endFocusSession() {
     });
 }
 
+// ============= Live Updates =============
+// One server-sent event stream per tab: focus timer changes made in other
+// tabs or devices, and change notices that refresh whatever this page shows
+let liveEvents = null;
+let liveVersion = null;
+
+function connectLiveUpdates() {
+    if (liveEvents || typeof EventSource === 'undefined') return;
+
+    // EventSource reconnects on its own and resumes with Last-Event-ID
+    liveEvents = new EventSource('/api/events');
+    liveEvents.addEventListener('hello', event => {
+        const data = JSON.parse(event.data);
+        applyFocusState(data.focus);
+        noteLiveVersion(data.version, null);
+    });
+    liveEvents.addEventListener('focus', event => {
+        applyFocusState(JSON.parse(event.data));
+    });
+    liveEvents.addEventListener('change', event => {
+        const data = JSON.parse(event.data);
+        noteLiveVersion(data.version, data.entities);
+    });
+    liveEvents.addEventListener('heartbeat', event => {
+        // A newer version here means a change this stream's worker did not see
+        noteLiveVersion(JSON.parse(event.data).version, null);
+    });
+}
+
+function noteLiveVersion(version, entities) {
+    const firstVersion = liveVersion === null;
+    if (!firstVersion && version <= liveVersion) return;
+    liveVersion = version;
+    if (!firstVersion) {
+        refreshLiveViews(entities);
+    }
+}
+
+// entities is null when it is not known what changed
+function refreshLiveViews(entities) {
+    const changed = entity => !entities || entities.includes(entity);
+    const path = window.location.pathname;
+
+    if (changed('tasks') && document.getElementById('taskList')) {
+        loadTasks();
+    }
+    if (changed('sessions') && path === '/planner') {
+        invalidateMonthOverview();
+        loadPlannerSessions(currentPlannerDate);
+    }
+    if ((!entities || entities.length > 0) && path === '/dashboard') {
+        updateDashboardStats();
+    }
+    if ((changed('tasks') || changed('focus')) && path === '/progress') {
+        loadProgressData(focusHistoryParams ? `?${focusHistoryParams}` : '');
+        loadFocusHistory(focusHistoryParams);
+    }
+    if (!entities) {
+        fetch('/api/focus/current')
+            .then(response => response.json())
+            .then(applyFocusState)
+            .catch(error => console.error('Error checking focus session:', error));
+    }
+}
+
+// Follow a focus session started or ended elsewhere
+function applyFocusState(state) {
+    if (!state) return;
+
+    if (state.active && state.session) {
+        const startedAt = Date.parse(state.session.start_time + 'Z');
+        // Already timing this session (local start times differ by request latency)
+        if (focusStartTime && Math.abs(focusStartTime - startedAt) < 5000) return;
+
+        const subjectSelect = document.getElementById('focusSubject');
+        if (subjectSelect) {
+            subjectSelect.value = state.session.subject;
+        }
+        if (focusTimerInterval) {
+            clearInterval(focusTimerInterval);
+            focusTimerInterval = null;
+        }
+        // With focusStartTime set, startFocusTimer only runs the local clock
+        focusStartTime = startedAt;
+        startFocusTimer();
+        const subjectDisplay = document.getElementById('timerSubject');
+        if (subjectDisplay) {
+            subjectDisplay.textContent = state.session.subject;
+        }
+        updateFocusTimer();
+    } else if (!state.active && focusStartTime) {
+        if (focusTimerInterval) {
+            clearInterval(focusTimerInterval);
+            focusTimerInterval = null;
+        }
+        focusStartTime = null;
+        resetFocusTimer();
+
+        const subjectSelect = document.getElementById('focusSubject');
+        if (subjectSelect) {
+            subjectSelect.disabled = false;
+        }
+    }
+}
+
 // ============= Dashboard Stats =============
 function updateDashboardStats() {
     fetch('/api/dashboard/stats')
@@ -511,17 +807,147 @@ function updateDashboardStats() {
 }
 
 // ============= AI Recommendations =============
-function loadAIRecommendations() {
-    const container = document.getElementById('aiRecommendations');
-    if (!container) return;
+let aiRefreshTimer = null;
+
+function renderRecommendationItem(rec) {
+    return `
+        <div class="recommendation-item">
+            <svg class="recommendation-icon" viewBox="0 0 24 24" fill="none">
+                <circle cx="12" cy="12" r="10" stroke="#10B981" stroke-width="2"/>
+                <path d="M9 12l2 2 4-4" stroke="#10B981" stroke-width="2"/>
+            </svg>
+            <p>${escapeHtml(rec)}</p>
+        </div>
+    `;
+}
 
-    // Show loading state
+function renderAIError(container, message) {
     container.innerHTML = `
-        <div class="ai-loading">
-            <div class="loading-spinner"></div>
-            <p>Getting personalized recommendations...</p>
+        <div class="ai-error">
+            <svg viewBox="0 0 24 24" fill="none" style="width: 20px; height: 20px; flex-shrink: 0;">
+                <circle cx="12" cy="12" r="10" stroke="currentColor" stroke-width="2"/>
+                <path d="M12 8v4M12 16h.01" stroke="currentColor" stroke-width="2" stroke-linecap="round"/>
+            </svg>
+            <span>${message}</span>
         </div>
     `;
+}
+
+function formatRecommendationAge(seconds) {
+    if (seconds === null || seconds === undefined) return '';
+    if (seconds < 60) return 'Updated just now';
+    const minutes = Math.floor(seconds / 60);
+    if (minutes < 60) return `Updated ${minutes} min ago`;
+    const hours = Math.floor(minutes / 60);
+    return `Updated ${hours}h ago`;
+}
+
+let aiEventSource = null;
+
+function streamAIRecommendations(forceRefresh = false, attempt = 0) {
+    const container = document.getElementById('aiRecommendations');
+    if (!container) return;
+
+    if (aiEventSource) {
+        aiEventSource.close();
+    }
+
+    const refreshBtn = document.getElementById('refreshAIBtn');
+    if (refreshBtn) {
+        refreshBtn.disabled = true;
+        refreshBtn.style.opacity = '0.6';
+    }
+
+    let received = 0;
+    const source = new EventSource(forceRefresh ? '/api/ai/recommendations/stream?refresh=1' : '/api/ai/recommendations/stream');
+    aiEventSource = source;
+
+    const finish = () => {
+        source.close();
+        if (aiEventSource === source) {
+            aiEventSource = null;
+        }
+        if (refreshBtn) {
+            refreshBtn.disabled = false;
+            refreshBtn.style.opacity = '1';
+        }
+    };
+
+    // Render each recommendation as soon as the server has it
+    source.addEventListener('recommendation', event => {
+        const data = JSON.parse(event.data);
+        if (received === 0) {
+            container.innerHTML = '';
+        }
+        received += 1;
+        container.insertAdjacentHTML('beforeend', renderRecommendationItem(data.text));
+    });
+
+    source.addEventListener('done', event => {
+        const data = JSON.parse(event.data);
+        finish();
+        if (received === 0) {
+            renderAIError(container, 'Unable to generate recommendations. Please try again.');
+            return;
+        }
+        const age = formatRecommendationAge(data.age_seconds);
+        if (age) {
+            container.insertAdjacentHTML('beforeend',
+                `<p class="recommendation-age">${age}${data.refreshing ? ' · refreshing…' : ''}</p>`);
+        }
+        // A newer answer is being generated in the background; pick it up shortly
+        if (data.refreshing && attempt < 5) {
+            aiRefreshTimer = setTimeout(() => streamAIRecommendations(false, attempt + 1), 2000 * (attempt + 1));
+        }
+    });
+
+    source.addEventListener('error', event => {
+        finish();
+        const data = event.data ? JSON.parse(event.data) : null;
+        if (data && data.recommendations && data.recommendations.length > 0) {
+            container.innerHTML = data.recommendations.map(renderRecommendationItem).join('');
+        } else if (received === 0) {
+            renderAIError(container, 'Error connecting to AI service. Please try again later.');
+        }
+    });
+}
+
+function loadAIRecommendations(forceRefresh = false, attempt = 0) {
+    const container = document.getElementById('aiRecommendations');
+    if (!container) return;
+
+    if (attempt === 0 && window.EventSource) {
+        if (aiRefreshTimer) {
+            clearTimeout(aiRefreshTimer);
+            aiRefreshTimer = null;
+        }
+        // Keep the server-rendered recommendations on screen until others arrive
+        if (forceRefresh || !container.querySelector('.recommendation-item')) {
+            container.innerHTML = `
+                <div class="ai-loading">
+                    <div class="loading-spinner"></div>
+                    <p>Getting personalized recommendations...</p>
+                </div>
+            `;
+        }
+        streamAIRecommendations(forceRefresh);
+        return;
+    }
+
+    if (aiRefreshTimer) {
+        clearTimeout(aiRefreshTimer);
+        aiRefreshTimer = null;
+    }
+
+    // Show loading state only when there is nothing on screen yet
+    if (attempt === 0 && (forceRefresh || !container.querySelector('.recommendation-item'))) {
+        container.innerHTML = `
+            <div class="ai-loading">
+                <div class="loading-spinner"></div>
+                <p>Getting personalized recommendations...</p>
+            </div>
+        `;
+    }
 
     // Disable refresh button while loading
     const refreshBtn = document.getElementById('refreshAIBtn');
@@ -530,42 +956,25 @@ function loadAIRecommendations() {
         refreshBtn.style.opacity = '0.6';
     }
 
-    fetch('/api/ai/recommendations')
+    fetch(forceRefresh ? '/api/ai/recommendations?refresh=1' : '/api/ai/recommendations')
         .then(response => response.json())
         .then(data => {
             if (data.recommendations && data.recommendations.length > 0) {
-                container.innerHTML = data.recommendations.map(rec => `
-                    <div class="recommendation-item">
-                        <svg class="recommendation-icon" viewBox="0 0 24 24" fill="none">
-                            <circle cx="12" cy="12" r="10" stroke="#10B981" stroke-width="2"/>
-                            <path d="M9 12l2 2 4-4" stroke="#10B981" stroke-width="2"/>
-                        </svg>
-                        <p>${escapeHtml(rec)}</p>
-                    </div>
-                `).join('');
+                const age = formatRecommendationAge(data.age_seconds);
+                container.innerHTML = data.recommendations.map(renderRecommendationItem).join('') +
+                    (age ? `<p class="recommendation-age">${age}${data.refreshing ? ' · refreshing…' : ''}</p>` : '');
             } else {
-                container.innerHTML = `
-                    <div class="ai-error">
-                        <svg viewBox="0 0 24 24" fill="none" style="width: 20px; height: 20px; flex-shrink: 0;">
-                            <circle cx="12" cy="12" r="10" stroke="currentColor" stroke-width="2"/>
-                            <path d="M12 8v4M12 16h.01" stroke="currentColor" stroke-width="2" stroke-linecap="round"/>
-                        </svg>
-                        <span>Unable to generate recommendations. Please try again.</span>
-                    </div>
-                `;
+                renderAIError(container, 'Unable to generate recommendations. Please try again.');
+            }
+
+            // A newer answer is being generated in the background; pick it up shortly
+            if (data.refreshing && attempt < 5) {
+                aiRefreshTimer = setTimeout(() => loadAIRecommendations(false, attempt + 1), 2000 * (attempt + 1));
             }
         })
         .catch(error => {
             console.error('Error loading AI recommendations:', error);
-            container.innerHTML = `
-                <div class="ai-error">
-                    <svg viewBox="0 0 24 24" fill="none" style="width: 20px; height: 20px; flex-shrink: 0;">
-                        <circle cx="12" cy="12" r="10" stroke="currentColor" stroke-width="2"/>
-                        <path d="M12 8v4M12 16h.01" stroke="currentColor" stroke-width="2" stroke-linecap="round"/>
-                    </svg>
-                    <span>Error connecting to AI service. Please try again later.</span>
-                </div>
-            `;
+            renderAIError(container, 'Error connecting to AI service. Please try again later.');
         })
         .finally(() => {
             // Re-enable refresh button
@@ -689,6 +1098,58 @@ function setupTaskHandlers() {
     });
 }
 
+// ============= Batch Updates =============
+// Several writes in one request and one transaction; rejects if any operation fails
+function sendBatch(operations) {
+    return fetch('/api/batch', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ operations })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            const failed = data.results ? data.results[data.results.length - 1] : null;
+            throw new Error(failed && failed.error ? failed.error : data.error || 'Batch failed');
+        }
+        return data.results;
+    });
+}
+
+function markAllTasksDone() {
+    const pending = Array.from(document.querySelectorAll('.task-checkbox:not(:checked)'));
+    if (pending.length === 0) return;
+
+    const operations = pending.map(checkbox => ({
+        op: 'update',
+        type: 'task',
+        id: Number(checkbox.id.replace('task-', '')),
+        data: { completed: true }
+    }));
+
+    sendBatch(operations)
+        .then(() => {
+            pending.forEach(checkbox => { checkbox.checked = true; });
+            updateDashboardStats();
+        })
+        .catch(error => {
+            console.error('Error completing tasks:', error);
+            alert('Error updating tasks. Please try again.');
+        });
+}
+
+function rescheduleSessions(changes) {
+    // changes: [{ id, date, startTime, endTime }]
+    return sendBatch(changes.map(change => ({
+        op: 'update',
+        type: 'session',
+        id: change.id,
+        data: { date: change.date, startTime: change.startTime, endTime: change.endTime }
+    })));
+}
+
 // ============= Add Task Modal =============
 function openAddTaskModal() {
     const modal = document.getElementById('addTaskModal');
@@ -774,9 +1235,10 @@ function deleteTask(taskId) {
 }
 
 function loadTasks() {
-    fetch('/api/tasks')
-        .then(response => response.json())
-        .then(tasks => {
+    syncData()
+        .then(() => {
+            const tasks = getSyncedRecords('tasks')
+                .map(task => Object.assign({}, task, { due: formatTaskDue(task.dueDate) }));
             const taskList = document.getElementById('taskList');
             if (!taskList) return;
 
@@ -858,6 +1320,7 @@ function handleReschedule(event) {
 
         // Reload sessions based on current page
         if (document.getElementById('scheduleGrid')) {
+            invalidateMonthOverview();
             loadPlannerSessions(currentPlannerDate);
         }
 
@@ -888,6 +1351,7 @@ function cancelSession(sessionId) {
 
         // Reload sessions based on current page
         if (document.getElementById('scheduleGrid')) {
+            invalidateMonthOverview();
             loadPlannerSessions(currentPlannerDate);
         }
 
@@ -902,8 +1366,8 @@ function cancelSession(sessionId) {
 }
 
 // ============= Progress Page =============
-function loadProgressData() {
-    fetch('/api/progress/stats')
+function loadProgressData(params = '') {
+    fetch(`/api/progress/stats${params}`)
         .then(response => response.json())
         .then(data => {
             // Update stat cards
@@ -914,7 +1378,7 @@ function loadProgressData() {
 
             // Render charts
             renderTaskCompletionChart(data.monthlyData);
-            renderWeeklyStudyChart(data.weeklyData);
+            renderWeeklyStudyChart(data.rangeData || data.weeklyData);
             renderSubjectProgressChart(data.subjectBreakdown);
             renderFocusSummary(data);
             renderMilestones(data);
@@ -926,7 +1390,7 @@ function renderTaskCompletionChart(monthlyData) {
     const container = document.getElementById('taskCompletionChart');
     if (!container) return;
 
-    const maxValue = Math.max(...monthlyData.map(d => d.total));
+    const maxValue = Math.max(...monthlyData.map(d => d.total), 1);
 
     let html = '<div class="simple-bar-chart">';
     monthlyData.forEach(item => {
@@ -961,7 +1425,7 @@ function renderWeeklyStudyChart(weeklyData) {
         html += `
             <div class="line-point">
                 <div class="point-bar" style="height: ${Math.max(height, 4)}px;"></div>
-                <span class="point-label">${item.dayName}</span>
+                <span class="point-label">${item.label || item.dayName}</span>
             </div>
         `;
     });
@@ -1094,9 +1558,55 @@ function renderMilestones(data) {
     `).join('');
 }
 
+// ============= Focus History =============
+let focusHistoryCursor = null;
+let focusHistoryParams = '';
+
+function loadFocusHistory(params = '', append = false) {
+    const container = document.getElementById('focusHistory');
+    if (!container) return;
+
+    // Only fetch the visible page; older sessions load on demand
+    const query = new URLSearchParams(params);
+    query.set('order', 'desc');
+    query.set('limit', '10');
+    if (append && focusHistoryCursor) {
+        query.set('cursor', focusHistoryCursor);
+    }
+    focusHistoryParams = params;
+
+    fetch(`/api/focus/history?${query.toString()}`)
+        .then(response => response.json())
+        .then(data => {
+            focusHistoryCursor = data.next_cursor;
+            const moreBtn = container.querySelector('.focus-history-more');
+            if (moreBtn) moreBtn.remove();
+            if (!append) container.innerHTML = '';
+
+            container.insertAdjacentHTML('beforeend', data.items.map(session => `
+                <div class="focus-history-item">
+                    <span>${escapeHtml(session.subject)}</span>
+                    <span>${formatDateForDisplay(session.date)} · ${session.duration} min</span>
+                </div>
+            `).join(''));
+
+            if (focusHistoryCursor) {
+                container.insertAdjacentHTML('beforeend',
+                    '<button class="btn btn-secondary btn-sm focus-history-more" onclick="loadFocusHistory(focusHistoryParams, true)">Load more</button>');
+            }
+        })
+        .catch(error => console.error('Error loading focus history:', error));
+}
+
 function applyDateFilter() {
-    // For now, just reload the data
-    loadProgressData();
+    const startDate = document.getElementById('startDate');
+    const endDate = document.getElementById('endDate');
+    const params = new URLSearchParams();
+    if (startDate && startDate.value) params.set('from', startDate.value);
+    if (endDate && endDate.value) params.set('to', endDate.value);
+    const query = params.toString();
+    loadProgressData(query ? `?${query}` : '');
+    loadFocusHistory(query);
 }
 
 // ============= Modal Click Outside =============
@@ -1259,6 +1769,13 @@ window.cancelSession = cancelSession;
 window.changeDate = changeDate;
 window.goToToday = goToToday;
 window.applyDateFilter = applyDateFilter;
+window.loadFocusHistory = loadFocusHistory;
+window.changeOverviewMonth = changeOverviewMonth;
+window.selectPlannerDate = selectPlannerDate;
+window.markAllTasksDone = markAllTasksDone;
+window.rescheduleSessions = rescheduleSessions;
+window.syncData = syncData;
+window.connectLiveUpdates = connectLiveUpdates;
 
 // ============= Initialization =============
 document.addEventListener('DOMContentLoaded', function() {
@@ -1313,6 +1830,7 @@ document.addEventListener('DOMContentLoaded', function() {
         }
 
         loadProgressData();
+        loadFocusHistory();
     }
 
     // Initialize progress - don't reset to 0, just update from API
@@ -1320,13 +1838,6 @@ document.addEventListener('DOMContentLoaded', function() {
         // The updateDashboardStats call above will handle the animation
     }
 
-    // Check for active focus session on page load
-    fetch('/api/focus/current')
-        .then(response => response.json())
-        .then(data => {
-            if (data.active) {
-                console.log('Active focus session detected');
-            }
-        })
-        .catch(error => console.error('Error checking focus session:', error));
+    // Focus session state and data changes arrive over one event stream
+    connectLiveUpdates();
 });
@@ -0,0 +1,90 @@
+"""Database configuration and SQLite connection tuning"""
+import os
+
+from sqlalchemy import event
+
+# Defaults suited to several worker processes sharing one SQLite file
+SQLITE_DEFAULTS = {
+    'SQLITE_JOURNAL_MODE': 'WAL',
+    'SQLITE_SYNCHRONOUS': 'NORMAL',
+    'SQLITE_CACHE_SIZE': -64000,        # negative = KiB, so 64 MB per connection
+    'SQLITE_MMAP_SIZE': 268435456,      # 256 MB
+    'SQLITE_BUSY_TIMEOUT': 5000,        # ms to wait on a locked database
+    'SQLITE_TEMP_STORE': 'MEMORY',
+}
+
+JOURNAL_MODES = {'DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF'}
+SYNCHRONOUS_MODES = {'OFF', 'NORMAL', 'FULL', 'EXTRA'}
+TEMP_STORES = {'DEFAULT', 'FILE', 'MEMORY'}
+
+
+def _setting(app, name, default):
+    """Read a setting from app.config, then the environment, then the default"""
+    if name in app.config:
+        return app.config[name]
+    return os.environ.get(name, default)
+
+
+def configure_storage(app, default_path):
+    """Fill in SQLAlchemy settings on app.config before db.init_app"""
+    uri = _setting(app, 'DATABASE_URL', None) or 'sqlite:///' + default_path
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', uri)
+    app.config.setdefault('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+
+    for name, default in SQLITE_DEFAULTS.items():
+        app.config[name] = _setting(app, name, default)
+
+    engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+    if app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        connect_args = dict(engine_options.get('connect_args', {}))
+        # The busy timeout is also set by pragma; this covers the connect itself
+        connect_args.setdefault('timeout', int(app.config['SQLITE_BUSY_TIMEOUT']) / 1000)
+        # Connections are pooled and may be handed to another request thread
+        connect_args.setdefault('check_same_thread', False)
+        engine_options['connect_args'] = connect_args
+    # In-memory SQLite uses a single shared connection and takes no pool sizing
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        engine_options.setdefault('pool_size', int(_setting(app, 'DB_POOL_SIZE', 10)))
+        engine_options.setdefault('max_overflow', int(_setting(app, 'DB_MAX_OVERFLOW', 10)))
+        engine_options.setdefault('pool_timeout', int(_setting(app, 'DB_POOL_TIMEOUT', 30)))
+        engine_options.setdefault('pool_pre_ping', True)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options
+
+
+def sqlite_pragmas(config):
+    """Build the PRAGMA statements to run on every new SQLite connection"""
+    journal_mode = str(config['SQLITE_JOURNAL_MODE']).upper()
+    synchronous = str(config['SQLITE_SYNCHRONOUS']).upper()
+    temp_store = str(config['SQLITE_TEMP_STORE']).upper()
+    if journal_mode not in JOURNAL_MODES:
+        raise ValueError(f'Unsupported SQLITE_JOURNAL_MODE {journal_mode!r}')
+    if synchronous not in SYNCHRONOUS_MODES:
+        raise ValueError(f'Unsupported SQLITE_SYNCHRONOUS {synchronous!r}')
+    if temp_store not in TEMP_STORES:
+        raise ValueError(f'Unsupported SQLITE_TEMP_STORE {temp_store!r}')
+    return [
+        f'PRAGMA journal_mode={journal_mode}',
+        f'PRAGMA synchronous={synchronous}',
+        f"PRAGMA cache_size={int(config['SQLITE_CACHE_SIZE'])}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT'])}",
+        f'PRAGMA temp_store={temp_store}',
+    ]
+
+
+def install_sqlite_pragmas(app, db):
+    """Apply the configured pragmas whenever the pool opens a connection"""
+    with app.app_context():
+        engine = db.engine
+    if engine.dialect.name != 'sqlite':
+        return
+    statements = sqlite_pragmas(app.config)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
@@ -0,0 +1,96 @@
+"""Persisted focus streaks, advanced in O(1) as focus sessions finish"""
+from datetime import datetime, timedelta
+
+from models import db, FocusSession, UserStreak
+
+
+def _recompute(streak, user_id, extra_day=None):
+    """Walk the user's distinct focus dates and store the result on streak"""
+    dates = {row.date for row in FocusSession.query.filter_by(user_id=user_id).with_entities(
+        FocusSession.date
+    ).distinct().all()}
+    if extra_day is not None:
+        dates.add(extra_day)
+    dates = sorted(dates)
+
+    longest = 1 if dates else 0
+    current = 1 if dates else 0
+    for i in range(1, len(dates)):
+        if (dates[i] - dates[i-1]).days == 1:
+            current += 1
+            longest = max(longest, current)
+        else:
+            current = 1
+
+    streak.current_streak = current
+    streak.longest_streak = longest
+    streak.last_active_date = dates[-1] if dates else None
+    return streak
+
+
+def _streak_row(user_id):
+    streak = UserStreak.query.filter_by(user_id=user_id).first()
+    if streak is None:
+        streak = UserStreak(user_id=user_id, current_streak=0, longest_streak=0)
+        db.session.add(streak)
+    return streak
+
+
+def rebuild_streak(user_id):
+    """Recompute a user's streak from their full focus history"""
+    return _recompute(_streak_row(user_id), user_id)
+
+
+def rebuild_all_streaks():
+    """Recompute streaks for every user with focus history"""
+    user_ids = [row[0] for row in db.session.query(FocusSession.user_id).distinct()]
+    for user_id in user_ids:
+        rebuild_streak(user_id)
+    return len(user_ids)
+
+
+def get_streak(user_id):
+    """Return the user's streak record.
+
+    A user without one gets an unsaved record computed from their history;
+    the row itself is created by the next focus write or streak rebuild,
+    so reads never write.
+    """
+    streak = UserStreak.query.filter_by(user_id=user_id).first()
+    if streak is None:
+        streak = _recompute(UserStreak(user_id=user_id, current_streak=0, longest_streak=0), user_id)
+    return streak
+
+
+def record_activity(user_id, day):
+    """Advance the streak for focus activity on a given day"""
+    streak = UserStreak.query.filter_by(user_id=user_id).first()
+    if streak is None:
+        return _recompute(_streak_row(user_id), user_id, day)
+
+    last = streak.last_active_date
+    if last is None:
+        streak.current_streak = 1
+    elif day == last:
+        return streak
+    elif day == last + timedelta(days=1):
+        streak.current_streak += 1
+    elif day > last:
+        streak.current_streak = 1
+    else:
+        # Backdated activity can join two runs; fall back to a full walk
+        return _recompute(streak, user_id, day)
+
+    streak.last_active_date = day
+    streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+    return streak
+
+
+def current_streak(streak, today=None):
+    """Days in the active run; zero once a full day has been missed"""
+    if streak is None or streak.last_active_date is None:
+        return 0
+    today = today or datetime.utcnow().date()
+    if streak.last_active_date < today - timedelta(days=1):
+        return 0
+    return streak.current_streak
@@ -0,0 +1,120 @@
+"""Per-user data versions and version-derived ETags for read endpoints"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import Response, request
+from sqlalchemy import event
+
+from models import db, StudySession, Task, FocusSession, CurrentFocusSession, UserDataVersion
+
+# Changes to these models bump the owning user's version
+TRACKED_MODELS = (StudySession, Task, FocusSession, CurrentFocusSession)
+
+
+# Called as fn(session, connection, versions) after each flush that bumped versions
+flush_listeners = []
+
+
+def bump_versions(connection, user_ids):
+    """Increment the version of each user, creating the row on first use.
+
+    Returns {user_id: new_version}.
+    """
+    table = UserDataVersion.__table__
+    versions = {}
+    for user_id in sorted(user_ids):
+        result = connection.execute(
+            table.update().where(table.c.user_id == user_id).values(version=table.c.version + 1)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(user_id=user_id, version=1))
+            versions[user_id] = 1
+        else:
+            versions[user_id] = connection.execute(
+                db.select(table.c.version).where(table.c.user_id == user_id)
+            ).scalar()
+    return versions
+
+
+def bump_version(user_id):
+    """Bump a user's version for writes that bypass the ORM (bulk inserts)"""
+    return bump_versions(db.session.connection(), {user_id})[user_id]
+
+
+def _touched_users(session):
+    users = set()
+    for obj in session.new:
+        if isinstance(obj, TRACKED_MODELS):
+            users.add(obj.user_id)
+    for obj in session.deleted:
+        if isinstance(obj, TRACKED_MODELS):
+            users.add(obj.user_id)
+    for obj in session.dirty:
+        if isinstance(obj, TRACKED_MODELS) and session.is_modified(obj):
+            users.add(obj.user_id)
+    return users
+
+
+def _after_flush(session, flush_context):
+    users = _touched_users(session)
+    if users:
+        connection = session.connection()
+        versions = bump_versions(connection, users)
+        for listener in flush_listeners:
+            listener(session, connection, versions)
+
+
+def install_version_tracking(scoped_session):
+    """Bump versions inside the same transaction as every ORM flush"""
+    event.listen(scoped_session, 'after_flush', _after_flush)
+
+
+def current_version(user_id):
+    """Read a user's version with a single primary-key lookup"""
+    version = db.session.execute(
+        db.select(UserDataVersion.version).where(UserDataVersion.user_id == user_id)
+    ).scalar()
+    return version or 0
+
+
+def version_etag(user_id, bucket=''):
+    """Strong ETag for the current request at the user's data version"""
+    key = f"{request.path}?{sorted(request.args.items(multi=True))}|{bucket}"
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return f'{current_version(user_id)}-{digest}'
+
+
+def conditional_on_version(user_id=1, bucket=None):
+    """Answer If-None-Match from the data version before running the view.
+
+    bucket is an optional callable returning a string for inputs other than
+    stored data that change the response (for example today's date for
+    relative due labels).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+            etag = version_etag(user_id, bucket() if bucket else '')
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def today_bucket():
+    # Local and UTC dates both feed relative labels and streaks
+    return f"{datetime.now():%Y-%m-%d}|{datetime.utcnow():%Y-%m-%d}"
+
+
+def minute_bucket():
+    return datetime.now().strftime('%Y-%m-%d %H:%M')